@@ -0,0 +1,200 @@
+import sys
+import time
+import queue
+import argparse
+from functools import partial
+import numpy as np
+
+# Actuator outputs of every channel, in column order
+HEAT = 0
+COOL = 1
+FAN = 2
+NAMES = ("heat", "cool", "fan")
+
+
+class SimulatedBus:
+    # Stand-in for the HVAC bus when there is no hardware: every write is
+    # acknowledged at once
+    def __init__(self):
+        self.writes = 0
+        self.batches = 0
+
+    def send(self, device, writes, done):
+        # writes: [(address, on), ...] for one device, sorted by address
+        self.batches += 1
+        self.writes += len(writes)
+        done(True)
+
+
+class ActuatorBank:
+    # On/off heating, cooling and fan relays of every channel, tracked in three
+    # states: desired (the controller's latest decision), commanded (last
+    # written to the bus) and confirmed (acknowledged by the device).
+    #
+    # update() takes the whole decision of a tick at once. Only outputs whose
+    # desired state differs from the commanded one are written, so repeating
+    # a decision costs no traffic, and a relay switched on and back off between
+    # two flushes is never written at all. The writes of one flush are sent as
+    # one batch per device. Writes not confirmed within retry_interval are sent
+    # again. Confirmations may arrive from any thread; they are applied on the
+    # next update().
+    def __init__(self, bus=None, flush_interval=0.0, retry_interval=5.0, capacity=16):
+        self.bus = bus if bus is not None else SimulatedBus()
+        self.auto_route = bus is None  # The simulated bus drives every channel
+        self.flush_interval = flush_interval  # Seconds between flushes (0 = every update)
+        self.retry_interval = retry_interval
+        self.devices = []  # Device names; routes refer to them by index
+        self._device_ids = {}
+        self._results = queue.SimpleQueue()
+        self._last_flush = -float("inf")
+        self._count = 0
+        self._allocate(capacity)
+
+        self.decisions = 0  # Outputs decided
+        self.commands = 0  # Outputs written to the bus
+        self.batches = 0  # Bus writes (one per device per flush)
+        self.failures = 0  # Batches the bus rejected
+        self.last_error = ""
+
+    def _allocate(self, capacity):
+        old = self._count
+        columns = {}
+        for name, shape, dtype, fill in (("desired", 3, bool, False), ("commanded", 3, bool, False),
+                                         ("confirmed", 3, bool, False), ("pending", 3, bool, False),
+                                         ("sent_at", 3, np.float64, 0.0), ("address", 3, np.int32, 0),
+                                         ("device", None, np.int32, -1)):
+            array = np.full((capacity, shape) if shape else capacity, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)[:old]
+            columns[name] = array
+        self.__dict__.update(columns)
+
+    def _ensure(self, count):
+        if count > len(self.device):
+            self._allocate(max(count, 2 * len(self.device)))
+        if count > self._count:
+            if self.auto_route:
+                for channel in range(self._count, count):
+                    self.route(channel, "simulated", [3 * channel + HEAT, 3 * channel + COOL, 3 * channel + FAN])
+            self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def route(self, channel, device, addresses):
+        # Send the heat, cool and fan outputs of `channel` to these addresses of `device`
+        if channel >= len(self.device):
+            self._allocate(max(channel + 1, 2 * len(self.device)))
+        self._count = max(self._count, channel + 1)
+        if device not in self._device_ids:
+            self._device_ids[device] = len(self.devices)
+            self.devices.append(device)
+        self.device[channel] = self._device_ids[device]
+        self.address[channel] = addresses
+
+    def update(self, heat, cool, fans=(), now=None):
+        # Decide every channel's relays from heating/cooling demand; fans run
+        # whenever either does, and always on the channels listed in `fans`
+        n = len(heat)
+        self._ensure(n)
+        desired = self.desired[:n]
+        np.greater(heat, 0.0, out=desired[:, HEAT])
+        np.greater(cool, 0.0, out=desired[:, COOL])
+        np.logical_or(desired[:, HEAT], desired[:, COOL], out=desired[:, FAN])
+        desired[list(fans), FAN] = True
+        self.decisions += 3 * n
+        now = time.monotonic() if now is None else now
+        self._apply_results()
+        if now - self._last_flush >= self.flush_interval:
+            self.flush(now)
+
+    def off(self):
+        # Switch every relay off, e.g. when the system is stopped
+        self._apply_results()
+        self.desired[:self._count] = False
+        self.flush()
+
+    def flush(self, now=None):
+        # Write every output that changed (or waited too long for a
+        # confirmation), one batch per device; returns the number written
+        now = time.monotonic() if now is None else now
+        self._last_flush = now
+        n = self._count
+        routed = (self.device[:n] >= 0)[:, None]
+        send = routed & ((self.desired[:n] != self.commanded[:n]) |
+                         (self.pending[:n] & (now - self.sent_at[:n] >= self.retry_interval)))
+        channels, outputs = np.nonzero(send)
+        if not len(channels):
+            return 0
+        values = self.desired[channels, outputs]
+        self.commanded[channels, outputs] = values
+        self.pending[channels, outputs] = True
+        self.sent_at[channels, outputs] = now
+
+        devices = self.device[channels]
+        addresses = self.address[channels, outputs]
+        order = np.lexsort((addresses, devices))
+        channels, outputs, values, devices, addresses = (a[order] for a in (channels, outputs, values, devices, addresses))
+        bounds = np.flatnonzero(np.diff(devices)) + 1
+        for part in np.split(np.arange(len(order)), bounds):
+            writes = list(zip(addresses[part].tolist(), values[part].tolist()))
+            done = partial(self._done, channels[part], outputs[part], values[part])
+            self.batches += 1
+            self.bus.send(self.devices[devices[part[0]]], writes, done)
+        self.commands += len(order)
+        self._apply_results()
+        return len(order)
+
+    def _done(self, channels, outputs, values, ok, message=""):
+        # Bus callback, possibly from another thread
+        self._results.put((channels, outputs, values, ok, message))
+
+    def _apply_results(self):
+        while True:
+            try:
+                channels, outputs, values, ok, message = self._results.get_nowait()
+            except queue.Empty:
+                return
+            if not ok:
+                # Left pending, so it is sent again after retry_interval
+                self.failures += 1
+                self.last_error = message
+                continue
+            self.confirmed[channels, outputs] = values
+            # Outputs commanded again since stay pending for the newer command
+            current = self.commanded[channels, outputs] == values
+            self.pending[channels[current], outputs[current]] = False
+
+    def state(self, channel=0):
+        # Confirmed (heat, cool, fan) of a channel and whether any is still unconfirmed
+        if channel >= self._count:
+            return (False, False, False), False
+        return tuple(self.confirmed[channel].tolist()), bool(self.pending[channel].any())
+
+
+if __name__ == "__main__":
+    from controllers import CONTROLLERS, split_range
+    from thermal_model import ThermalPlant
+    parser = argparse.ArgumentParser(description="Count the actuator commands the control loop sends")
+    parser.add_argument("--rooms", type=int, default=1000, help="zones under control")
+    parser.add_argument("--ticks", type=int, default=1800, help="control steps")
+    parser.add_argument("--step", type=float, default=2.0, help="plant seconds per tick")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="pid", help="control algorithm")
+    parser.add_argument("--flush", type=float, default=0.0, help="seconds of plant time between bus flushes")
+    args = parser.parse_args()
+
+    plant = ThermalPlant.varied(args.rooms, noise=0.3)
+    controller = CONTROLLERS[args.controller]()
+    temperature = np.full(args.rooms, 24.5)
+    humidity = np.full(args.rooms, 45.0)
+    target = np.full(args.rooms, 23.0)
+    bank = ActuatorBank(flush_interval=args.flush)
+    start = time.perf_counter()
+    for tick in range(args.ticks):
+        heat, cool = split_range(controller.update(temperature, target, args.step))
+        bank.update(heat, cool, now=tick * args.step)
+        plant.step(temperature, humidity, heat, cool, tick * args.step, args.step)
+    elapsed = time.perf_counter() - start
+    print(f"{bank.decisions} decisions, {bank.commands} commands in {bank.batches} batches "
+          f"({100.0 * bank.commands / max(1, bank.decisions):.2f}% of a write-every-tick bus), "
+          f"{elapsed / args.ticks * 1e6:.0f} µs/tick", file=sys.stderr)
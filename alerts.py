@@ -0,0 +1,323 @@
+import sys
+import time
+import argparse
+from collections import namedtuple
+import numpy as np
+import event_log
+
+# Alert conditions, one column each
+BAND = 0  # Temperature further than `band` from its target, `settle` seconds after it was set
+RATE = 1  # Temperature changing faster than `max_rate` °C per minute
+STUCK = 2  # Reading unchanged for `stuck_after` seconds
+OUTLIER = 3  # Reading more than `z_limit` standard deviations from its recent mean
+KINDS = ("band", "rate", "stuck", "outlier")
+LABELS = ("temperature band", "rate of change", "stuck sensor", "outlier")
+
+# Log record of each raised condition; value and value2 as in Alert
+LOG_CODES = (event_log.ALERT_BAND, event_log.ALERT_RATE, event_log.ALERT_STUCK, event_log.ALERT_OUTLIER)
+
+# A condition of one channel that was raised or cleared. value is the
+# reading (the rate in °C/min for RATE); value2 is the target for BAND,
+# minutes without change for STUCK and standard deviations for OUTLIER.
+Alert = namedtuple("Alert", ["timestamp", "channel", "kind", "raised", "value", "value2"])
+
+
+class AlertMonitor:
+    # Streaming checks on every channel's temperature. update() takes the
+    # readings of one tick and costs a fixed number of vectorized operations
+    # however many channels there are; no history is kept.
+    #
+    # The recent mean and variance are Welford's, exponentially weighted over
+    # `window` seconds once enough samples have arrived. The rate is the
+    # change per minute smoothed over `rate_window` seconds. A condition is
+    # raised only after it held for `raise_after` seconds and cleared after it
+    # was gone for `clear_after`, so a noisy reading near a limit does not
+    # flap. Alerts go to the subscribers as a list, only on ticks that have any.
+    # A reading that is NaN or infinite (a dropped sensor, a gap in a
+    # recording) is counted as missing and leaves its channel's statistics
+    # and alerts as they were.
+    def __init__(self, band=3.0, max_rate=3.0, stuck_after=600.0, z_limit=4.0, window=300.0, rate_window=60.0,
+                 raise_after=5.0, clear_after=30.0, settle=600.0, warmup=30, min_std=0.1, capacity=16):
+        self.band = band
+        self.settle = settle
+        self.max_rate = max_rate
+        self.stuck_after = stuck_after
+        self.z_limit = z_limit
+        self.window = window
+        self.rate_window = rate_window
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.warmup = warmup  # Samples before outliers are checked
+        self.min_std = min_std  # Smallest spread assumed, so a quiet sensor is not flagged for noise
+        self.last_time = None
+        self._count = 0
+        self._allocate(capacity)
+        self._subscribers = []
+
+        self.ticks = 0
+        self.raised = 0  # Conditions raised so far
+        self.cleared = 0
+        self.missing = 0  # Readings skipped because they were not finite
+
+    def _allocate(self, capacity):
+        old = self._count
+        columns = {}
+        for name, shape, dtype, fill in (("samples", None, np.int64, 0), ("mean", None, np.float64, 0.0),
+                                         ("var", None, np.float64, 0.0), ("slope", None, np.float64, 0.0),
+                                         ("last", None, np.float64, np.nan), ("last_at", None, np.float64, 0.0),
+                                         ("changed_at", None, np.float64, 0.0),
+                                         ("target", None, np.float64, np.nan), ("target_at", None, np.float64, 0.0),
+                                         ("active", 4, bool, False), ("since", 4, np.float64, 0.0)):
+            array = np.full((capacity, shape) if shape else capacity, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)[:old]
+            columns[name] = array
+        self.__dict__.update(columns)
+
+    def __len__(self):
+        return self._count
+
+    def subscribe(self, callback):
+        # callback([Alert, ...]) on every tick that raised or cleared something
+        self._subscribers.append(callback)
+
+    def attach(self, engine):
+        # Check every channel of the engine on each tick
+        def check(sample):
+            registry = engine.registry
+            self.update(registry.temperature, registry.target, sample.timestamp)
+        engine.subscribe(check)
+        return check
+
+    def update(self, temperature, target, timestamp):
+        # One tick of readings; returns the alerts raised or cleared by it
+        n = len(temperature)
+        if n > len(self.samples):
+            self._allocate(max(n, 2 * len(self.samples)))
+        if n > self._count:
+            new = slice(self._count, n)
+            self.last[new] = np.nan
+            self.changed_at[new] = timestamp
+            self.since[new] = timestamp
+            self._count = n
+        dt = 0.0 if self.last_time is None else max(0.0, timestamp - self.last_time)
+        self.last_time = timestamp
+        self.ticks += 1
+
+        samples = self.samples[:n]
+        mean = self.mean[:n]
+        var = self.var[:n]
+        slope = self.slope[:n]
+        last = self.last[:n]
+        last_at = self.last_at[:n]
+        conditions = np.empty((n, 4), dtype=bool)
+        valid = np.isfinite(temperature)
+        complete = bool(valid.all())
+        if not complete:
+            missing = ~valid
+            self.missing += int(missing.sum())
+
+        # Compared with the spread before this reading is folded in
+        delta = temperature - mean
+        if not complete:
+            delta[missing] = 0.0
+        deviation = np.abs(delta) / np.maximum(np.sqrt(var), self.min_std)
+        np.greater(deviation, self.z_limit, out=conditions[:, OUTLIER])
+        conditions[:, OUTLIER] &= samples >= self.warmup
+
+        # Plain Welford until the window is full, exponentially weighted after
+        samples += valid
+        alpha = np.maximum(1.0 / np.maximum(samples, 1), dt / self.window)
+        np.minimum(alpha, 1.0, out=alpha)
+        if not complete:
+            alpha[missing] = 0.0
+        mean += alpha * delta
+        var *= 1.0 - alpha
+        var += (1.0 - alpha) * alpha * delta * delta
+
+        # Change since the last finite reading, over the time since it (at least dt)
+        if dt > 0:
+            elapsed = timestamp - last_at
+            seen = ~np.isnan(last) & valid
+            step = np.where(seen, (temperature - last) * 60.0 / elapsed, 0.0)
+            weight = np.minimum(1.0, elapsed / self.rate_window)
+            if not complete:
+                weight[missing] = 0.0
+            slope += weight * (step - slope)
+        np.greater(np.abs(slope), self.max_rate, out=conditions[:, RATE])
+
+        changed = temperature != last
+        if not complete:
+            changed &= valid
+        self.changed_at[:n][changed] = timestamp
+        stuck_for = timestamp - self.changed_at[:n]
+        np.greater_equal(stuck_for, self.stuck_after, out=conditions[:, STUCK])
+        if complete:
+            last[:] = temperature
+            last_at[:] = timestamp
+        else:
+            last[valid] = temperature[valid]
+            last_at[valid] = timestamp
+
+        moved = target != self.target[:n]
+        self.target_at[:n][moved] = timestamp
+        self.target[:n] = target
+        np.greater(np.abs(temperature - target), self.band, out=conditions[:, BAND])
+        conditions[:, BAND] &= timestamp - self.target_at[:n] >= self.settle
+        if not complete:
+            conditions[missing] = self.active[:n][missing]  # No news is no change
+
+        # Debounce: a condition flips once it disagreed with the alert state for the hold time
+        active = self.active[:n]
+        since = self.since[:n]
+        differs = conditions != active
+        since[~differs] = timestamp
+        hold = np.where(active, self.clear_after, self.raise_after)
+        flip = differs & (timestamp - since >= hold)
+        if not flip.any():
+            return []
+        active ^= flip
+        since[flip] = timestamp
+
+        channels, kinds = np.nonzero(flip)
+        raised = active[channels, kinds]
+        values = np.where(kinds == RATE, slope[channels], temperature[channels])
+        extra = np.select([kinds == BAND, kinds == STUCK, kinds == OUTLIER],
+                          [target[channels], stuck_for[channels] / 60.0, deviation[channels]], np.nan)
+        alerts = [Alert(timestamp, *row) for row in zip(channels.tolist(), kinds.tolist(), raised.tolist(),
+                                                         values.tolist(), extra.tolist())]
+        up = int(raised.sum())
+        self.raised += up
+        self.cleared += len(alerts) - up
+        for callback in list(self._subscribers):
+            callback(alerts)
+        return alerts
+
+    @property
+    def active_count(self):
+        return int(self.active[:self._count].sum())
+
+    def active_alerts(self):
+        # (channel, kind) of every condition currently raised
+        return list(zip(*(a.tolist() for a in np.nonzero(self.active[:self._count]))))
+
+
+def log_alerts(log, alerts, registry):
+    # One event log record per raised or cleared condition
+    for alert in alerts:
+        name = registry.name(alert.channel)
+        if alert.raised:
+            log.append(LOG_CODES[alert.kind], alert.value, alert.value2, text=name, level=event_log.WARNING,
+                       ts=int(alert.timestamp * 1000))
+        else:
+            log.append(event_log.ALERT_CLEARED, text=f"{name}, {LABELS[alert.kind]}", ts=int(alert.timestamp * 1000))
+
+
+def describe(alert, registry):
+    # Same wording as the log record
+    name = registry.name(alert.channel)
+    if not alert.raised:
+        return event_log.MESSAGES[event_log.ALERT_CLEARED].format(text=f"{name}, {LABELS[alert.kind]}")
+    return event_log.MESSAGES[LOG_CODES[alert.kind]].format(value=alert.value, value2=alert.value2, text=name)
+
+
+class Notifier:
+    # Delivers raised alerts to people without flooding them. A token bucket
+    # allows `burst` notifications at once and one more every `interval`
+    # seconds; the same condition of a channel is not repeated within
+    # `cooldown` seconds. Alerts over the limit are counted and summed up in
+    # one notification once a token is free. Cleared alerts are only logged.
+    def __init__(self, deliver, burst=3, interval=30.0, cooldown=600.0):
+        self.deliver = deliver  # deliver(title, message)
+        self.enabled = True
+        self.burst = burst
+        self.interval = interval
+        self.cooldown = cooldown
+        self.tokens = float(burst)
+        self._refilled = None
+        self._notified = {}  # (channel, kind) -> when it was last delivered
+        self.pending = 0  # Alerts held back by the rate limit
+        self.delivered = 0
+        self.suppressed = 0
+
+    def _take(self, now):
+        if self._refilled is not None:
+            self.tokens = min(float(self.burst), self.tokens + (now - self._refilled) / self.interval)
+        self._refilled = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+    def notify(self, alerts, registry, now=None):
+        # Hand the raised alerts of one batch to deliver(), within the limits
+        if not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        for alert in alerts:
+            if not alert.raised:
+                continue
+            key = (alert.channel, alert.kind)
+            last = self._notified.get(key)
+            if last is not None and now - last < self.cooldown:
+                self.suppressed += 1
+                continue
+            self._notified[key] = now
+            if self._take(now):
+                self.delivered += 1
+                self.deliver("Temperature alert", describe(alert, registry))
+            else:
+                self.pending += 1
+                self.suppressed += 1
+        self.flush(now)
+
+    def flush(self, now=None):
+        # Sum up held-back alerts as soon as the rate limit allows
+        if not self.pending or not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        if self._take(now):
+            count, self.pending = self.pending, 0
+            self.delivered += 1
+            self.deliver("Temperature alerts", f"{count} more alert{'s' if count > 1 else ''}, see the System Log")
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.pending = 0  # Nothing held back is delivered later
+
+
+if __name__ == "__main__":
+    from sensor_registry import SensorRegistry, populate
+    from thermal_model import ThermalPlant
+    from controllers import CONTROLLERS, split_range
+    parser = argparse.ArgumentParser(description="Check simulated labs for alerts and time the checks")
+    parser.add_argument("--rooms", type=int, default=1000, help="simulated labs")
+    parser.add_argument("--ticks", type=int, default=1800, help="control steps")
+    parser.add_argument("--step", type=float, default=2.0, help="plant seconds per tick")
+    parser.add_argument("--faults", type=int, default=5, help="labs given a stuck sensor, and as many given a 5°C jump")
+    args = parser.parse_args()
+
+    registry = populate(SensorRegistry(args.rooms), args.rooms)
+    plant = ThermalPlant.varied(args.rooms, noise=0.3)
+    controller = CONTROLLERS["pid"]()
+    monitor = AlertMonitor()
+    notifier = Notifier(lambda title, message: print(f"{title}: {message}", file=sys.stderr))
+    temperature, humidity, target = registry.temperature, registry.humidity, registry.target
+    faulty = np.random.default_rng(1).choice(args.rooms, size=min(2 * args.faults, args.rooms), replace=False)
+    stuck, jump = np.array_split(faulty, 2)
+    elapsed = 0.0
+    for tick in range(args.ticks):
+        now = tick * args.step
+        heat, cool = split_range(controller.update(temperature, target, args.step))
+        plant.step(temperature, humidity, heat, cool, now, args.step)
+        if tick > args.ticks // 2:
+            temperature[stuck] = 24.0
+        if tick == 2 * args.ticks // 3:
+            temperature[jump] += 5.0
+        start = time.perf_counter()
+        batch = monitor.update(temperature, target, now)
+        elapsed += time.perf_counter() - start
+        notifier.notify(batch, registry, now)
+    print(f"{args.rooms} channels: {monitor.raised} raised, {monitor.cleared} cleared, {monitor.active_count} active, "
+          f"{notifier.delivered} notifications ({notifier.suppressed} held back), "
+          f"{elapsed / args.ticks * 1e6:.0f} µs/tick", file=sys.stderr)
@@ -0,0 +1,477 @@
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from actuators import HEAT, COOL, FAN
+from alerts import KINDS
+from history_store import ROW_FIELDS
+
+# Setpoints accepted over the API, as on the Settings tab
+TARGET_MIN = 18.0
+TARGET_MAX = 30.0
+
+# Largest request body accepted, in bytes
+MAX_BODY = 65536
+
+# Distinct responses cached per tick before the cache is emptied
+CACHE_ENTRIES = 256
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+# Copy of the readings of one tick, taken on the acquisition thread so
+# requests never see a tick half written
+Snapshot = namedtuple("Snapshot", ["timestamp", "tick", "temperature", "humidity", "target", "relays"])
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def encode(document):
+    # Strict JSON: a NaN that slipped through fails here rather than in the client's parser
+    return json.dumps(document, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def column(values, decimals):
+    # A float column as a JSON list, with NaN (no reading, e.g. a sensor without humidity) as null
+    rounded = values.round(decimals)
+    if np.isnan(rounded).any():
+        return [None if value != value else value for value in rounded.tolist()]
+    return rounded.tolist()
+
+
+def number(value, decimals):
+    return None if value is None or value != value else round(float(value), decimals)
+
+
+class ApiServer:
+    # Local HTTP/JSON API over a running ControlEngine, served from an
+    # asyncio loop while the engine runs in a thread of its own.
+    #
+    #   GET  /api/status                  engine state and request counters
+    #   GET  /api/channels                room and sensor name of every channel
+    #   GET  /api/readings[?channel=N]    latest readings, as columns for all channels
+    #   GET  /api/history?channel=N&start=T&end=T&points=N
+    #                                     samples or rollups (HistoryStore.range)
+    #   GET  /api/alerts                  conditions currently raised
+    #   POST /api/setpoint                {"target": 22.5, "channel": N | "room": name}
+    #   GET  /api/stream[?decimate=N]     WebSocket push of new samples (see SampleStream)
+    #
+    # Every GET response is built at most once per tick: the first request
+    # for a URL starts building it in a worker thread and every request for
+    # the same URL until the next tick awaits that result, so 100 pollers
+    # cost about as much as one. Responses carry the tick as their ETag and
+    # a poller that sends it back in If-None-Match gets an empty 304 (a
+    # setpoint change also changes the ETag).
+    # Connections are kept alive (HTTP/1.1).
+    def __init__(self, engine, history=None, monitor=None, stream=None, host="127.0.0.1", port=8080, max_points=5000):
+        self.engine = engine
+        self.history = history
+        self.monitor = monitor
+        self.stream = stream  # SampleStream serving /api/stream, or None
+        self.host = host
+        self.port = port
+        self.max_points = max_points
+        self.on_setpoint = None  # on_setpoint(channels, target) after a change
+        self._snapshot = None
+        self._server = None
+        self._cache = {}  # URL key -> future of the encoded body
+        self._cache_version = None
+        self._changes = 0  # Setpoint changes so far; part of the ETag, as they take effect within a tick
+        self.clients = 0  # Open connections
+        self.requests = 0
+        self.hits = 0  # Requests answered from the cache (or a 304)
+        self.misses = 0
+        engine.subscribe(self._record)
+        self._record(None)
+
+    def _record(self, sample):
+        # Runs on the acquisition thread after every tick
+        engine = self.engine
+        registry = engine.registry
+        n = len(registry)
+        relays = np.zeros((n, 3), dtype=bool)
+        confirmed = engine.actuators.confirmed[:n]
+        relays[:len(confirmed)] = confirmed
+        self._snapshot = Snapshot(sample.timestamp if sample is not None else time.time(), engine.tick,
+                                  registry.temperature[:n].copy(), registry.humidity[:n].copy(),
+                                  registry.target[:n].copy(), relays)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def _handle(self, reader, writer):
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 431, encode({"error": "request header too large"}), keep=False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                request = lines[0].split(" ")
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep = connection == "keep-alive" if request[-1] == "HTTP/1.0" else connection != "close"
+                try:
+                    if len(request) != 3:
+                        raise ApiError(400, "malformed request line")
+                    try:
+                        length = int(headers.get("content-length") or 0)
+                    except ValueError:
+                        keep = False
+                        raise ApiError(400, "bad Content-Length") from None
+                    if not 0 <= length <= MAX_BODY:
+                        keep = False
+                        raise ApiError(413, f"request body over {MAX_BODY} bytes")
+                    url = urlsplit(request[1])
+                    if self.stream is not None and url.path.rstrip("/") == "/api/stream":
+                        self.requests += 1
+                        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                        await self.stream.serve(reader, writer, headers, query)
+                        break
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload, etag = await self.dispatch(request[0], request[1], body,
+                                                                headers.get("if-none-match"))
+                except ApiError as error:
+                    status, payload, etag = error.status, encode({"error": str(error)}), None
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as error:  # Reported to the client; the server keeps running
+                    status, payload, etag = 500, encode({"error": f"{type(error).__name__}: {error}"}), None
+                await self._send(writer, status, payload, etag, keep)
+                if not keep:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def _send(self, writer, status, payload, etag=None, keep=True):
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(payload)}",
+                "Cache-Control: no-cache", f"Connection: {'keep-alive' if keep else 'close'}"]
+        if payload:
+            head.append("Content-Type: application/json")
+        if etag is not None:
+            head.append(f'ETag: "{etag}"')
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body=b"", if_none_match=None):
+        # (status, body, ETag) of one request
+        self.requests += 1
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        snapshot = self._snapshot
+        if path == "/api/setpoint":
+            if method != "POST":
+                raise ApiError(405, "use POST")
+            return 200, self._setpoint(body), None
+        if method != "GET":
+            raise ApiError(405, "use GET")
+
+        if path == "/api/status":
+            key, build = ("status",), self._status
+        elif path == "/api/channels":
+            key, build = ("channels",), self._channels
+        elif path == "/api/readings":
+            channel = self._channel(query, snapshot, required=False)
+            key, build = ("readings", channel), lambda s: self._readings(s, channel)
+        elif path == "/api/history":
+            if self.history is None:
+                raise ApiError(503, "no history is being recorded")
+            channel = self._channel(query, snapshot)
+            end = self._number(query, "end", snapshot.timestamp)
+            start = self._number(query, "start", end - 3600.0)
+            points = int(min(max(self._number(query, "points", 2000), 1), self.max_points))
+            if start >= end:
+                raise ApiError(400, "start must be before end")
+            key, build = ("history", channel, start, end, points), lambda s: self._history(channel, start, end, points)
+        elif path == "/api/alerts":
+            if self.monitor is None:
+                raise ApiError(503, "alerts are not being checked")
+            key, build = ("alerts",), self._alerts
+        else:
+            raise ApiError(404, f"no such resource: {url.path}")
+
+        etag = f"{snapshot.tick}.{self._changes}"
+        if if_none_match is not None and if_none_match.strip('"W/') == str(etag):
+            self.hits += 1
+            return 304, b"", etag
+        return 200, await self._cached(key, build, snapshot), etag
+
+    def _cached(self, key, build, snapshot):
+        version = (snapshot.tick, self._changes)
+        if version != self._cache_version or len(self._cache) >= CACHE_ENTRIES:
+            self._cache.clear()
+            self._cache_version = version
+        future = self._cache.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.get_running_loop().run_in_executor(None, lambda: encode(build(snapshot)))
+            self._cache[key] = future
+        else:
+            self.hits += 1
+        return asyncio.shield(future)
+
+    @staticmethod
+    def _number(query, name, default):
+        if name not in query:
+            return default
+        try:
+            value = float(query[name])
+        except ValueError:
+            value = math.nan
+        if not math.isfinite(value):
+            raise ApiError(400, f"{name} must be a finite number")
+        return value
+
+    def _channel(self, query, snapshot, required=True):
+        if "channel" not in query:
+            if required:
+                raise ApiError(400, "give a channel")
+            return None
+        try:
+            channel = int(query["channel"])
+        except ValueError:
+            raise ApiError(400, "channel must be a number") from None
+        if not 0 <= channel < len(snapshot.temperature):
+            raise ApiError(404, f"no channel {channel}")
+        return channel
+
+    def _status(self, snapshot):
+        engine = self.engine
+        return {"timestamp": snapshot.timestamp, "tick": snapshot.tick, "running": engine.running,
+                "channels": len(snapshot.temperature), "automation": engine.automation,
+                "controller": type(engine.controller).__name__, "threshold": engine.threshold,
+                "alerts": self.monitor.active_count if self.monitor is not None else None,
+                "viewers": len(self.stream.viewers) if self.stream is not None else None,
+                "clients": self.clients, "requests": self.requests, "cache_hits": self.hits,
+                "cache_misses": self.misses}
+
+    def _channels(self, snapshot):
+        registry = self.engine.registry
+        n = len(snapshot.temperature)
+        return {"rooms": registry.rooms[:n], "sensors": registry.sensors[:n]}
+
+    def _readings(self, snapshot, channel=None):
+        relays = snapshot.relays
+        if channel is not None:
+            registry = self.engine.registry
+            return {"timestamp": snapshot.timestamp, "tick": snapshot.tick, "channel": channel,
+                    "room": registry.rooms[channel], "sensor": registry.sensors[channel],
+                    "temperature": number(snapshot.temperature[channel], 2),
+                    "humidity": number(snapshot.humidity[channel], 1),
+                    "target": float(snapshot.target[channel]), "heating": bool(relays[channel, HEAT]),
+                    "cooling": bool(relays[channel, COOL]), "fans": bool(relays[channel, FAN])}
+        # One list per column, in channel order
+        return {"timestamp": snapshot.timestamp, "tick": snapshot.tick,
+                "temperature": column(snapshot.temperature, 2),
+                "humidity": column(snapshot.humidity, 1), "target": snapshot.target.tolist(),
+                "heating": relays[:, HEAT].astype(np.uint8).tolist(),
+                "cooling": relays[:, COOL].astype(np.uint8).tolist(),
+                "fans": relays[:, FAN].astype(np.uint8).tolist()}
+
+    def _history(self, channel, start, end, points):
+        tier = self.history.pick_tier(start, end, points)
+        rows = self.history.range(channel, start, end, points)
+        return {"channel": channel, "start": start, "end": end, "tier": tier, "fields": ROW_FIELDS,
+                "rows": [[number(value, 2) for value in row] for row in rows]}
+
+    def _alerts(self, snapshot):
+        registry = self.engine.registry
+        return {"timestamp": snapshot.timestamp,
+                "alerts": [{"channel": channel, "room": registry.rooms[channel], "sensor": registry.sensors[channel],
+                            "kind": KINDS[kind]} for channel, kind in self.monitor.active_alerts()]}
+
+    def _setpoint(self, body):
+        try:
+            request = json.loads(body or b"{}")
+            target = float(request["target"])
+        except (ValueError, TypeError, KeyError):
+            raise ApiError(400, 'send JSON like {"target": 22.5, "channel": 0}') from None
+        if not TARGET_MIN <= target <= TARGET_MAX:
+            raise ApiError(400, f"target must be between {TARGET_MIN:g} and {TARGET_MAX:g}°C")
+        registry = self.engine.registry
+        if "room" in request:
+            channels = [i for i, room in enumerate(registry.rooms) if room == request["room"]]
+            if not channels:
+                raise ApiError(404, f"no room {request['room']!r}")
+        else:
+            channel = request.get("channel", 0)
+            if isinstance(channel, bool) or not isinstance(channel, int):
+                raise ApiError(400, "channel must be a number")
+            if not 0 <= channel < len(registry):
+                raise ApiError(404, f"no channel {channel}")
+            channels = [channel]
+        # Picked up by the engine on its next tick, like a move of the target slider;
+        # readings show it at once
+        self.engine.set_targets(channels, target)
+        snapshot = self._snapshot
+        target_column = snapshot.target.copy()
+        target_column[channels] = target
+        self._snapshot = snapshot._replace(target=target_column)
+        self._changes += 1
+        if self.on_setpoint is not None:
+            self.on_setpoint(channels, target)
+        return encode({"channels": channels, "target": target})
+
+
+async def poll(host, port, path, seconds, counts):
+    # One keep-alive client polling path as fast as it is answered, sending back the ETag
+    reader, writer = await asyncio.open_connection(host, port)
+    etag = None
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            if etag:
+                request += f"If-None-Match: {etag}\r\n"
+            writer.write((request + "\r\n").encode("latin-1"))
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+            headers = dict(line.split(": ", 1) for line in head.split("\r\n")[1:] if ": " in line)
+            await reader.readexactly(int(headers["Content-Length"]))
+            etag = headers.get("ETag", etag)
+            status = head.split(" ", 2)[1]
+            counts[status] = counts.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def serve(server, args):
+    await server.start()
+    print(f"Serving on http://{server.host}:{server.port}/api/status", file=sys.stderr)
+    pusher = asyncio.ensure_future(server.stream.run())
+    if args.viewers:
+        # WebSocket viewers of this same server, then exit
+        url = f"ws://{server.host}:{server.port}/api/stream?decimate={args.decimate}"
+        start = time.perf_counter()
+        results = await asyncio.gather(*(watch(url, args.seconds) for _ in range(args.viewers)))
+        elapsed = time.perf_counter() - start
+        stream = server.stream
+        print(f"{args.viewers} viewers: {sum(f for f, _ in results)} frames, {sum(b for _, b in results)} bytes "
+              f"in {elapsed:.1f}s; {stream.batches} batches, {stream.encoded} frames serialized, {stream.sent} sent",
+              file=sys.stderr)
+        pusher.cancel()
+        return
+    if args.load:
+        # Pollers against this same server, then exit
+        counts = {}
+        start = time.perf_counter()
+        await asyncio.gather(*(poll(server.host, server.port, args.load_path, args.seconds, counts)
+                               for _ in range(args.load)))
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        print(f"{args.load} clients: {total} requests in {elapsed:.1f}s ({total / elapsed:.0f}/s), "
+              f"status {counts}, {server.misses} responses built for {server.requests} requests", file=sys.stderr)
+        return
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    from control_engine import ControlEngine
+    from controllers import CONTROLLERS
+    from sensor_registry import SensorRegistry, populate
+    from thermal_model import ThermalPlant
+    from history_store import HistoryStore
+    from alerts import AlertMonitor, describe
+    from sample_bridge import JitterStats
+    from sample_stream import SampleStream, watch
+    from arguments import positive
+
+    parser = argparse.ArgumentParser(description="Run the monitoring and control loop without a display, with an HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (0 = any free port)")
+    parser.add_argument("--rate", type=positive, default=0.5, help="samples per second")
+    parser.add_argument("--target", type=float, default=23.0, help="target temperature in °C")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="onoff", help="control algorithm")
+    parser.add_argument("--threshold", type=float, default=2.0, help="on/off hysteresis band in °C")
+    parser.add_argument("--rooms", type=int, default=0, help="simulate this many extra labs")
+    parser.add_argument("--sensors", type=int, default=1, help="sensors per simulated lab")
+    parser.add_argument("--plant", action="store_true", help="simulate rooms with the thermal model instead of a random walk")
+    parser.add_argument("--step", type=positive, default=2.0, help="plant seconds per tick")
+    parser.add_argument("--history", default="temperature_history.db", help="sample history database")
+    parser.add_argument("--no-history", action="store_true", help="do not record sample history")
+    parser.add_argument("--devices", default=None, help="read real sensors described in this device configuration (JSON)")
+    parser.add_argument("--load", type=int, default=0, help="poll the API with this many clients for --seconds, report and exit")
+    parser.add_argument("--load-path", default="/api/readings", help="what the --load clients poll")
+    parser.add_argument("--viewers", type=int, default=0, help="connect this many stream viewers for --seconds, report and exit")
+    parser.add_argument("--decimate", type=int, default=1, help="decimation the --viewers ask for")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long --load and --viewers run")
+    args = parser.parse_args()
+
+    registry = SensorRegistry()
+    source = None
+    if args.devices:
+        from sensor_io import HardwareSource, DevicePoller, load_devices
+        from actuators import ActuatorBank
+        poller = DevicePoller(load_devices(args.devices), interval=1.0 / args.rate)
+        source = HardwareSource(poller, actuators=ActuatorBank(bus=poller), target=args.target,
+                                on_status=lambda s: print(f"{s.device}: {'online' if s.online else 'offline'} {s.message}", file=sys.stderr))
+        poller.start()
+        # The first configured sensor becomes the primary channel
+        if not source.prime(registry):
+            poller.stop()
+            sys.exit(f"No sensor in {args.devices} answered")
+    engine = ControlEngine(target=args.target, registry=registry, controller=CONTROLLERS[args.controller](), dt=args.step)
+    engine.threshold = args.threshold
+    populate(engine.registry, args.rooms, args.sensors, target=args.target)
+    if args.plant:
+        engine.plant = ThermalPlant.varied(len(engine.registry), noise=0.3)
+    if source is not None:
+        engine.actuators = source.actuators
+        engine.source = source
+    history = None
+    if not args.no_history:
+        history = HistoryStore(args.history, sample_interval=1.0 / args.rate)
+        history.attach(engine)
+    monitor = AlertMonitor()
+    monitor.attach(engine)
+    monitor.subscribe(lambda alerts: [print(describe(alert, engine.registry), file=sys.stderr) for alert in alerts])
+
+    server = ApiServer(engine, history, monitor, SampleStream(engine), args.host, args.port)
+    server.on_setpoint = lambda channels, target: print(
+        f"Target of {len(channels)} channel{'s' if len(channels) > 1 else ''} set to {target:g}°C", file=sys.stderr)
+    jitter = JitterStats()
+    engine.running = True
+    acquisition = threading.Thread(target=engine.run, name="acquisition", kwargs={"rate_hz": args.rate, "jitter": jitter},
+                                   daemon=True)
+    acquisition.start()
+    try:
+        asyncio.run(serve(server, args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        engine.running = False
+        acquisition.join()
+        if args.devices:
+            engine.source.close()
+        if history is not None:
+            history.close()
+    print(f"{engine.tick} ticks, {server.requests} requests, {server.misses} responses built, "
+          f"tick lateness: {jitter.summary()}", file=sys.stderr)
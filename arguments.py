@@ -0,0 +1,21 @@
+import math
+import argparse
+
+# argparse types shared by the command-line entry points. NaN and infinity
+# are refused too, since every one of these values ends up in arithmetic.
+
+
+def positive(text):
+    # A finite number above zero
+    value = float(text)
+    if not 0 < value < math.inf:
+        raise argparse.ArgumentTypeError(f"must be a positive number, not {text}")
+    return value
+
+
+def non_negative(text):
+    # A finite number of zero or more, for options where 0 means "no limit"
+    value = float(text)
+    if not 0 <= value < math.inf:
+        raise argparse.ArgumentTypeError(f"must be zero or a positive number, not {text}")
+    return value
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from control_engine import ControlEngine
+from event_log import EventLog
+import event_log
+from sensor_registry import populate
+from temp_control_system import TemperatureControlSystem
+
+# Samples between two frames when timing the tick path (100 Hz sampling, 20 fps)
+TICKS_PER_FRAME = 5
+
+
+def best(run, repeat):
+    # Fastest of `repeat` runs after an untimed warm-up one, in seconds
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def make_window(app, rooms=0, log=None):
+    engine = ControlEngine(dt=0.01)
+    populate(engine.registry, rooms)
+    window = TemperatureControlSystem(engine, None, log if log is not None else EventLog(10000))
+    window.timer.stop()
+    window.frame_timer.stop()  # Frames are driven by the benchmark
+    window.show()
+    app.processEvents()
+    return window
+
+
+def bench_ticks(app, ticks, repeat, rooms=0):
+    # The whole update path on one thread: engine steps into the sample ring
+    # and the window drains and repaints every TICKS_PER_FRAME samples
+    window = make_window(app, rooms)
+    engine = window.engine
+    engine.running = True
+
+    def run():
+        for i in range(ticks):
+            engine.step()
+            if i % TICKS_PER_FRAME == 0:
+                window.render_frame()
+                app.processEvents()
+
+    seconds = best(run, repeat)
+    window.close()
+    return seconds / ticks
+
+
+def bench_plot(app, length, repeat, frames=20):
+    # One trend redraw with `length` samples in view (fully zoomed out)
+    window = make_window(app)
+    times = np.arange(length, dtype=np.float64) * 2.0
+    values = 23.0 + np.sin(times / 600.0)
+    for series in (window.temp_series, window.humidity_series):
+        series.clear()
+        series.extend(times, values)
+    window.follow_live = False
+    window.plot_widget.setXRange(times[0], times[-1], padding=0)
+    app.processEvents()
+
+    def run():
+        for _ in range(frames):
+            window.refresh_trend()
+            window.plot_widget.repaint()
+
+    seconds = best(run, repeat)
+    window.close()
+    return seconds / frames
+
+
+def bench_log(app, size, repeat, appends=200):
+    # Appending to a log that already holds `size` records, with the log
+    # panel tailing on screen
+    log = EventLog(size)
+    for i in range(size):
+        log.append(event_log.READING, 23.0, 45.0)
+    window = make_window(app, log=log)
+    window.tabs.setCurrentWidget(window.logs_tab)
+    app.processEvents()
+
+    def run():
+        for _ in range(appends):
+            log.append(event_log.READING, 23.0, 45.0)
+            app.processEvents()
+
+    seconds = best(run, repeat)
+    window.close()
+    return seconds / appends
+
+
+def run(quick=False, repeat=3):
+    # µs per tick, per redraw and per log record, keyed by benchmark name
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = {}
+    for rooms in ((0, 100) if quick else (0, 100, 1000)):
+        results[f"dashboard.tick@{rooms + 1}ch"] = bench_ticks(app, 500 if quick else 2000, repeat, rooms) * 1e6
+    for length in ((1000, 100000) if quick else (1000, 10000, 100000, 200000)):
+        results[f"dashboard.plot@{length}"] = bench_plot(app, length, repeat) * 1e6
+    for size in ((1000, 100000) if quick else (1000, 10000, 100000)):
+        results[f"dashboard.log_append@{size}"] = bench_log(app, size, repeat) * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the dashboard update, trend redraw and log panel")
+    parser.add_argument("--quick", action="store_true", help="fewer and smaller cases")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is reported)")
+    args = parser.parse_args()
+    for name, value in run(args.quick, args.repeat).items():
+        print(f"{name:<32} {value:10.1f} µs")
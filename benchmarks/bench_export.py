@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+import event_log
+from event_log import EventLog
+import log_export
+import history_export
+from history_store import HistoryStore
+
+
+def filled_log(count, seed=0):
+    # A log like a long session's: mostly readings, some actions and warnings
+    rng = np.random.default_rng(seed)
+    log = EventLog(count)
+    codes = [event_log.READING] * 8 + [event_log.COOLING_STARTED, event_log.TARGET_CHANGED]
+    for i, code in enumerate(rng.choice(codes, count)):
+        log.append(int(code), 20.0 + rng.random() * 5, 40.0 + rng.random() * 10, ts=1_700_000_000_000 + i * 2000)
+    return log
+
+
+def bench_log_export(fmt, count, repeat, directory):
+    # One export of `count` records through the same writer the export worker uses
+    log = filled_log(count)
+    path = os.path.join(directory, f"log.{fmt}")
+    # Untimed warm-up on the first chunk, so the writer's imports and first
+    # use of its fonts or libraries are not charged to the first timed run
+    _, chunks = log.snapshot(10000)
+    first = next(chunks)
+    log_export.WRITERS[fmt](log, path, len(first), [first], lambda done: None)
+    best = float("inf")
+    for _ in range(repeat):
+        size, chunks = log.snapshot(10000)
+        start = time.perf_counter()
+        log_export.WRITERS[fmt](log, path, size, chunks, lambda done: None)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_history_export(fmt, rows, repeat, directory):
+    store = HistoryStore(os.path.join(directory, f"history_{rows}.db"), flush_rows=100000)
+    if not store.count_samples():
+        channels = 10
+        for i in range(rows // channels):
+            for channel in range(channels):
+                store.append(1.7e9 + i * 2.0, channel, 23.0 + (i % 7) * 0.1, 45.0, 23.0, i % 4)
+        store.flush()
+    path = os.path.join(directory, "history" + history_export.FORMATS[fmt])
+    history_export.export_history(store, path, fmt)  # Untimed warm-up (imports pyarrow)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        history_export.export_history(store, path, fmt)
+        best = min(best, time.perf_counter() - start)
+    store.close()
+    return best
+
+
+def run(quick=False, repeat=3):
+    # µs per exported record, keyed by benchmark name
+    app = QApplication.instance() or QApplication(sys.argv[:1])  # The PDF writer paints text
+    counts = (1000, 10000) if quick else (1000, 10000, 100000)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in log_export.WRITERS:
+            for count in counts:
+                if fmt in ("docx", "pdf") and count > 10000 and repeat > 1:
+                    runs = 1  # Several seconds each
+                else:
+                    runs = repeat
+                results[f"export.{fmt}@{count}"] = bench_log_export(fmt, count, runs, directory) / count * 1e6
+        rows = 100000 if quick else 1000000
+        for fmt in history_export.FORMATS:
+            results[f"export.{fmt}@{rows}"] = bench_history_export(fmt, rows, repeat, directory) / rows * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time log and history exports per record")
+    parser.add_argument("--quick", action="store_true", help="fewer and smaller cases")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is reported)")
+    args = parser.parse_args()
+    for name, value in run(args.quick, args.repeat).items():
+        print(f"{name:<32} {value:10.2f} µs/record")
@@ -0,0 +1,38 @@
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# The line temp_control_system.py --startup-report prints, in ms
+REPORT = re.compile(r"Startup: imports (\d+) ms, window (\d+) ms, first frame (\d+) ms, total (\d+) ms")
+
+
+def start_once():
+    # One cold start of the dashboard up to its first frame, in a new process
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "temp_control_system.py"), "--no-history",
+                             "--startup-report", "--quit-after-startup"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    match = REPORT.search(result.stderr)
+    if match is None:
+        raise RuntimeError(f"no startup report (exit status {result.returncode}):\n{result.stderr}")
+    return dict(zip(("imports", "window", "first_frame", "total"), map(int, match.groups())))
+
+
+def run(quick=False, repeat=3):
+    # µs of each startup phase, from the fastest of `repeat` starts
+    starts = [start_once() for _ in range(max(repeat, 1 if quick else 5))]
+    fastest = min(starts, key=lambda start: start["total"])
+    return {f"startup.{phase}": ms * 1000.0 for phase, ms in fastest.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time cold starts of the dashboard up to its first frame")
+    parser.add_argument("--quick", action="store_true", help="fewer starts")
+    parser.add_argument("--repeat", type=int, default=3, help="starts (best is reported)")
+    args = parser.parse_args()
+    for name, value in run(args.quick, args.repeat).items():
+        print(f"{name:<32} {value / 1000:10.0f} ms")
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QLabel
+import styles
+
+COLORS = {"ok": "#2ecc71", "warn": "#e67e22", "hot": "#e74c3c", "cold": "#3498db"}
+
+
+def error_trace(ticks, seed=0):
+    # Error readings like the dashboard sees: a random walk around the target
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.uniform(-0.5, 0.5, ticks)).clip(-4, 4)
+
+
+def per_tick_stylesheet(label, errors, app):
+    # What the dashboard used to do: a new stylesheet string on every tick
+    for error in errors:
+        label.setText(f"{error:+.1f}°C")
+        color = COLORS[styles.error_band(error)]
+        label.setStyleSheet(f"font-size: 32px; font-weight: bold; color: {color}; padding: 10px;")
+        app.processEvents()
+
+
+def cached_state(label, errors, app):
+    # Stylesheet parsed once, dynamic property re-polished on band changes only
+    label.setStyleSheet(styles.ERROR_LABEL)
+    for error in errors:
+        label.setText(f"{error:+.1f}°C")
+        styles.set_state(label, "band", styles.error_band(error))
+        app.processEvents()
+
+
+def measure(run, label, errors, app, repeat):
+    # Fastest of `repeat` runs after an untimed warm-up one, in seconds
+    run(label, errors, app)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(label, errors, app)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(quick=False, repeat=3):
+    # µs per tick of both strategies, keyed by benchmark name
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    label = QLabel()
+    label.show()
+    errors = error_trace(1000 if quick else 5000)
+    results = {}
+    for name, strategy in (("styles.per_tick_stylesheet", per_tick_stylesheet), ("styles.cached_state", cached_state)):
+        results[name] = measure(strategy, label, errors, app, repeat) / len(errors) * 1e6
+    label.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the error indicator colour update")
+    parser.add_argument("--ticks", type=int, default=5000, help="readings per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per strategy (best is reported)")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    label = QLabel()
+    label.show()
+    errors = error_trace(args.ticks)
+    changes = int(np.count_nonzero(np.diff([list(COLORS).index(styles.error_band(e)) for e in errors])))
+    print(f"{args.ticks} ticks, {changes} band changes")
+    old = measure(per_tick_stylesheet, label, errors, app, args.repeat)
+    new = measure(cached_state, label, errors, app, args.repeat)
+    for name, best in (("setStyleSheet per tick", old), ("cached state", new)):
+        print(f"{name:<22} {best / len(errors) * 1e6:8.1f} µs/tick")
+    print(f"speedup                {old / new:8.1f}x")
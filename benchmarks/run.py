@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+import bench_dashboard
+import bench_export
+import bench_startup
+import bench_styles
+
+SUITES = {"dashboard": bench_dashboard, "export": bench_export, "startup": bench_startup,
+          "styles": bench_styles}
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def compare(results, baseline, tolerance):
+    # (name, value, baseline value, ratio, regressed) for every result
+    rows = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        ratio = value / old if old else None
+        rows.append((name, value, old, ratio, ratio is not None and ratio > 1.0 + tolerance))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and compare it with the stored baseline")
+    parser.add_argument("suites", nargs="*", choices=[[]] + sorted(SUITES), help="suites to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="fewer and smaller cases")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is reported)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline results (JSON)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown over the baseline reported as a regression")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--output", default=None, help="also write these results to this JSON file")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])  # Shared by every suite
+    results = {}
+    for name in args.suites or sorted(SUITES):
+        start = time.perf_counter()
+        results.update(SUITES[name].run(args.quick, args.repeat))
+        print(f"{name}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    print(f"{'benchmark':<34}{'µs':>12}{'baseline':>12}{'ratio':>8}")
+    regressions = 0
+    for name, value, old, ratio, regressed in compare(results, baseline, args.tolerance):
+        regressions += regressed
+        print(f"{name:<34}{value:>12.2f}{old if old is not None else float('nan'):>12.2f}"
+              f"{ratio if ratio is not None else float('nan'):>8.2f}" + ("  REGRESSION" if regressed else ""))
+
+    report = {"time": time.time(), "machine": platform.platform(), "python": platform.python_version(),
+              "quick": args.quick, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+    if args.save:
+        report["results"] = {**baseline, **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+    elif regressions:
+        print(f"{regressions} benchmark(s) more than {args.tolerance:.0%} slower than the baseline", file=sys.stderr)
+        sys.exit(1)
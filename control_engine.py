@@ -0,0 +1,275 @@
+import sys
+import time
+import argparse
+import threading
+from collections import namedtuple
+import numpy as np
+from sensor_registry import SensorRegistry, populate
+from controllers import CONTROLLERS, OnOffController, split_range
+from thermal_model import ThermalPlant
+from actuators import ActuatorBank
+from sample_bridge import JitterStats
+from diagnostics import Profiler, dump
+from alerts import AlertMonitor, describe
+from history_store import HistoryStore
+from arguments import non_negative
+
+# One reading produced by the engine on every tick
+Sample = namedtuple("Sample", ["timestamp", "tick", "temperature", "humidity", "target", "error"])
+
+# Temperature change per second at full heating or cooling output
+HVAC_RATE = 0.25
+
+
+class ControlEngine:
+    # GUI-free acquisition and control loop. Holds the numeric plant state of
+    # every channel in a SensorRegistry and pushes a Sample of the primary
+    # channel (index 0) to its subscribers (the window is just one of them).
+    def __init__(self, temperature=24.5, humidity=45.0, target=23.0, registry=None, controller=None, dt=2.0, plant=None):
+        self.registry = registry if registry is not None else SensorRegistry()
+        if not len(self.registry):
+            self.registry.add_channel("Computer Laboratory", "Main Sensor",
+                                      temperature=temperature, humidity=humidity, target=target)
+        self.controller = controller if controller is not None else OnOffController()
+        # Held by step() while it reads and updates the channels, and by every
+        # setpoint, threshold or controller change from another thread (GUI,
+        # API): a source that adds channels reallocates the registry's arrays,
+        # and a target written meanwhile would land in the old ones and be lost
+        self._lock = threading.Lock()
+        self.threshold = 2.0
+        self.dt = dt  # Seconds of plant time per step, whatever the wall-clock rate
+        self.plant = plant  # ThermalPlant with one room per channel, or None for a random walk
+        self.source = None  # Recorded readings (e.g. a ReplaySource) used instead of the simulation
+        self.actuators = ActuatorBank()  # Relays switched from the heating/cooling demand
+        self.start_time = time.time()  # Plant time of tick 0
+        self.profiler = Profiler()  # Stage timings of step(), off unless enabled
+        self._rng = np.random.default_rng()
+
+        self.running = False
+        self.automation = True
+        self.cooling = False  # Manual overrides for the primary channel when automation is off
+        self.heating = False
+        self.fans = False  # Fans of the primary channel kept on
+
+        self.tick = 0
+        self._subscribers = []
+
+    # The primary channel is what the single-room dashboard shows and controls
+    @property
+    def temperature(self):
+        return float(self.registry.temperature[0])
+
+    @property
+    def humidity(self):
+        return float(self.registry.humidity[0])
+
+    @property
+    def target(self):
+        return float(self.registry.target[0])
+
+    @target.setter
+    def target(self, value):
+        self.set_targets(0, value)
+
+    def set_targets(self, channels, value):
+        # Setpoint of one channel or a list of them, safe from any thread
+        with self._lock:
+            self.registry.target[channels] = value
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, value):
+        # The threshold slider is the hysteresis band of on/off control
+        with self._lock:
+            self._threshold = float(value)
+            self.controller.band = self._threshold
+
+    def set_controller(self, controller):
+        with self._lock:
+            controller.band = self._threshold
+            self.controller = controller
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def step(self):
+        # Only sample if system is running
+        if not self.running:
+            return None
+
+        lap = self.profiler.lap()
+        with self._lock:
+            sample = self._advance(lap)
+        if sample is None:
+            return None
+        for callback in list(self._subscribers):
+            callback(sample)
+        lap("publish")
+        return sample
+
+    def _advance(self, lap):
+        # Reads or simulates one tick of every channel; the Sample of the primary one
+        registry = self.registry
+        timestamp = time.time()
+        if self.source is not None:
+            # Replayed readings go through the same control path as live ones
+            timestamp = self.source.read(registry)
+            if timestamp is None:
+                self.running = False  # End of the recording
+                return None
+            lap("sample")
+
+        n = registry.count
+        temperature = registry.temperature
+        humidity = registry.humidity
+        target = registry.target
+        heat = registry.heat
+        cool = registry.cool
+
+        # One control step on every channel, or the manual buttons on the primary one
+        if self.automation:
+            heat[:], cool[:] = split_range(self.controller.update(temperature, target, self.dt))
+        else:
+            heat[:] = 0.0
+            cool[:] = 0.0
+            heat[0] = 1.0 if self.heating else 0.0
+            cool[0] = 1.0 if self.cooling else 0.0
+        # Only relays whose state changed are written to the bus
+        self.actuators.update(heat, cool, (0,) if self.fans else ())
+        lap("control")
+
+        # A recording already holds the resulting readings; otherwise simulate them
+        if self.source is None:
+            self._simulate(temperature, humidity, heat, cool)
+            lap("sample")
+
+        self.tick += 1
+
+        new_temp = float(temperature[0])
+        new_humidity = float(humidity[0])
+        new_target = float(target[0])
+        return Sample(timestamp, self.tick, new_temp, new_humidity,
+                      new_target, new_temp - new_target)
+
+    def _simulate(self, temperature, humidity, heat, cool):
+        n = len(temperature)
+        if self.plant is not None:
+            if self.plant.count != n:
+                raise ValueError(f"Plant models {self.plant.count} rooms but the registry has {n} channels")
+            self.plant.step(temperature, humidity, heat, cool, self.start_time + self.tick * self.dt, self.dt)
+            return
+
+        # Simulate some random variation on every channel at once, plus the HVAC effect.
+        # The drift is scaled so its spread over time does not depend on the step (2 s = unscaled).
+        drift = np.sqrt(self.dt / 2.0)
+        temperature += self._rng.uniform(-0.5 * drift, 0.5 * drift, n)
+        temperature += (HVAC_RATE * self.dt) * (heat - cool)
+
+        # Humidity drifts slowly and is kept within reasonable bounds
+        humidity += self._rng.uniform(-drift, drift, n)
+        np.clip(humidity, 30.0, 70.0, out=humidity)
+
+    def run(self, rate_hz=None, max_ticks=None, jitter=None):
+        # Blocking loop for headless use or a worker thread. rate_hz=None runs
+        # as fast as possible. jitter (a JitterStats) records how late each
+        # tick starts against its schedule.
+        self.running = True
+        period = 1.0 / rate_hz if rate_hz else 0.0
+        next_tick = time.perf_counter()
+        count = 0
+        try:
+            while self.running and (max_ticks is None or count < max_ticks):
+                if jitter is not None and period:
+                    jitter.add(time.perf_counter() - next_tick)
+                self.step()
+                count += 1
+                if period:
+                    next_tick += period
+                    delay = next_tick - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_tick = time.perf_counter()  # Fell behind, don't try to catch up
+        finally:
+            self.running = False
+            self.actuators.off()
+        return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the temperature control engine without a display")
+    parser.add_argument("--rate", type=non_negative, default=0.5, help="samples per second (0 = as fast as possible)")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many samples")
+    parser.add_argument("--target", type=float, default=23.0, help="target temperature in °C")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="onoff", help="control algorithm")
+    parser.add_argument("--threshold", type=float, default=2.0, help="on/off hysteresis band in °C")
+    parser.add_argument("--rooms", type=int, default=0, help="simulate this many extra labs")
+    parser.add_argument("--sensors", type=int, default=1, help="sensors per simulated lab")
+    parser.add_argument("--history", default=None, help="record samples to this history database")
+    parser.add_argument("--plant", action="store_true", help="simulate rooms with the thermal model instead of a random walk")
+    parser.add_argument("--step", type=float, default=2.0, help="plant seconds per tick")
+    parser.add_argument("--devices", default=None, help="read real sensors described in this device configuration (JSON)")
+    parser.add_argument("--profile", default=None, help="time every stage of the loop and write the results to this JSON file")
+    parser.add_argument("--alerts", action="store_true", help="print band, rate, stuck-sensor and outlier alerts as they are raised and cleared")
+    parser.add_argument("--quiet", action="store_true", help="only print the final throughput")
+    args = parser.parse_args()
+
+    registry = SensorRegistry()
+    source = None
+    if args.devices:
+        from sensor_io import HardwareSource, DevicePoller, load_devices
+        poller = DevicePoller(load_devices(args.devices), interval=1.0 / args.rate if args.rate else 1.0)
+        source = HardwareSource(poller, actuators=ActuatorBank(bus=poller), target=args.target,
+                                on_status=lambda s: print(f"{s.device}: {'online' if s.online else 'offline'} {s.message}", file=sys.stderr))
+        poller.start()
+        # The first configured sensor becomes the primary channel
+        if not source.prime(registry):
+            poller.stop()
+            sys.exit(f"No sensor in {args.devices} answered")
+    engine = ControlEngine(target=args.target, registry=registry, controller=CONTROLLERS[args.controller](), dt=args.step)
+    engine.threshold = args.threshold
+    populate(engine.registry, args.rooms, args.sensors, target=args.target)
+    if args.plant:
+        engine.plant = ThermalPlant.varied(len(engine.registry), noise=0.3)
+    if source is not None:
+        engine.actuators = source.actuators
+        engine.source = source
+    jitter = JitterStats()
+    engine.profiler.enabled = bool(args.profile)
+    history = None
+    if args.history:
+        history = HistoryStore(args.history, sample_interval=1.0 / args.rate if args.rate else 0.0)
+        history.attach(engine)
+    monitor = None
+    if args.alerts:
+        monitor = AlertMonitor()
+        monitor.attach(engine)
+        monitor.subscribe(lambda alerts: [print(describe(alert, engine.registry), file=sys.stderr) for alert in alerts])
+    if not args.quiet:
+        engine.subscribe(lambda s: print(f"{s.tick}\t{s.temperature:.2f}°C\t{s.humidity:.0f}%\t{s.error:+.2f}°C"))
+
+    start = time.perf_counter()
+    try:
+        ticks = engine.run(rate_hz=args.rate or None, max_ticks=args.ticks, jitter=jitter)
+    except KeyboardInterrupt:
+        ticks = engine.tick
+    elapsed = time.perf_counter() - start
+    if args.devices:
+        engine.source.close()
+    if history is not None:
+        history.close()
+    print(f"{len(engine.registry)} channels, {ticks} ticks in {elapsed:.2f}s ({ticks / elapsed if elapsed else 0:.0f} ticks/s), "
+          f"{engine.actuators.commands} actuator commands in {engine.actuators.batches} batches", file=sys.stderr)
+    if monitor is not None:
+        print(f"{monitor.raised} alerts raised, {monitor.active_count} still active", file=sys.stderr)
+    if jitter.count:
+        print(f"tick lateness: {jitter.summary()}", file=sys.stderr)
+    if args.profile:
+        dump(args.profile, engine.profiler, jitter)
@@ -0,0 +1,113 @@
+import numpy as np
+
+
+class Controller:
+    # Vectorized temperature controller for every channel at once. update()
+    # takes the temperature and target columns and returns one output per
+    # channel in [-1, 1]: positive asks for heating, negative for cooling.
+    name = "controller"
+
+    def __init__(self):
+        self.band = 2.0  # Hysteresis band in °C (only used by on/off control)
+        self._count = 0
+
+    def _ensure(self, count):
+        # Grow per-channel state when channels are added, keeping existing state
+        if count > self._count:
+            self._grow(count)
+            self._count = count
+
+    def _grow(self, count):
+        pass
+
+    def reset(self):
+        self._count = 0
+        self._grow(0)
+
+    def update(self, temperature, target, dt):
+        """Outputs in [-1, 1] for every channel this step; subclasses override it."""
+        raise NotImplementedError
+
+
+def _grown(array, count, fill=0):
+    grown = np.full(count, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class OnOffController(Controller):
+    # Full heating or cooling once the temperature leaves target ± band, held
+    # until the target is reached again
+    name = "On/Off"
+
+    def __init__(self, band=2.0):
+        super().__init__()
+        self.band = band
+        self._state = np.zeros(0, dtype=np.int8)  # -1 cooling, 0 idle, 1 heating
+
+    def _grow(self, count):
+        self._state = _grown(self._state[:count], count)
+
+    def update(self, temperature, target, dt):
+        n = len(temperature)
+        self._ensure(n)
+        state = self._state[:n]
+        error = target - temperature
+        state[error < -self.band] = -1
+        state[error > self.band] = 1
+        state[(state < 0) & (error >= 0)] = 0
+        state[(state > 0) & (error <= 0)] = 0
+        return state.astype(np.float64)
+
+
+class PidController(Controller):
+    # PID with derivative on measurement (no kick on setpoint changes) and
+    # clamping anti-windup: the integral only moves while the output is not
+    # saturated in the direction the error is pushing.
+    name = "PID"
+
+    def __init__(self, kp=0.5, ki=0.01, kd=1.0):
+        super().__init__()
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self._integral = np.zeros(0)
+        self._last = np.zeros(0)
+        self._primed = np.zeros(0, dtype=bool)
+
+    def _grow(self, count):
+        self._integral = _grown(self._integral[:count], count, 0.0)
+        self._last = _grown(self._last[:count], count, 0.0)
+        self._primed = _grown(self._primed[:count], count, False)
+
+    def update(self, temperature, target, dt):
+        n = len(temperature)
+        self._ensure(n)
+        integral = self._integral[:n]
+        last = self._last[:n]
+        primed = self._primed[:n]
+
+        error = target - temperature
+        np.copyto(last, temperature, where=~primed)  # No derivative on the first step
+        derivative = (temperature - last) / dt if dt > 0 else np.zeros(n)
+        candidate = integral + self.ki * error * dt
+        raw = self.kp * error + candidate - self.kd * derivative
+        output = np.clip(raw, -1.0, 1.0)
+        winding = (raw != output) & (np.sign(error) == np.sign(raw))
+        np.copyto(integral, candidate, where=~winding)
+
+        last[:] = temperature
+        primed[:] = True
+        return output
+
+
+# Controllers offered in the settings tab, in order
+CONTROLLERS = {"onoff": OnOffController, "pid": PidController}
+
+
+def split_range(output, deadband=0.05):
+    # Split controller outputs into (heating, cooling) demands in [0, 1]. Inside
+    # the deadband neither runs, so the two never fight over a channel.
+    heat = np.where(output > deadband, output, 0.0)
+    cool = np.where(output < -deadband, -output, 0.0)
+    return heat, cool
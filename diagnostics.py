@@ -0,0 +1,221 @@
+import sys
+import json
+import time
+import argparse
+import threading
+import traceback
+from collections import deque
+
+# Latency histograms use power-of-two buckets in microseconds: bucket 0 is
+# under 1 µs, bucket i covers [2^(i-1), 2^i) µs, the last one everything above
+BUCKETS = 26
+BUCKET_EDGES_US = [0] + [1 << i for i in range(BUCKETS - 1)]
+
+
+def bucket(seconds):
+    # Histogram bucket of a duration
+    return min(int(seconds * 1e6).bit_length(), BUCKETS - 1) if seconds > 0 else 0
+
+
+class Stage:
+    # Count, total, worst case and histogram of one timed stage
+    __slots__ = ("name", "count", "total", "max", "histogram")
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram[bucket(seconds)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        # Upper edge of the bucket holding the q-th percentile, in seconds
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if n and seen >= rank:
+                upper = BUCKET_EDGES_US[i + 1] * 1e-6 if i + 1 < BUCKETS else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "mean_us": self.mean * 1e6, "p50_us": self.percentile(50) * 1e6,
+                "p99_us": self.percentile(99) * 1e6, "max_us": self.max * 1e6, "histogram": list(self.histogram)}
+
+
+class Lap:
+    # Times consecutive stages of one pass: lap("name") adds the time since
+    # the previous lap (or the start) to that stage
+    __slots__ = ("profiler", "last")
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.last = time.perf_counter()
+
+    def __call__(self, name):
+        now = time.perf_counter()
+        self.profiler.stage(name).add(now - self.last)
+        self.last = now
+
+
+class _NullLap:
+    # What lap() returns while instrumentation is off: one no-op call per stage
+    __slots__ = ()
+
+    def __call__(self, name):
+        pass
+
+
+NULL_LAP = _NullLap()
+
+
+class Profiler:
+    # Per-stage timers for the hot paths. Disabled by default, in which case
+    # lap() hands out NULL_LAP and nothing is measured.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.started = time.time()
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        return stage
+
+    def lap(self):
+        return Lap(self) if self.enabled else NULL_LAP
+
+    def reset(self):
+        for stage in list(self.stages.values()):
+            stage.reset()
+        self.started = time.time()
+
+    def to_dict(self):
+        return {name: stage.to_dict() for name, stage in list(self.stages.items())}
+
+
+class StallWatchdog:
+    # Detects a stalled event loop. The loop calls beat() from a fast timer;
+    # the lateness of each beat goes into `lateness`, and a watcher thread
+    # that sees no beat for `threshold` seconds records what the loop's thread
+    # was executing at the time.
+    def __init__(self, interval=0.01, threshold=0.2, keep=20):
+        self.interval = interval  # Expected seconds between beats
+        self.threshold = threshold
+        self.lateness = Stage("event loop")
+        self.stalls = deque(maxlen=keep)  # Newest last
+        self.stall_count = 0
+        self._last = None
+        self._target = None  # Thread id of the event loop
+        self._reported = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._target = threading.get_ident()
+        self._last = time.perf_counter()
+        self._reported = False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def beat(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            late = now - self._last - self.interval
+            self.lateness.add(late)
+            if self._reported and self.stalls:
+                self.stalls[-1]["duration_ms"] = (now - self._last) * 1e3  # How long it finally lasted
+        self._last = now
+        self._reported = False
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            last = self._last
+            idle = time.perf_counter() - last
+            if idle < self.threshold or self._reported:
+                continue
+            frame = sys._current_frames().get(self._target)
+            stack = traceback.format_stack(frame, limit=8) if frame is not None else []
+            self.stalls.append({"time": time.time() - idle, "duration_ms": idle * 1e3,
+                                "stack": [line.strip() for line in stack]})
+            self.stall_count += 1
+            self._reported = True
+
+    def to_dict(self):
+        return {"threshold_ms": self.threshold * 1e3, "stall_count": self.stall_count,
+                "lateness": self.lateness.to_dict(), "stalls": list(self.stalls)}
+
+
+def dump(path, profiler, jitter=None, watchdog=None):
+    # Everything measured so far as JSON, for scripts and bug reports
+    report = {"time": time.time(), "since": profiler.started, "enabled": profiler.enabled,
+              "bucket_edges_us": BUCKET_EDGES_US, "stages": profiler.to_dict()}
+    if jitter is not None:
+        report["tick_lateness"] = jitter.to_dict()
+    if watchdog is not None:
+        report["event_loop"] = watchdog.to_dict()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    return report
+
+
+def report_lines(report):
+    # Human-readable table of a dump
+    lines = [f"{'stage':<16}{'count':>10}{'mean µs':>10}{'p50 µs':>10}{'p99 µs':>10}{'max µs':>10}"]
+    stages = dict(report["stages"])
+    if "tick_lateness" in report:
+        stages["tick lateness"] = report["tick_lateness"]
+    if "event_loop" in report:
+        stages["event loop"] = report["event_loop"]["lateness"]
+    for name, stage in stages.items():
+        lines.append(f"{name:<16}{stage['count']:>10}{stage['mean_us']:>10.0f}{stage['p50_us']:>10.0f}"
+                     f"{stage['p99_us']:>10.0f}{stage['max_us']:>10.0f}")
+    lines.extend(format_stall(stall) for stall in report.get("event_loop", {}).get("stalls", []))
+    return lines
+
+
+def format_stall(stall):
+    # One line per stall: when, how long and where the loop was stuck
+    line = f"Stall of {stall['duration_ms']:.0f} ms at {time.strftime('%H:%M:%S', time.localtime(stall['time']))}"
+    if stall["stack"]:
+        line += f" in {stall['stack'][-1].splitlines()[0]}"
+    return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print a diagnostics dump as a table")
+    parser.add_argument("dump", help="JSON written by --profile or the Diagnostics tab")
+    args = parser.parse_args()
+    with open(args.dump, encoding="utf-8") as f:
+        print("\n".join(report_lines(json.load(f))))
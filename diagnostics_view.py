@@ -0,0 +1,121 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QLabel, QListWidget, QFileDialog, QAbstractItemView)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+import pyqtgraph as pg
+import diagnostics
+
+HEADERS = ["Stage", "Count", "Mean", "p50", "p99", "Max"]
+
+# Refresh interval of the tab in ms, only while it is visible
+REFRESH_INTERVAL = 1000
+
+
+def _us(value):
+    return f"{value / 1000:.2f} ms" if value >= 1000 else f"{value:.0f} µs"
+
+
+class DiagnosticsView(QWidget):
+    # Stage timings of the engine and the dashboard, tick lateness with its
+    # histogram and event-loop stalls. Reads the same data a --profile dump
+    # holds and can save it as JSON.
+    toggled = pyqtSignal(bool)
+
+    def __init__(self, profiler, jitter=None, watchdog=None, parent=None):
+        super().__init__(parent)
+        self.profiler = profiler
+        self.jitter = jitter
+        self.watchdog = watchdog
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.enable_check = QCheckBox("Measure update loop")
+        self.enable_check.setChecked(profiler.enabled)
+        self.enable_check.toggled.connect(self.toggled.emit)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        save_button = QPushButton("Save JSON…")
+        save_button.clicked.connect(self.save)
+        controls.addWidget(self.enable_check)
+        controls.addStretch()
+        controls.addWidget(reset_button)
+        controls.addWidget(save_button)
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(0, len(HEADERS))
+        self.table.setHorizontalHeaderLabels(HEADERS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        layout.addWidget(QLabel("Tick lateness"))
+        self.histogram_plot = pg.PlotWidget()
+        self.histogram_plot.setBackground('w')
+        self.histogram_plot.setMaximumHeight(160)
+        self.histogram_plot.setLabel('bottom', 'Late by (log2 µs)')
+        self.histogram_plot.setLabel('left', 'Ticks')
+        self.histogram_bars = pg.BarGraphItem(x=list(range(diagnostics.BUCKETS)), height=[0] * diagnostics.BUCKETS,
+                                              width=0.8, brush='#3498db')
+        self.histogram_plot.addItem(self.histogram_bars)
+        layout.addWidget(self.histogram_plot)
+
+        layout.addWidget(QLabel("Event loop stalls"))
+        self.stall_list = QListWidget()
+        self.stall_list.setMaximumHeight(120)
+        layout.addWidget(self.stall_list)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(REFRESH_INTERVAL)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def rows(self):
+        rows = [(name, stage.to_dict()) for name, stage in list(self.profiler.stages.items())]
+        if self.jitter is not None:
+            rows.append(("tick lateness", self.jitter.to_dict()))
+        if self.watchdog is not None:
+            rows.append(("event loop lateness", self.watchdog.lateness.to_dict()))
+        return rows
+
+    def refresh(self):
+        rows = self.rows()
+        self.table.setRowCount(len(rows))
+        for row, (name, stage) in enumerate(rows):
+            cells = [name, str(stage["count"])] + [_us(stage[key]) for key in ("mean_us", "p50_us", "p99_us", "max_us")]
+            for column, text in enumerate(cells):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if column:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, column, item)
+                if item.text() != text:
+                    item.setText(text)
+        if self.jitter is not None:
+            self.histogram_bars.setOpts(height=list(self.jitter.histogram))
+        if self.watchdog is not None:
+            stalls = [diagnostics.format_stall(stall) for stall in reversed(self.watchdog.stalls)]
+            if stalls != [self.stall_list.item(i).text() for i in range(self.stall_list.count())]:
+                self.stall_list.clear()
+                self.stall_list.addItems(stalls)
+
+    def reset(self):
+        self.profiler.reset()
+        if self.jitter is not None:
+            self.jitter.reset()
+        if self.watchdog is not None:
+            self.watchdog.lateness.reset()
+            self.watchdog.stalls.clear()
+        self.refresh()
+
+    def save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Diagnostics", "diagnostics.json", "JSON Files (*.json)")
+        if path:
+            diagnostics.dump(path, self.profiler, self.jitter, self.watchdog)
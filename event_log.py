@@ -0,0 +1,351 @@
+import os
+import json
+import time
+from array import array
+from datetime import datetime
+import numpy as np
+
+# Levels (same numbers as the logging module)
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# Event codes
+SYSTEM_INITIALIZED = 1
+SENSORS_INITIALIZED = 2
+HVAC_CONNECTED = 3
+TARGET_INITIAL = 4
+AUTOMATIC_MODE = 5
+DEVICE_ONLINE = 6
+DEVICE_OFFLINE = 7
+READING = 10
+SYSTEM_STARTED = 20
+SYSTEM_STOPPED = 21
+TARGET_CHANGED = 22
+COOLING_STARTED = 30
+COOLING_STOPPED = 31
+HEATING_STARTED = 32
+HEATING_STOPPED = 33
+FANS_TOGGLED = 34
+FANS_STARTED = 35
+FANS_STOPPED = 36
+AUTOMATION_ENABLED = 40
+AUTOMATION_DISABLED = 41
+NOTIFICATIONS_ENABLED = 42
+NOTIFICATIONS_DISABLED = 43
+CONTROLLER_CHANGED = 44
+LOG_CLEARED = 50
+LOG_EXPORTED = 51
+EXPORT_FAILED = 52
+HISTORY_EXPORTED = 53
+REPLAY_FINISHED = 60
+ALERT_BAND = 70
+ALERT_RATE = 71
+ALERT_STUCK = 72
+ALERT_OUTLIER = 73
+ALERT_CLEARED = 74
+
+# Message templates, only filled in when a record is displayed or exported
+MESSAGES = {
+    SYSTEM_INITIALIZED: "System started at {date}",
+    SENSORS_INITIALIZED: "Temperature sensors initialized",
+    HVAC_CONNECTED: "HVAC system connected",
+    TARGET_INITIAL: "Target temperature set to {value:g}°C",
+    AUTOMATIC_MODE: "System running in automatic mode",
+    DEVICE_ONLINE: "Device online: {text}",
+    DEVICE_OFFLINE: "Device offline: {text}",
+    READING: "Temperature: {value:.1f}°C, Humidity: {value2:.0f}%",
+    SYSTEM_STARTED: "System started",
+    SYSTEM_STOPPED: "System stopped",
+    TARGET_CHANGED: "Target temperature changed to {value:g}°C",
+    COOLING_STARTED: "Cooling started",
+    COOLING_STOPPED: "Cooling stopped",
+    HEATING_STARTED: "Heating started",
+    HEATING_STOPPED: "Heating stopped",
+    FANS_TOGGLED: "Fans toggled",
+    FANS_STARTED: "Fans started",
+    FANS_STOPPED: "Fans stopped",
+    AUTOMATION_ENABLED: "Automation enabled",
+    AUTOMATION_DISABLED: "Automation disabled",
+    NOTIFICATIONS_ENABLED: "Notifications enabled",
+    NOTIFICATIONS_DISABLED: "Notifications disabled",
+    CONTROLLER_CHANGED: "Control mode set to {text}",
+    LOG_CLEARED: "Log cleared at {date}",
+    LOG_EXPORTED: "Log exported to {text}",
+    EXPORT_FAILED: "Error exporting: {text}",
+    HISTORY_EXPORTED: "Sample history exported to {text}",
+    REPLAY_FINISHED: "Replay of {text} finished",
+    ALERT_BAND: "{text}: {value:.1f}°C is outside the band around {value2:g}°C",
+    ALERT_RATE: "{text}: temperature changing by {value:+.1f}°C per minute",
+    ALERT_STUCK: "{text}: reading stuck at {value:.1f}°C for {value2:.0f} min",
+    ALERT_OUTLIER: "{text}: {value:.1f}°C is {value2:.1f} standard deviations from its recent mean",
+    ALERT_CLEARED: "Alert cleared: {text}",
+}
+
+# One fixed-size log record
+RECORD = np.dtype([
+    ("ts", np.int64),  # Epoch milliseconds
+    ("level", np.uint8),
+    ("code", np.uint16),
+    ("text", np.int32),  # Index into the string table, -1 for none
+    ("value", np.float64),
+    ("value2", np.float64),
+])
+
+
+class EventLog:
+    # Fixed-capacity ring of structured log records. Appending is O(1) and
+    # never allocates; when spill_path is set, records about to be overwritten
+    # are first appended to a binary segment file so nothing is lost.
+    #
+    # Texts are interned and counted by the records in memory that use them.
+    # A text is dropped once the last of those leaves the ring, so memory
+    # stays flat however many distinct texts are logged. String indices are
+    # never reused, so a record copied out earlier cannot pick up another
+    # text. When spilling, the strings are also written to a file, and only
+    # their file offsets stay in memory for the spilled records.
+    def __init__(self, capacity=10000, spill_path=None, spill_chunk=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = int(capacity)
+        self._records = np.zeros(self.capacity, dtype=RECORD)
+        self.total = 0  # Records appended so far; the ring holds [total - len, total)
+        self.first = 0  # Oldest record still available (ring or spill file)
+
+        # Strings are interned so a record only carries an index
+        self._strings = {}  # Index -> text, for texts used by records in memory
+        self._string_index = {}  # Text -> index
+        self._string_refs = {}  # Index -> records in memory using it
+        self._next_string = 0
+        self._string_offsets = array("q")  # Position of every string in the strings file
+
+        self.spill_path = spill_path
+        self.spill_chunk = spill_chunk or max(1, self.capacity // 4)
+        self._spilled = 0  # Records [first, _spilled) live in the spill file
+        self._spill_file = None
+        self._strings_file = None
+        self._spill_map = None
+        if spill_path:
+            self._open_spill()
+
+        self._listeners = []
+
+    def __len__(self):
+        return self.total - self.first
+
+    def _open_spill(self):
+        # Start a fresh segment; the string table sits next to it as JSON lines
+        # (the string table is empty here: at start and after clear())
+        self._spill_file = open(self.spill_path, "wb")
+        self._strings_file = open(self.spill_path + ".strings", "wb")
+
+    def _intern(self, text):
+        index = self._string_index.get(text)
+        if index is not None:
+            self._string_refs[index] += 1
+            return index
+        index = self._next_string
+        self._next_string += 1
+        self._strings[index] = text
+        self._string_index[text] = index
+        self._string_refs[index] = 1
+        if self._strings_file is not None:
+            # One JSON line per index, so line n of the file is string n
+            self._string_offsets.append(self._strings_file.tell())
+            self._strings_file.write(json.dumps(text).encode("utf-8") + b"\n")
+        return index
+
+    def _release(self, index):
+        # A record using the string left memory
+        if index < 0:
+            return
+        refs = self._string_refs[index] - 1
+        if refs:
+            self._string_refs[index] = refs
+            return
+        del self._string_refs[index]
+        del self._string_index[self._strings.pop(index)]
+
+    def _string(self, index):
+        if index < 0:
+            return ""
+        text = self._strings.get(index)
+        if text is None and self.spill_path and index < len(self._string_offsets):
+            # A spilled record's text, read back from the strings file
+            with open(self.spill_path + ".strings", "rb") as f:
+                f.seek(self._string_offsets[index])
+                text = json.loads(f.readline())
+        return text if text is not None else ""
+
+    def subscribe(self, callback):
+        # callback(appended, evicted) after every append
+        self._listeners.append(callback)
+
+    def append(self, code, value=np.nan, value2=np.nan, text=None, level=INFO, ts=None):
+        cap = self.capacity
+        evicted = 0
+        if self.total - self.first >= cap:
+            # The slot we are about to reuse holds the oldest record in memory
+            if self._spill_file is not None:
+                if self._spilled <= self.total - cap:
+                    self._spill(min(self.total, self._spilled + self.spill_chunk))
+            else:
+                self.first += 1
+                evicted = 1
+
+        record = self._records[self.total % cap]
+        if self.total >= cap:
+            self._release(int(record["text"]))  # The record this slot held leaves memory
+        record["ts"] = int(time.time() * 1000) if ts is None else ts
+        record["level"] = level
+        record["code"] = code
+        record["text"] = -1 if text is None else self._intern(text)
+        record["value"] = value
+        record["value2"] = value2
+        self.total += 1
+
+        for callback in self._listeners:
+            callback(1, evicted)
+
+    def _spill(self, stop):
+        cap = self.capacity
+        start = self._spilled
+        while start < stop:
+            # Copy out in at most two contiguous pieces of the ring
+            end = min(stop, start + cap - start % cap)
+            self._records[start % cap:start % cap + end - start].tofile(self._spill_file)
+            start = end
+        self._spill_file.flush()
+        self._strings_file.flush()
+        self._spilled = stop
+
+    def clear(self):
+        evicted = len(self)
+        self.total = 0
+        self.first = 0
+        self._spilled = 0
+        self._spill_map = None
+        self._strings = {}
+        self._string_index = {}
+        self._string_refs = {}
+        self._next_string = 0
+        self._string_offsets = array("q")
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._strings_file.close()
+            self._open_spill()
+        for callback in self._listeners:
+            callback(0, evicted)
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._strings_file.close()
+            self._spill_file = None
+            self._strings_file = None
+            self._spill_map = None
+
+    def _spilled_records(self):
+        if self._spill_map is None or len(self._spill_map) != self._spilled:
+            self._spill_map = np.memmap(self.spill_path, dtype=RECORD, mode="r", shape=(self._spilled,))
+        return self._spill_map
+
+    def record(self, index):
+        # Record by position, 0 = oldest available
+        position = self.first + index
+        if position < self.first or position >= self.total:
+            raise IndexError("log record out of range")
+        if position >= self.total - self.capacity:
+            return self._records[position % self.capacity]
+        return self._spilled_records()[position]
+
+    def iter_chunks(self, chunk_size=10000):
+        # Copies of the records, oldest first, a chunk at a time
+        stop = self.total
+        ring_start = max(self.first, stop - self.capacity)
+        if ring_start > self.first:
+            spilled = self._spilled_records()
+            for start in range(self.first, ring_start, chunk_size):
+                yield np.array(spilled[start:min(ring_start, start + chunk_size)])
+        for start in range(ring_start, stop, chunk_size):
+            end = min(stop, start + chunk_size)
+            indices = np.arange(start, end) % self.capacity
+            yield self._records[indices]
+
+    def snapshot(self, chunk_size=10000):
+        # (count, chunks) for a reader on another thread. The records still in
+        # memory (at most `capacity`) are copied now so later appends cannot
+        # overwrite them; spilled records are read from the file as needed.
+        stop = self.total
+        first = self.first
+        ring_start = max(first, stop - self.capacity)
+        ring = self._records[np.arange(ring_start, stop) % self.capacity]
+        spilled = self._spilled_records() if ring_start > first else None
+
+        def chunks():
+            if spilled is not None:
+                for start in range(first, ring_start, chunk_size):
+                    yield np.array(spilled[start:min(ring_start, start + chunk_size)])
+            for start in range(0, len(ring), chunk_size):
+                yield ring[start:start + chunk_size]
+        return stop - first, chunks()
+
+    def tail(self, count):
+        # The newest `count` records
+        start = max(self.first, self.total - min(count, self.capacity))
+        return self._records[np.arange(start, self.total) % self.capacity]
+
+    def message(self, record):
+        return format_message(record, self._string(int(record["text"])))
+
+    def format(self, record):
+        return f"{format_time(record['ts'])} - {self.message(record)}"
+
+    def messages(self):
+        # Formatter for records read later on another thread, e.g. a snapshot
+        # being exported: the texts of the records now in memory are kept
+        # with it, so they can be formatted after they have left the log
+        return Messages(dict(self._strings), self._string)
+
+    def format_lines(self, chunk_size=10000):
+        for chunk in self.iter_chunks(chunk_size):
+            for record in chunk:
+                yield self.format(record)
+
+
+class Messages:
+    # message() and format() of an EventLog against a copy of its string table
+    def __init__(self, strings, fallback):
+        self._strings = strings
+        self._fallback = fallback  # For texts not in the copy (spilled records)
+
+    def message(self, record):
+        index = int(record["text"])
+        text = self._strings.get(index)
+        return format_message(record, text if text is not None else self._fallback(index))
+
+    def format(self, record):
+        return f"{format_time(record['ts'])} - {self.message(record)}"
+
+
+def format_message(record, text):
+    template = MESSAGES.get(int(record["code"]), "Event {code}")
+    return template.format(value=float(record["value"]), value2=float(record["value2"]), text=text,
+                           code=int(record["code"]), date=format_time(record["ts"], "%Y-%m-%d %H:%M:%S"))
+
+
+def format_time(ts, fmt="%H:%M:%S"):
+    return datetime.fromtimestamp(int(ts) / 1000).strftime(fmt)
+
+
+def load_spill(path):
+    # Read back a spill segment: (records, strings)
+    records = np.fromfile(path, dtype=RECORD) if os.path.exists(path) else np.zeros(0, dtype=RECORD)
+    strings = []
+    if os.path.exists(path + ".strings"):
+        with open(path + ".strings", encoding="utf-8") as f:
+            strings = [json.loads(line) for line in f]
+    return records, strings
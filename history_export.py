@@ -0,0 +1,101 @@
+import sys
+import time
+import argparse
+import numpy as np
+from history_store import HistoryStore, COOLING, HEATING, FANS
+
+# Output formats and their file extensions
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("channel", pa.int32()),
+        ("temperature", pa.float64()),
+        ("humidity", pa.float64()),
+        ("setpoint", pa.float64()),
+        ("cooling", pa.bool_()),
+        ("heating", pa.bool_()),
+        ("fans", pa.bool_()),
+    ])
+
+
+def to_batch(rows, batch_schema):
+    # One record batch from a list of (ts, channel, temperature, humidity, setpoint, actuators) rows
+    import pyarrow as pa
+    columns = np.array(rows, dtype=np.float64).T
+    actuators = columns[5].astype(np.int64)
+    return pa.record_batch([
+        pa.array(np.rint(columns[0] * 1000).astype(np.int64), type=pa.timestamp("ms", tz="UTC")),
+        pa.array(columns[1].astype(np.int32)),
+        pa.array(columns[2]),
+        pa.array(columns[3]),
+        pa.array(columns[4]),
+        pa.array((actuators & COOLING) != 0),
+        pa.array((actuators & HEATING) != 0),
+        pa.array((actuators & FANS) != 0),
+    ], schema=batch_schema)
+
+
+def export_history(store, path, fmt="parquet", channel=None, start=None, end=None,
+                   row_group_rows=100000, compression="zstd", progress=None):
+    # Stream raw samples into a Parquet file (one row group per row_group_rows)
+    # or an Arrow IPC file (one record batch per row_group_rows). Only one row
+    # group is held in memory. progress(done) is called after each one.
+    # Returns the number of rows written.
+    import pyarrow as pa
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown history export format: {fmt}")
+    batch_schema = schema()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, batch_schema, compression=compression)
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(path, batch_schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+        write = writer.write_batch
+
+    done = 0
+    pending = []
+    try:
+        for page in store.iter_samples(channel, start, end, page_size=min(row_group_rows, 10000)):
+            pending.extend(page)
+            if len(pending) >= row_group_rows:
+                write(to_batch(pending, batch_schema))
+                done += len(pending)
+                pending = []
+                if progress is not None:
+                    progress(done)
+        if pending:
+            write(to_batch(pending, batch_schema))
+            done += len(pending)
+            if progress is not None:
+                progress(done)
+    finally:
+        writer.close()
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export recorded sample history to Parquet or Arrow IPC")
+    parser.add_argument("database", help="sample history database")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--format", choices=sorted(FORMATS), default=None, help="output format (default: from the extension)")
+    parser.add_argument("--channel", type=int, default=None, help="only this channel")
+    parser.add_argument("--start", type=float, default=None, help="first timestamp (epoch seconds)")
+    parser.add_argument("--end", type=float, default=None, help="end timestamp (epoch seconds, exclusive)")
+    parser.add_argument("--compression", default="zstd", help="compression codec (zstd, lz4, snappy, none)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("arrow" if args.output.endswith((".arrow", ".feather", ".ipc")) else "parquet")
+    store = HistoryStore(args.database)
+    started = time.perf_counter()
+    try:
+        rows = export_history(store, args.output, fmt, args.channel, args.start, args.end,
+                              compression=None if args.compression == "none" else args.compression)
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - started
+    print(f"{rows} samples written to {args.output} in {elapsed:.2f}s", file=sys.stderr)
@@ -0,0 +1,217 @@
+import time
+import sqlite3
+import threading
+from actuators import HEAT, COOL, FAN
+
+# Rollup tiers in seconds: 1 minute, 1 hour, 1 day
+TIERS = (60, 3600, 86400)
+
+# Actuator state bits stored with every sample
+COOLING = 1
+HEATING = 2
+FANS = 4
+
+# Columns returned by every history query
+ROW_FIELDS = ("timestamp", "temp_min", "temp_mean", "temp_max", "humidity_min", "humidity_mean", "humidity_max")
+
+
+class HistoryStore:
+    # Append-only sample history in SQLite (WAL mode). Raw samples are kept in
+    # one table and min/max/mean rollups are maintained per tier as samples are
+    # flushed, so long ranges are answered from a rollup instead of raw rows.
+    # Samples may be recorded from the acquisition thread while the GUI thread
+    # queries; the connection is shared under a lock.
+    def __init__(self, path="temperature_history.db", sample_interval=2.0, flush_rows=5000, flush_interval=5.0):
+        self.path = path
+        self.sample_interval = sample_interval  # Expected spacing of raw samples, used to pick a tier
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA mmap_size=268435456")  # Read pages through a memory map
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS samples ("
+                              "ts REAL NOT NULL, channel INTEGER NOT NULL, "
+                              "temperature REAL NOT NULL, humidity REAL NOT NULL, "
+                              "setpoint REAL NOT NULL, actuators INTEGER NOT NULL DEFAULT 0)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS samples_channel_ts ON samples (channel, ts)")
+            for tier in TIERS:
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS rollup_{tier} ("
+                                  "channel INTEGER NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, "
+                                  "temp_min REAL, temp_max REAL, temp_sum REAL, "
+                                  "humidity_min REAL, humidity_max REAL, humidity_sum REAL, "
+                                  "PRIMARY KEY (channel, bucket)) WITHOUT ROWID")
+
+    def append(self, timestamp, channel, temperature, humidity, setpoint, actuators=0):
+        with self._lock:
+            self._pending.append((timestamp, channel, temperature, humidity, setpoint, actuators))
+            self._maybe_flush()
+
+    def append_registry(self, timestamp, registry, actuators=0):
+        # One row per channel of a SensorRegistry; actuators is one value for
+        # every channel or a sequence with one per channel
+        temperature = registry.temperature.tolist()
+        humidity = registry.humidity.tolist()
+        target = registry.target.tolist()
+        if isinstance(actuators, int):
+            actuators = [actuators] * len(temperature)
+        with self._lock:
+            self._pending.extend((timestamp, channel, temperature[channel], humidity[channel], target[channel], actuators[channel])
+                                 for channel in range(len(temperature)))
+            self._maybe_flush()
+
+    def attach(self, engine):
+        # Record every channel of the engine on each tick
+        def record(sample):
+            registry = engine.registry
+            # Relay states as confirmed by the devices
+            confirmed = engine.actuators.confirmed[:len(registry)]
+            actuators = (COOLING * confirmed[:, COOL]) | (HEATING * confirmed[:, HEAT]) | (FANS * confirmed[:, FAN])
+            self.append_registry(sample.timestamp, registry, actuators.tolist())
+        engine.subscribe(record)
+        return record
+
+    def _maybe_flush(self):
+        if len(self._pending) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            rows = self._pending
+            if not rows:
+                return
+            self._pending = []
+            with self.conn:
+                self.conn.executemany("INSERT INTO samples (ts, channel, temperature, humidity, setpoint, actuators) "
+                                      "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                for tier in TIERS:
+                    self.conn.executemany(
+                        f"INSERT INTO rollup_{tier} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (channel, bucket) DO UPDATE SET "
+                        "count = count + excluded.count, "
+                        "temp_min = min(temp_min, excluded.temp_min), "
+                        "temp_max = max(temp_max, excluded.temp_max), "
+                        "temp_sum = temp_sum + excluded.temp_sum, "
+                        "humidity_min = min(humidity_min, excluded.humidity_min), "
+                        "humidity_max = max(humidity_max, excluded.humidity_max), "
+                        "humidity_sum = humidity_sum + excluded.humidity_sum",
+                        _aggregate(rows, tier))
+
+    def pick_tier(self, start, end, max_points):
+        # Raw samples if they fit, otherwise the finest rollup that does
+        span = max(0.0, end - start)
+        if span <= max_points * self.sample_interval:
+            return 0
+        for tier in TIERS:
+            if span / tier <= max_points:
+                return tier
+        return TIERS[-1]
+
+    def range(self, channel, start, end, max_points=2000):
+        # At most about max_points rows covering [start, end)
+        tier = self.pick_tier(start, end, max_points)
+        rows = []
+        for page in self.iter_range(channel, start, end, tier):
+            rows.extend(page)
+        return rows
+
+    def iter_range(self, channel, start, end, tier=0, page_size=10000):
+        # Pages of ROW_FIELDS tuples in time order; only one page is held at a time.
+        # The first page includes `start`, later ones continue after the last row.
+        self.flush()
+        if tier == 0:
+            query = ("SELECT ts, temperature, temperature, temperature, humidity, humidity, humidity "
+                     "FROM samples WHERE channel = ? AND ts {} ? AND ts < ? ORDER BY ts LIMIT ?")
+            cursor_start = start
+        else:
+            if tier not in TIERS:
+                raise ValueError(f"Unknown rollup tier: {tier}")
+            query = (f"SELECT bucket, temp_min, temp_sum / count, temp_max, "
+                     f"humidity_min, humidity_sum / count, humidity_max "
+                     f"FROM rollup_{tier} WHERE channel = ? AND bucket {{}} ? AND bucket < ? ORDER BY bucket LIMIT ?")
+            cursor_start = (start // tier) * tier
+        comparison = ">="
+        while True:
+            with self._lock:
+                page = self.conn.execute(query.format(comparison), (channel, cursor_start, end, page_size)).fetchall()
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            cursor_start = page[-1][0]
+            comparison = ">"
+
+    def count_samples(self, channel=None, start=None, end=None):
+        self.flush()
+        conditions, params = _sample_filter(channel, start, end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            return self.conn.execute(f"SELECT count(*) FROM samples {where}", params).fetchone()[0]
+
+    def iter_samples(self, channel=None, start=None, end=None, page_size=10000):
+        # Raw sample rows (ts, channel, temperature, humidity, setpoint, actuators)
+        self.flush()
+        conditions, params = _sample_filter(channel, start, end)
+        where = f"WHERE {' AND '.join(conditions)} AND rowid > ?" if conditions else "WHERE rowid > ?"
+        query = f"SELECT rowid, ts, channel, temperature, humidity, setpoint, actuators FROM samples {where} ORDER BY rowid LIMIT ?"
+        last_rowid = 0
+        while True:
+            with self._lock:
+                page = self.conn.execute(query, params + [last_rowid, page_size]).fetchall()
+            if not page:
+                return
+            last_rowid = page[-1][0]
+            yield [row[1:] for row in page]
+            if len(page) < page_size:
+                return
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self.conn.close()
+
+
+def _sample_filter(channel, start, end):
+    conditions, params = [], []
+    if channel is not None:
+        conditions.append("channel = ?")
+        params.append(channel)
+    if start is not None:
+        conditions.append("ts >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("ts < ?")
+        params.append(end)
+    return conditions, params
+
+
+def _aggregate(rows, tier):
+    buckets = {}
+    for ts, channel, temperature, humidity, _setpoint, _actuators in rows:
+        key = (channel, int(ts // tier) * tier)
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = [1, temperature, temperature, temperature, humidity, humidity, humidity]
+        else:
+            agg[0] += 1
+            if temperature < agg[1]:
+                agg[1] = temperature
+            if temperature > agg[2]:
+                agg[2] = temperature
+            agg[3] += temperature
+            if humidity < agg[4]:
+                agg[4] = humidity
+            if humidity > agg[5]:
+                agg[5] = humidity
+            agg[6] += humidity
+    return [key + tuple(agg) for key, agg in buckets.items()]
@@ -0,0 +1,130 @@
+import numpy as np
+from ring_buffer import RingBuffer
+
+
+class _Level:
+    # Min/max buckets of one pyramid level, oldest to newest
+    def __init__(self, capacity):
+        self.x = RingBuffer(capacity)  # x of the first sample in each bucket
+        self.ymin = RingBuffer(capacity)
+        self.ymax = RingBuffer(capacity)
+        self.count = 0  # Buckets produced so far; the rings hold [count - len, count)
+
+    def clear(self):
+        self.x.clear()
+        self.ymin.clear()
+        self.ymax.clear()
+
+
+class LodSeries:
+    # Level-of-detail series for the trend plot. Raw samples sit in a ring
+    # buffer and every level above it stores the min/max of `fanout` buckets of
+    # the level below, updated incrementally on append. query() returns about
+    # two points per pixel however many samples the visible range covers.
+    def __init__(self, capacity, fanout=4):
+        if fanout < 2:
+            raise ValueError("fanout must be at least 2")
+        self.fanout = fanout
+        self.x = RingBuffer(capacity)
+        self.y = RingBuffer(capacity)
+        self.total = 0  # Samples appended so far; the rings hold [total - len, total)
+        self.levels = []
+        size = fanout
+        while size <= capacity:
+            self.levels.append(_Level(capacity // size + 2))
+            size *= fanout
+
+    def __len__(self):
+        return len(self.x)
+
+    def append(self, x, y):
+        self.extend([x], [y])
+
+    def extend(self, xs, ys):
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        ys = np.asarray(ys, dtype=np.float64).ravel()
+        if len(xs) != len(ys):
+            raise ValueError("x and y must have the same length")
+        if not len(xs):
+            return
+        self.x.extend(xs)
+        self.y.extend(ys)
+        self.total += len(xs)
+
+        # Roll new complete buckets up through the levels
+        f = self.fanout
+        below_x, below_min, below_max, below_count = self.x, self.y, self.y, self.total
+        for level in self.levels:
+            complete = below_count // f
+            new = complete - level.count
+            if new <= 0:
+                break
+            first = level.count * f - (below_count - len(below_x))
+            if first < 0:
+                # Part of these buckets was already evicted below; restart this level
+                skip = -(first // f)
+                level.clear()
+                level.count += skip
+                new -= skip
+                first += skip * f
+            if new > 0:
+                stop = first + new * f
+                level.x.extend(below_x.view()[first:stop:f])
+                level.ymin.extend(below_min.view()[first:stop].reshape(new, f).min(axis=1))
+                level.ymax.extend(below_max.view()[first:stop].reshape(new, f).max(axis=1))
+                level.count += new
+            below_x, below_min, below_max, below_count = level.x, level.ymin, level.ymax, level.count
+
+    def clear(self):
+        self.x.clear()
+        self.y.clear()
+        self.total = 0
+        for level in self.levels:
+            level.clear()
+            level.count = 0
+
+    def query(self, x0, x1, pixels):
+        # (x, y) arrays to draw for the visible range [x0, x1] at `pixels` width
+        xs = self.x.view()
+        if not len(xs):
+            return xs, self.y.view()
+        base = self.total - len(xs)
+        # One extra sample on each side so the line runs to the edges
+        i0 = base + max(0, int(np.searchsorted(xs, x0, side="left")) - 1)
+        i1 = base + min(len(xs), int(np.searchsorted(xs, x1, side="right")) + 1)
+
+        # Coarsest level that still has at least one bucket per pixel
+        k = 0
+        span = i1 - i0
+        size = self.fanout
+        while k < len(self.levels) and span // size >= max(1, pixels):
+            k += 1
+            size *= self.fanout
+
+        pieces = self._collect(k, i0, i1)
+        if len(pieces) == 1:
+            return pieces[0]
+        return (np.concatenate([p[0] for p in pieces]),
+                np.concatenate([p[1] for p in pieces]))
+
+    def _collect(self, k, i0, i1):
+        # Pieces covering samples [i0, i1) using level k where whole buckets fit
+        if i0 >= i1:
+            return []
+        if k == 0:
+            base = self.total - len(self.x)
+            return [(self.x.view()[i0 - base:i1 - base], self.y.view()[i0 - base:i1 - base])]
+        level = self.levels[k - 1]
+        size = self.fanout ** k
+        first_bucket = level.count - len(level.x)
+        b0 = max(-(-i0 // size), first_bucket)
+        b1 = min(i1 // size, level.count)
+        if b0 >= b1:
+            return self._collect(k - 1, i0, i1)
+        lo, hi = b0 - first_bucket, b1 - first_bucket
+        # Each bucket is drawn as a vertical min-max segment
+        x = np.repeat(level.x.view()[lo:hi], 2)
+        y = np.empty(len(x))
+        y[0::2] = level.ymin.view()[lo:hi]
+        y[1::2] = level.ymax.view()[lo:hi]
+        return self._collect(k - 1, i0, b0 * size) + [(x, y)] + self._collect(k - 1, b1 * size, i1)
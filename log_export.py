@@ -0,0 +1,294 @@
+import os
+import csv
+from datetime import datetime
+from xml.sax.saxutils import escape
+import numpy as np
+from PyQt5.QtCore import Qt, QRect, QThread, pyqtSignal
+from PyQt5.QtGui import QPainter, QFont
+from PyQt5.QtPrintSupport import QPrinter
+import event_log
+from event_log import format_time
+import history_export
+from history_store import HistoryStore
+
+TITLE = "Temperature Control System Log"
+
+# File dialog filters and the format each one writes
+FILTERS = {
+    "PDF Files (*.pdf)": "pdf",
+    "Word Documents (*.docx)": "docx",
+    "Text Files (*.txt)": "txt",
+    "CSV Files (*.csv)": "csv",
+}
+HISTORY_FILTERS = {
+    "Parquet Files (*.parquet)": "parquet",
+    "Arrow IPC Files (*.arrow)": "arrow",
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def exported_on():
+    return f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+# Every writer takes (log, path, count, chunks, progress): log formats the
+# records (an EventLog or its messages()), count is the number of records in
+# chunks and progress(done) is called after each chunk.
+
+def write_text(log, path, count, chunks, progress):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"{TITLE}\n{exported_on()}\n\n")
+        done = 0
+        for chunk in chunks:
+            file.write("".join(log.format(record) + "\n" for record in chunk))
+            done += len(chunk)
+            progress(done)
+
+
+def write_word(log, path, count, chunks, progress, batch_rows=2000):
+    # Title, summary statistics and the log as a table. Rows are parsed into
+    # the table a batch at a time from one XML string, which is far faster
+    # than one add_row() per record.
+    from docx import Document
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+
+    document = Document()
+    document.add_heading(TITLE, 0)
+    document.add_paragraph(exported_on())
+    document.add_heading("Summary", level=1)
+    summary_anchor = document.add_paragraph()
+    document.add_heading("Log", level=1)
+
+    table = document.add_table(rows=1, cols=3)
+    table.style = "Table Grid"
+    for cell, heading in zip(table.rows[0].cells, ("Time", "Level", "Message")):
+        cell.paragraphs[0].add_run(heading).bold = True
+    cell_start = [f'<w:tc><w:tcPr><w:tcW w:w="{cell.width.twips}" w:type="dxa"/></w:tcPr><w:p><w:r><w:t xml:space="preserve">'
+                  for cell in table.rows[0].cells]
+    cell_end = "</w:t></w:r></w:p></w:tc>"
+    tbl = table._tbl
+
+    stats = LogStats()
+    done = 0
+    for chunk in chunks:
+        stats.add(chunk)
+        for start in range(0, len(chunk), batch_rows):
+            rows = []
+            for record in chunk[start:start + batch_rows]:
+                cells = (format_time(record["ts"], "%Y-%m-%d %H:%M:%S"),
+                         event_log.LEVEL_NAMES.get(int(record["level"]), str(record["level"])),
+                         log.message(record))
+                rows.append("<w:tr>" + "".join(begin + escape(text) + cell_end
+                                               for begin, text in zip(cell_start, cells)) + "</w:tr>")
+            tbl.extend(parse_xml(f"<w:tbl {nsdecls('w')}>{''.join(rows)}</w:tbl>"))
+        done += len(chunk)
+        progress(done)
+
+    # The summary is only known once every record has been seen
+    for line in stats.lines():
+        summary_anchor.insert_paragraph_before(line, style="List Bullet")
+    summary_anchor._p.getparent().remove(summary_anchor._p)
+    document.save(path)
+
+
+class LogStats:
+    # Running totals over exported records, updated a chunk at a time
+    def __init__(self):
+        self.count = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.levels = {}
+        self.readings = 0
+        self.temp_min = self.humidity_min = float("inf")
+        self.temp_max = self.humidity_max = float("-inf")
+        self.temp_sum = self.humidity_sum = 0.0
+
+    def add(self, chunk):
+        if not len(chunk):
+            return
+        self.count += len(chunk)
+        if self.first_ts is None:
+            self.first_ts = int(chunk["ts"][0])
+        self.last_ts = int(chunk["ts"][-1])
+        levels, counts = np.unique(chunk["level"], return_counts=True)
+        for level, level_count in zip(levels.tolist(), counts.tolist()):
+            self.levels[level] = self.levels.get(level, 0) + level_count
+        readings = chunk[chunk["code"] == event_log.READING]
+        if len(readings):
+            self.readings += len(readings)
+            temperature, humidity = readings["value"], readings["value2"]
+            self.temp_min = min(self.temp_min, float(temperature.min()))
+            self.temp_max = max(self.temp_max, float(temperature.max()))
+            self.temp_sum += float(temperature.sum())
+            self.humidity_min = min(self.humidity_min, float(humidity.min()))
+            self.humidity_max = max(self.humidity_max, float(humidity.max()))
+            self.humidity_sum += float(humidity.sum())
+
+    def lines(self):
+        lines = [f"Entries: {self.count}"]
+        if self.count:
+            lines.append(f"From {format_time(self.first_ts, '%Y-%m-%d %H:%M:%S')} "
+                         f"to {format_time(self.last_ts, '%Y-%m-%d %H:%M:%S')}")
+            lines.append(", ".join(f"{event_log.LEVEL_NAMES.get(level, level)}: {level_count}"
+                                   for level, level_count in sorted(self.levels.items())))
+        if self.readings:
+            lines.append(f"Temperature: min {self.temp_min:.1f}°C, mean {self.temp_sum / self.readings:.1f}°C, "
+                         f"max {self.temp_max:.1f}°C over {self.readings} readings")
+            lines.append(f"Humidity: min {self.humidity_min:.0f}%, mean {self.humidity_sum / self.readings:.0f}%, "
+                         f"max {self.humidity_max:.0f}%")
+        return lines
+
+
+def write_csv(log, path, count, chunks, progress):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(("Timestamp", "Level", "Message"))
+        done = 0
+        for chunk in chunks:
+            writer.writerows((format_time(record["ts"], "%Y-%m-%d %H:%M:%S"),
+                              event_log.LEVEL_NAMES.get(int(record["level"]), str(record["level"])),
+                              log.message(record)) for record in chunk)
+            done += len(chunk)
+            progress(done)
+
+
+def write_pdf(log, path, count, chunks, progress):
+    # Lines are painted straight onto the printer page by page, so no
+    # QTextDocument of the whole log is ever built
+    printer = QPrinter(QPrinter.HighResolution)
+    printer.setOutputFormat(QPrinter.PdfFormat)
+    printer.setOutputFileName(path)
+    printer.setPageSize(QPrinter.A4)
+
+    painter = QPainter()
+    if not painter.begin(printer):
+        raise OSError(f"Cannot write {path}")
+    try:
+        page = printer.pageRect(QPrinter.DevicePixel)
+        bottom = page.height()
+
+        painter.setFont(QFont("Arial", 16, QFont.Bold))
+        y = painter.fontMetrics().ascent()
+        painter.drawText(0, y, TITLE)
+        y += painter.fontMetrics().lineSpacing()
+        painter.setFont(QFont("Arial", 10))
+        line_height = painter.fontMetrics().lineSpacing()
+        painter.drawText(0, y + line_height, exported_on())
+        y += 3 * line_height
+
+        # From here y is the top of the next line; lines wider than the page
+        # (device errors, alerts) are word-wrapped onto as many as they need
+        metrics = painter.fontMetrics()
+        width = int(page.width())
+        ascent = metrics.ascent()
+        y -= ascent
+        done = 0
+        for chunk in chunks:
+            for record in chunk:
+                text = log.format(record)
+                if metrics.horizontalAdvance(text) <= width:
+                    if y + line_height > bottom:
+                        printer.newPage()
+                        y = 0
+                    painter.drawText(0, y + ascent, text)
+                    y += line_height
+                    continue
+                height = painter.boundingRect(QRect(0, 0, width, int(bottom)), Qt.TextWordWrap,
+                                              text).height()
+                if y + height > bottom:
+                    printer.newPage()
+                    y = 0
+                painter.drawText(QRect(0, y, width, height), Qt.TextWordWrap, text)
+                y += height
+            done += len(chunk)
+            progress(done)
+    finally:
+        painter.end()
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_word, "csv": write_csv, "txt": write_text}
+
+
+class ExportWorker(QThread):
+    # Runs write() on a background thread; subclasses set count and write the file
+    progress = pyqtSignal(int, int)  # Rows written, total rows
+    exported = pyqtSignal(str)  # File path
+    failed = pyqtSignal(str)  # Error message
+    cancelled = pyqtSignal()
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.count = 0
+        self._cancel = False
+
+    def cancel(self):
+        self._cancel = True
+
+    def _progress(self, done):
+        if self._cancel:
+            raise ExportCancelled()
+        self.progress.emit(done, self.count)
+
+    def write(self, progress):
+        """Write the file at self.path, calling progress(done) after each chunk; subclasses override it."""
+        raise NotImplementedError
+
+    def run(self):
+        try:
+            self.write(self._progress)
+        except ExportCancelled:
+            self._remove_partial()
+            self.cancelled.emit()
+        except Exception as e:
+            self._remove_partial()
+            self.failed.emit(str(e))
+        else:
+            self.exported.emit(self.path)
+
+    def _remove_partial(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class LogExportWorker(ExportWorker):
+    # Writes a snapshot of the log. The snapshot is taken on the calling (GUI)
+    # thread, so the log can keep growing meanwhile.
+    def __init__(self, log, path, fmt, chunk_size=10000, parent=None):
+        super().__init__(path, parent)
+        if fmt not in WRITERS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.fmt = fmt
+        self.count, self._chunks = log.snapshot(chunk_size)
+        self._messages = log.messages()  # Texts of the snapshot, which may leave the log during the export
+
+    def write(self, progress):
+        progress(0)
+        WRITERS[self.fmt](self._messages, self.path, self.count, self._chunks, progress)
+
+
+class HistoryExportWorker(ExportWorker):
+    # Writes the sample history to Parquet or Arrow IPC. SQLite connections
+    # cannot be shared between threads, so the worker opens its own; the
+    # caller should flush its store first.
+    def __init__(self, db_path, path, fmt, parent=None):
+        super().__init__(path, parent)
+        if fmt not in history_export.FORMATS:
+            raise ValueError(f"Unknown history export format: {fmt}")
+        self.db_path = db_path
+        self.fmt = fmt
+
+    def write(self, progress):
+        store = HistoryStore(self.db_path)
+        try:
+            self.count = store.count_samples()
+            progress(0)
+            history_export.export_history(store, self.path, self.fmt, progress=progress)
+        finally:
+            store.close()
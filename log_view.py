@@ -0,0 +1,85 @@
+from PyQt5.QtWidgets import QTableView, QAbstractItemView, QHeaderView
+from PyQt5.QtCore import Qt, QTimer, QAbstractListModel, QModelIndex, QVariant
+from PyQt5.QtGui import QColor, QFont
+import event_log
+
+# Text colour per log level
+LEVEL_COLORS = {event_log.WARNING: QColor("#e67e22"), event_log.ERROR: QColor("#e74c3c")}
+
+
+class LogListModel(QAbstractListModel):
+    # One row per EventLog record. Rows are inserted and removed as the log
+    # changes and a line is only formatted when the view asks for it.
+    def __init__(self, log, parent=None):
+        super().__init__(parent)
+        self.log = log
+        self._rows = len(log)
+        log.subscribe(self._log_changed)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._rows:
+            return QVariant()
+        if role == Qt.DisplayRole:
+            return self.log.format(self.log.record(index.row()))
+        if role == Qt.ForegroundRole:
+            color = LEVEL_COLORS.get(int(self.log.record(index.row())["level"]))
+            return color if color is not None else QVariant()
+        return QVariant()
+
+    def _log_changed(self, appended, evicted):
+        if not appended:
+            # Log was cleared
+            self.beginResetModel()
+            self._rows = len(self.log)
+            self.endResetModel()
+            return
+        if evicted:
+            self.beginRemoveRows(QModelIndex(), 0, evicted - 1)
+            self._rows -= evicted
+            self.endRemoveRows()
+        self.beginInsertRows(QModelIndex(), self._rows, self._rows + appended - 1)
+        self._rows += appended
+        self.endInsertRows()
+
+
+class LogView(QTableView):
+    # Virtualized log panel: only the visible lines are laid out and painted.
+    # A one-column table rather than a QListView, which lays out every row
+    # (calling back into the Python model twice per row) on each insert;
+    # fixed-height rows keep appends O(1) whatever the log size.
+    def __init__(self, log, parent=None):
+        super().__init__(parent)
+        self.log_model = LogListModel(log, self)
+        self.setModel(self.log_model)
+        self.setFont(QFont("Monospace"))
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().lineSpacing() + 4)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setStyleSheet("QTableView { background-color: #f5f5f5; border: 1px solid #ddd; border-radius: 5px; }")
+        self.tail = True  # Keep the newest line in view
+        self.log_model.rowsInserted.connect(self._rows_inserted)
+        self.log_model.modelReset.connect(self._rows_inserted)
+
+    def showEvent(self, event):
+        # Records may have arrived while the panel was hidden or not yet built
+        super().showEvent(event)
+        QTimer.singleShot(0, self._rows_inserted)  # Once the view has its final size
+
+    def set_tail(self, enabled):
+        self.tail = enabled
+        if enabled:
+            self.scrollToBottom()
+
+    def _rows_inserted(self, *args):
+        if self.tail:
+            self.scrollToBottom()
@@ -0,0 +1,218 @@
+import os
+import sys
+import csv
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+
+# Columns of a frame chunk, in order
+FIELDS = ("timestamp", "channel", "temperature", "humidity", "setpoint")
+
+
+def _chunk(rows):
+    # (timestamp, channel, temperature, humidity, setpoint) rows -> dict of columns
+    if not rows:
+        return None
+    array = np.array(rows, dtype=np.float64).reshape(len(rows), -1)
+    return {name: array[:, i] for i, name in enumerate(FIELDS[:array.shape[1]])}
+
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def read_csv(path, chunk_rows=50000):
+    # CSV with a header naming at least timestamp, channel, temperature and
+    # humidity (setpoint optional). Timestamps are epoch seconds or ISO 8601.
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = [name.strip().lower() for name in next(reader)]
+        columns = [header.index(name) for name in FIELDS if name in header]
+        if len(columns) < 4:
+            raise ValueError(f"{path}: need timestamp, channel, temperature and humidity columns")
+        rows = []
+        for line in reader:
+            if not line:
+                continue
+            rows.append([_parse_time(line[columns[0]])] + [float(line[i]) for i in columns[1:]])
+            if len(rows) >= chunk_rows:
+                yield _chunk(rows)
+                rows = []
+        if rows:
+            yield _chunk(rows)
+
+
+def _arrow_chunk(batch):
+    import pyarrow as pa
+    columns = {}
+    for name in FIELDS:
+        if name not in batch.schema.names:
+            continue
+        column = batch.column(name)
+        if pa.types.is_timestamp(column.type):
+            scale = {"s": 1.0, "ms": 1e3, "us": 1e6, "ns": 1e9}[column.type.unit]
+            columns[name] = column.cast(pa.int64()).to_numpy() / scale
+        else:
+            columns[name] = column.to_numpy(zero_copy_only=False).astype(np.float64)
+    return columns
+
+
+def read_parquet(path, chunk_rows=50000):
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        yield _arrow_chunk(batch)
+
+
+def read_arrow(path, chunk_rows=50000):
+    import pyarrow as pa
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield _arrow_chunk(reader.get_batch(i))
+
+
+def read_history(path, chunk_rows=50000):
+    from history_store import HistoryStore
+    store = HistoryStore(path)
+    try:
+        for page in store.iter_samples(page_size=chunk_rows):
+            yield _chunk([row[:5] for row in page])
+    finally:
+        store.close()
+
+
+READERS = {".csv": read_csv, ".parquet": read_parquet, ".arrow": read_arrow, ".db": read_history}
+
+
+def read_chunks(path, chunk_rows=50000):
+    # Column chunks of a recording, picked by file extension
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported recording: {path} (expected {', '.join(READERS)})")
+    return reader(path, chunk_rows)
+
+
+def iter_frames(chunks):
+    # Group rows into frames, one per recorded tick: (timestamp, columns) where
+    # columns hold every row of that frame. A frame ends when the timestamp
+    # changes or the channel numbers start over (ticks closer together than
+    # the timestamp resolution). Frames may span chunk boundaries.
+    carry = None
+    for chunk in chunks:
+        if chunk is None or not len(chunk["timestamp"]):
+            continue
+        if carry is not None:
+            chunk = {name: np.concatenate((carry[name], chunk[name])) for name in chunk}
+        ts = chunk["timestamp"]
+        bounds = np.flatnonzero((np.diff(ts) != 0) | (np.diff(chunk["channel"]) <= 0)) + 1
+        starts = np.concatenate(([0], bounds))
+        # The last frame might continue in the next chunk
+        for start, end in zip(starts[:-1], bounds):
+            yield float(ts[start]), {name: column[start:end] for name, column in chunk.items()}
+        last = starts[-1]
+        carry = {name: column[last:] for name, column in chunk.items()}
+    if carry is not None:
+        yield float(carry["timestamp"][0]), carry
+
+
+class ReplaySource:
+    # Feeds a recording into a SensorRegistry one frame per read(), in place of
+    # the simulation. Channels missing from the registry are added as needed.
+    def __init__(self, path, use_setpoint=True, chunk_rows=50000):
+        self.path = path
+        self.use_setpoint = use_setpoint
+        self._frames = iter_frames(read_chunks(path, chunk_rows))
+        self._next = next(self._frames, None)
+        self.frames = 0
+
+    @property
+    def next_time(self):
+        # Timestamp of the frame the next read() returns, None at the end
+        return self._next[0] if self._next is not None else None
+
+    def read(self, registry):
+        # Write the next frame into the registry and return its timestamp,
+        # or None when the recording is exhausted
+        if self._next is None:
+            return None
+        timestamp, frame = self._next
+        channels = frame["channel"].astype(np.intp)
+        top = int(channels.max())
+        while len(registry) <= top:
+            registry.add_channel("Replay", f"Channel {len(registry)}")
+        registry.temperature[channels] = frame["temperature"]
+        registry.humidity[channels] = frame["humidity"]
+        if self.use_setpoint and "setpoint" in frame:
+            registry.target[channels] = frame["setpoint"]
+        self.frames += 1
+        self._next = next(self._frames, None)
+        return timestamp
+
+
+class ReplayClock:
+    # Maps wall-clock time to recording time at a fixed speedup. speed=0 means
+    # as fast as possible, in which case due() is always unbounded.
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self._origin = None
+
+    def due(self, first_time, now=None):
+        # Latest recording time that should have been played by now
+        if not self.speed:
+            return float("inf")
+        now = time.perf_counter() if now is None else now
+        if self._origin is None:
+            self._origin = (now, first_time)
+        wall, recorded = self._origin
+        return recorded + (now - wall) * self.speed
+
+
+def run(engine, source, speed=1.0, max_ticks=None):
+    # Blocking replay for headless use; returns the number of frames played
+    engine.source = source
+    engine.running = True
+    clock = ReplayClock(speed)
+    count = 0
+    try:
+        while engine.running and source.next_time is not None and (max_ticks is None or count < max_ticks):
+            if speed:
+                delay = (source.next_time - clock.due(source.next_time)) / speed
+                if delay > 0:
+                    time.sleep(delay)
+            engine.step()
+            count += 1
+    finally:
+        engine.running = False
+    return count
+
+
+if __name__ == "__main__":
+    from control_engine import ControlEngine
+    from controllers import CONTROLLERS
+    from arguments import non_negative
+    parser = argparse.ArgumentParser(description="Replay recorded samples through the control engine")
+    parser.add_argument("recording", help="CSV, Parquet, Arrow IPC or history database file")
+    parser.add_argument("--speed", type=non_negative, default=0, help="speedup over real time (0 = as fast as possible)")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="onoff", help="control algorithm")
+    parser.add_argument("--threshold", type=float, default=2.0, help="on/off hysteresis band in °C")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many frames")
+    parser.add_argument("--quiet", action="store_true", help="only print the final throughput")
+    args = parser.parse_args()
+
+    engine = ControlEngine(controller=CONTROLLERS[args.controller]())
+    engine.threshold = args.threshold
+    source = ReplaySource(args.recording)
+    if not args.quiet:
+        engine.subscribe(lambda s: print(f"{datetime.fromtimestamp(s.timestamp):%Y-%m-%d %H:%M:%S}\t{s.temperature:.2f}°C\t{s.humidity:.0f}%\t{s.error:+.2f}°C"))
+
+    start = time.perf_counter()
+    try:
+        frames = run(engine, source, args.speed, args.ticks)
+    except KeyboardInterrupt:
+        frames = source.frames
+    elapsed = time.perf_counter() - start
+    print(f"{len(engine.registry)} channels, {frames} frames in {elapsed:.2f}s ({frames / elapsed if elapsed else 0:.0f} frames/s)", file=sys.stderr)
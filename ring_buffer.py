@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class RingBuffer:
+    # Preallocated float64 ring buffer. Every value is stored twice (at i and
+    # i + capacity) so the newest `capacity` values always form one contiguous
+    # slice, and view() can hand them to pyqtgraph without copying.
+    def __init__(self, capacity, fill=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._start = 0  # Index of the oldest value
+        self._size = 0
+        if fill is not None:
+            self.extend(fill)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        cap = self.capacity
+        i = (self._start + self._size) % cap
+        self._data[i] = value
+        self._data[i + cap] = value
+        if self._size < cap:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % cap
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        cap = self.capacity
+        n = len(values)
+        if n == 0:
+            return
+        if n >= cap:
+            # Only the newest `capacity` values survive
+            self._data[:cap] = values[-cap:]
+            self._data[cap:] = values[-cap:]
+            self._start = 0
+            self._size = cap
+            return
+        index = (self._start + self._size + np.arange(n)) % cap
+        self._data[index] = values
+        self._data[index + cap] = values
+        overflow = self._size + n - cap
+        if overflow > 0:
+            self._start = (self._start + overflow) % cap
+            self._size = cap
+        else:
+            self._size += n
+
+    def last(self, default=0.0):
+        if not self._size:
+            return default
+        return float(self._data[self._start + self._size - 1])
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def view(self):
+        # Oldest to newest, no copy. Valid until the next append/extend.
+        return self._data[self._start:self._start + self._size]
@@ -0,0 +1,221 @@
+import sys
+import math
+import time
+import argparse
+import threading
+from collections import deque
+import numpy as np
+
+# Windows offered by the statistics panel, in seconds
+WINDOWS = (("15 min", 900), ("1 hour", 3600), ("8 hours", 28800), ("24 hours", 86400))
+
+# Quantiles come from a histogram of 0.1°C bins over this range (readings
+# outside it count in the end bins)
+BIN_WIDTH = 0.1
+BIN_LOW = -20.0
+BINS = 800
+
+
+class Slot:
+    # Sums of the samples that fell into one time slot of a window
+    __slots__ = ("index", "count", "sum", "sumsq", "time", "band_time", "heat_time", "cool_time", "bins")
+
+    def __init__(self, index):
+        self.index = index
+        self.count = 0
+        self.sum = 0.0  # Of value - shift, see SlidingWindow
+        self.sumsq = 0.0
+        self.time = 0.0  # Seconds covered, and how many of them in band / heating / cooling
+        self.band_time = 0.0
+        self.heat_time = 0.0
+        self.cool_time = 0.0
+        self.bins = {}  # Histogram bin -> samples
+
+
+class SlidingWindow:
+    # Min, max, mean, spread, p95 and time fractions of the last `seconds`,
+    # in O(1) amortized per sample. Samples are summed into `slots` time slots;
+    # a slot leaves the window as a whole, so the window edge moves in steps
+    # of seconds / slots. Expired slots are subtracted from the totals, which
+    # are summed afresh once the window has turned over (so rounding cannot
+    # build up over days of running). Min and max are
+    # the fronts of monotonic deques holding at most one entry per slot, and
+    # p95 is read from a histogram the expired slots are subtracted from.
+    # Values that are not finite (a dropped sensor) are only counted, and the
+    # time they stood for is left out of the fractions.
+    def __init__(self, seconds, slots=120):
+        self.seconds = float(seconds)
+        self.width = self.seconds / slots
+        self.slot_count = slots
+        self.slots = deque()
+        self.histogram = [0] * BINS
+        self.shift = None  # Subtracted before summing squares, for precision
+        self._minq = deque()  # (slot index, value), values increasing
+        self._maxq = deque()  # (slot index, value), values decreasing
+        self._totals = Slot(0)
+        self._expired = 0  # Slots subtracted since the totals were last summed
+        self.missing = 0  # Samples skipped because they were not finite
+
+    def expire(self, now):
+        # Drop the slots that ended before the window
+        first = int(now // self.width) - self.slot_count + 1
+        if not self.slots or self.slots[0].index >= first:
+            return
+        totals = self._totals
+        while self.slots and self.slots[0].index < first:
+            slot = self.slots.popleft()
+            for b, n in slot.bins.items():
+                self.histogram[b] -= n
+            totals.count -= slot.count
+            totals.sum -= slot.sum
+            totals.sumsq -= slot.sumsq
+            totals.time -= slot.time
+            totals.band_time -= slot.band_time
+            totals.heat_time -= slot.heat_time
+            totals.cool_time -= slot.cool_time
+            self._expired += 1
+        while self._minq and self._minq[0][0] < first:
+            self._minq.popleft()
+        while self._maxq and self._maxq[0][0] < first:
+            self._maxq.popleft()
+        if self._expired >= self.slot_count:
+            self._expired = 0
+            totals = self._totals = Slot(0)
+            for slot in self.slots:
+                for name in ("count", "sum", "sumsq", "time", "band_time", "heat_time", "cool_time"):
+                    setattr(totals, name, getattr(totals, name) + getattr(slot, name))
+
+    def add(self, timestamp, value, dt, in_band, heating, cooling):
+        # One sample that stood for dt seconds (the time since the previous one)
+        if not math.isfinite(value):
+            self.missing += 1
+            return
+        index = int(timestamp // self.width)
+        if not self.slots or self.slots[-1].index != index:
+            self.expire(timestamp)
+            self.slots.append(Slot(index))
+        slot = self.slots[-1]
+        if self.shift is None:
+            self.shift = value
+        d = value - self.shift
+        b = min(BINS - 1, max(0, int((value - BIN_LOW) / BIN_WIDTH)))
+        self.histogram[b] += 1
+        slot.bins[b] = slot.bins.get(b, 0) + 1
+        for s in (slot, self._totals):
+            s.count += 1
+            s.sum += d
+            s.sumsq += d * d
+            s.time += dt
+            if in_band:
+                s.band_time += dt
+            if heating:
+                s.heat_time += dt
+            if cooling:
+                s.cool_time += dt
+
+        # A later sample of the same slot can only matter if it beats the slot's entry
+        minq = self._minq
+        if not (minq and minq[-1][0] == index and minq[-1][1] <= value):
+            while minq and minq[-1][1] >= value:
+                minq.pop()
+            minq.append((index, value))
+        maxq = self._maxq
+        if not (maxq and maxq[-1][0] == index and maxq[-1][1] >= value):
+            while maxq and maxq[-1][1] <= value:
+                maxq.pop()
+            maxq.append((index, value))
+
+    def quantile(self, q):
+        # Middle of the histogram bin holding the q-th quantile, within the window's min and max
+        count = self._totals.count
+        if not count:
+            return float("nan")
+        b = int(np.searchsorted(np.cumsum(self.histogram), q * count))
+        value = BIN_LOW + (min(b, BINS - 1) + 0.5) * BIN_WIDTH
+        return min(max(value, self._minq[0][1]), self._maxq[0][1])
+
+    def summary(self, now=None):
+        # Everything the statistics panel shows, as a dict (empty without samples)
+        if now is not None:
+            self.expire(now)
+        t = self._totals
+        if not t.count:
+            return {}
+        mean = t.sum / t.count
+        var = max(0.0, (t.sumsq - t.sum * mean) / (t.count - 1)) if t.count > 1 else 0.0
+        covered = t.time or float("nan")
+        return {"count": t.count, "min": self._minq[0][1], "max": self._maxq[0][1], "mean": self.shift + mean,
+                "std": var ** 0.5, "p95": self.quantile(0.95), "in_band": t.band_time / covered,
+                "heating": t.heat_time / covered, "cooling": t.cool_time / covered, "span": t.time}
+
+
+class RollingStats:
+    # Sliding windows of one channel's temperature, one per entry of
+    # `windows`, all updated on every tick so switching between them is
+    # instant. In band means within the engine's threshold of the target;
+    # heating and cooling are the relay states confirmed by the HVAC bus.
+    # Gaps longer than max_gap (a stopped system) add no time.
+    def __init__(self, windows=WINDOWS, channel=0, max_gap=60.0):
+        self.windows = {name: SlidingWindow(seconds) for name, seconds in windows}
+        self.channel = channel
+        self.max_gap = max_gap
+        self.last_time = None
+        self._lock = threading.Lock()  # Updated on the acquisition thread, read on the GUI thread
+
+    def add(self, timestamp, value, in_band, heating, cooling):
+        with self._lock:
+            dt = 0.0 if self.last_time is None else timestamp - self.last_time
+            if not 0.0 <= dt <= self.max_gap:
+                dt = 0.0
+            self.last_time = timestamp
+            for window in self.windows.values():
+                window.add(timestamp, value, dt, in_band, heating, cooling)
+
+    def attach(self, engine):
+        # Follow the channel on each tick of the engine
+        def record(sample):
+            channel = self.channel
+            registry = engine.registry
+            value = float(registry.temperature[channel])
+            heating, cooling = engine.actuators.state(channel)[0][:2]
+            self.add(sample.timestamp, value, abs(value - registry.target[channel]) <= engine.threshold, heating, cooling)
+        engine.subscribe(record)
+        return record
+
+    def summary(self, name, now=None):
+        # Statistics of the named window up to `now` (default: the newest sample)
+        with self._lock:
+            return self.windows[name].summary(now if now is not None else self.last_time)
+
+
+if __name__ == "__main__":
+    from controllers import CONTROLLERS, split_range
+    from thermal_model import ThermalPlant
+    parser = argparse.ArgumentParser(description="Rolling statistics of a simulated lab over each window")
+    parser.add_argument("--hours", type=float, default=48.0, help="plant hours to simulate")
+    parser.add_argument("--step", type=float, default=2.0, help="plant seconds per tick")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="onoff", help="control algorithm")
+    parser.add_argument("--band", type=float, default=2.0, help="in-band distance from the target in °C")
+    args = parser.parse_args()
+
+    plant = ThermalPlant.varied(1, noise=0.3)
+    controller = CONTROLLERS[args.controller]()
+    controller.band = args.band
+    temperature, humidity, target = np.array([24.5]), np.array([45.0]), np.array([23.0])
+    stats = RollingStats()
+    ticks = int(args.hours * 3600 / args.step)
+    elapsed = 0.0
+    for tick in range(ticks):
+        now = tick * args.step
+        heat, cool = split_range(controller.update(temperature, target, args.step))
+        plant.step(temperature, humidity, heat, cool, now, args.step)
+        value = float(temperature[0])
+        start = time.perf_counter()
+        stats.add(now, value, abs(value - target[0]) <= args.band, heat[0] > 0, cool[0] > 0)
+        elapsed += time.perf_counter() - start
+    print(f"{'window':<10}{'min':>7}{'max':>7}{'mean':>7}{'std':>6}{'p95':>7}{'in band':>9}{'heating':>9}{'cooling':>9}")
+    for name, _ in WINDOWS:
+        s = stats.summary(name)
+        print(f"{name:<10}{s['min']:>7.2f}{s['max']:>7.2f}{s['mean']:>7.2f}{s['std']:>6.2f}{s['p95']:>7.2f}"
+              f"{s['in_band']:>9.1%}{s['heating']:>9.1%}{s['cooling']:>9.1%}")
+    print(f"{ticks} samples, {elapsed / ticks * 1e6:.1f} µs each for {len(WINDOWS)} windows", file=sys.stderr)
@@ -0,0 +1,85 @@
+from PyQt5.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+
+HEADERS = ["Room", "Sensor", "Temperature", "Humidity", "Target", "Error"]
+
+
+class RoomsModel(QAbstractTableModel):
+    # Read-only table over a SensorRegistry. Cells are formatted on demand,
+    # so only the rows the view actually paints cost anything.
+    def __init__(self, registry, parent=None):
+        super().__init__(parent)
+        self.registry = registry
+        self._rows = len(registry)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        row, column = index.row(), index.column()
+        if role == Qt.TextAlignmentRole and column >= 2:
+            return Qt.AlignRight | Qt.AlignVCenter
+        if role != Qt.DisplayRole:
+            return QVariant()
+        registry = self.registry
+        if column == 0:
+            return registry.rooms[row]
+        if column == 1:
+            return registry.sensors[row]
+        if column == 2:
+            return f"{registry.temperature[row]:.1f}°C"
+        if column == 3:
+            return f"{registry.humidity[row]:.0f}%"
+        if column == 4:
+            return f"{registry.target[row]:.1f}°C"
+        return f"{registry.temperature[row] - registry.target[row]:+.1f}°C"
+
+    def sync_rows(self):
+        # Pick up channels added to the registry since the last call
+        count = len(self.registry)
+        if count > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, count - 1)
+            self._rows = count
+            self.endInsertRows()
+
+    def refresh_rows(self, first, last):
+        if self._rows and first <= last:
+            self.dataChanged.emit(self.index(first, 2), self.index(last, len(HEADERS) - 1), [Qt.DisplayRole])
+
+
+class RoomsView(QTableView):
+    # Table of every channel that only repaints the rows currently on screen
+    def __init__(self, registry, parent=None):
+        super().__init__(parent)
+        self.rooms_model = RoomsModel(registry, self)
+        self.setModel(self.rooms_model)
+        self.setAlternatingRowColors(True)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.verticalHeader().setVisible(False)
+        # Fixed row heights so Qt never measures off-screen rows
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(24)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+    def refresh(self):
+        self.rooms_model.sync_rows()
+        if not self.isVisible():
+            return
+        first = self.rowAt(0)
+        if first < 0:
+            return
+        last = self.rowAt(self.viewport().height() - 1)
+        if last < 0:
+            last = self.rooms_model.rowCount() - 1
+        self.rooms_model.refresh_rows(first, last)
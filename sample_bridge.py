@@ -0,0 +1,177 @@
+import sys
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+from diagnostics import BUCKETS, bucket
+
+# One Sample (see control_engine) per ring slot
+SAMPLE = np.dtype([
+    ("timestamp", np.float64),
+    ("tick", np.int64),
+    ("temperature", np.float64),
+    ("humidity", np.float64),
+    ("target", np.float64),
+    ("error", np.float64),
+])
+
+
+class SampleRing:
+    # Single-producer/single-consumer ring of samples without locks. Only the
+    # producer writes `head` and only the consumer writes `tail`; a slot is
+    # filled before head moves past it, so the consumer never sees a partly
+    # written sample. A producer that laps the consumer overwrites the oldest
+    # samples, which are counted in `dropped` instead of blocking acquisition.
+    def __init__(self, capacity=65536):
+        self.capacity = int(capacity)
+        self._slots = np.zeros(self.capacity, dtype=SAMPLE)
+        self.head = 0  # Samples pushed so far
+        self.tail = 0  # Samples drained so far
+        self.dropped = 0
+
+    def __len__(self):
+        return min(self.head - self.tail, self.capacity)
+
+    def push(self, sample):
+        head = self.head
+        self._slots[head % self.capacity] = tuple(sample)
+        self.head = head + 1
+
+    def drain(self):
+        # Every sample pushed since the last drain, oldest first, as a copy
+        head = self.head
+        tail = max(self.tail, head - self.capacity)
+        indices = np.arange(tail, head) % self.capacity
+        batch = self._slots[indices]
+        # Slots the producer reused while they were being copied are stale
+        overwritten = self.head - self.capacity - tail
+        if overwritten > 0:
+            batch = batch[overwritten:]
+        self.dropped += len(indices) - len(batch) + tail - self.tail
+        self.tail = head
+        return batch
+
+
+class JitterStats:
+    # How late each tick started against its schedule: count, mean and
+    # standard deviation (Welford), worst case, a histogram (diagnostics
+    # buckets) and the recent ticks for percentiles
+    def __init__(self, recent=4096):
+        self._recent = np.zeros(recent)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.max = 0.0
+        self.histogram = [0] * BUCKETS
+
+    def add(self, lateness):
+        self._recent[self.count % len(self._recent)] = lateness
+        self.count += 1
+        delta = lateness - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (lateness - self.mean)
+        if lateness > self.max:
+            self.max = lateness
+        self.histogram[bucket(lateness)] += 1
+
+    @property
+    def std(self):
+        return (self._m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def percentile(self, q):
+        recent = self._recent[:min(self.count, len(self._recent))]
+        return float(np.percentile(recent, q)) if len(recent) else 0.0
+
+    def to_dict(self):
+        # Same fields as diagnostics.Stage.to_dict, plus the spread
+        return {"count": self.count, "mean_us": self.mean * 1e6, "std_us": self.std * 1e6,
+                "p50_us": self.percentile(50) * 1e6, "p99_us": self.percentile(99) * 1e6,
+                "max_us": self.max * 1e6, "histogram": list(self.histogram)}
+
+    def summary(self):
+        # Milliseconds, for display
+        return (f"mean {self.mean * 1e3:.2f} ms, std {self.std * 1e3:.2f} ms, "
+                f"p99 {self.percentile(99) * 1e3:.2f} ms, max {self.max * 1e3:.2f} ms")
+
+
+class SampleBridge:
+    # Runs the engine's acquisition and control loop in a worker thread. Its
+    # samples go into a SampleRing that the GUI drains once per frame, and
+    # anything else the worker needs done on the GUI thread is post()ed and
+    # run at the next drain. A slow GUI (an export, a file dialog) therefore
+    # never delays sampling, and tick lateness is recorded in `jitter`.
+    def __init__(self, engine, capacity=65536):
+        self.engine = engine
+        self.ring = SampleRing(capacity)
+        self.jitter = JitterStats()
+        self._calls = queue.SimpleQueue()
+        self._thread = None
+        engine.subscribe(self.ring.push)
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, rate_hz):
+        if self._thread is not None:
+            return
+        self.jitter.reset()
+        self.engine.running = True
+        self._thread = threading.Thread(target=self.engine.run, name="acquisition",
+                                        kwargs={"rate_hz": rate_hz, "jitter": self.jitter}, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Ends the loop after the current tick and waits for it
+        if self._thread is None:
+            return
+        while self._thread.is_alive():
+            self.engine.running = False
+            self._thread.join(0.05)
+        self._thread = None
+
+    def post(self, callback, *args):
+        # Call callback(*args) on the draining thread
+        self._calls.put((callback, args))
+
+    def drain(self):
+        # Run posted calls, then return the new samples as a SAMPLE array
+        while True:
+            try:
+                callback, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        return self.ring.drain()
+
+
+if __name__ == "__main__":
+    from control_engine import ControlEngine
+    from sensor_registry import populate
+    parser = argparse.ArgumentParser(description="Sample in a worker thread and drain in bulk, reporting jitter")
+    parser.add_argument("--rate", type=float, default=100.0, help="samples per second")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long to run")
+    parser.add_argument("--frame", type=float, default=0.05, help="seconds between drains")
+    parser.add_argument("--stall", type=float, default=0.0, help="seconds the consumer blocks on every drain")
+    parser.add_argument("--rooms", type=int, default=0, help="simulate this many extra labs")
+    args = parser.parse_args()
+
+    engine = ControlEngine(dt=1.0 / args.rate)
+    populate(engine.registry, args.rooms)
+    bridge = SampleBridge(engine)
+    bridge.start(args.rate)
+    drained = drains = 0
+    end = time.perf_counter() + args.seconds
+    while time.perf_counter() < end:
+        time.sleep(args.frame)
+        time.sleep(args.stall)  # A busy GUI thread
+        drained += len(bridge.drain())
+        drains += 1
+    bridge.stop()
+    drained += len(bridge.drain())
+    print(f"{engine.tick} ticks, {drained} samples in {drains} drains, {bridge.ring.dropped} dropped", file=sys.stderr)
+    print(f"tick lateness: {bridge.jitter.summary()}", file=sys.stderr)
@@ -0,0 +1,271 @@
+import sys
+import time
+import base64
+import struct
+import asyncio
+import hashlib
+import argparse
+from urllib.parse import urlsplit
+import numpy as np
+from sample_bridge import SampleRing, SAMPLE
+
+# Binary frame of primary-channel samples, little-endian: a header of the
+# first sample's tick and timestamp, the sample count and the decimation,
+# then one column per field: seconds after the first timestamp (float32),
+# temperature and target in hundredths of a °C and humidity in tenths of a
+# percent (int16), with MISSING where there is no reading (NaN, e.g. the
+# humidity of a temperature-only sensor). 10 bytes per sample against
+# about 60 as JSON.
+HEADER = struct.Struct("<qdIH")
+MISSING = -32768
+
+# Most samples a client can skip between two it is sent
+MAX_DECIMATION = 10000
+
+# Bytes a viewer may have waiting to be sent before frames for it are dropped
+MAX_BUFFERED = 1 << 20
+
+# Samples sent to a viewer when it connects, so its trend is not empty (an
+# hour at 1 sample per second, two at the default 0.5)
+BACKLOG = 3600
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"  # RFC 6455 handshake constant
+TEXT, BINARY, CLOSE, PING, PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+def fixed(values, scale):
+    # int16 column of values in 1/scale units, MISSING for NaN. Values beyond
+    # the range (a sensor fault code) are clipped to its ends rather than
+    # wrapping around.
+    column = np.round(values * scale)
+    np.clip(column, MISSING + 1, 32767, out=column)
+    column[np.isnan(column)] = MISSING
+    return column.astype("<i2")
+
+
+def encode(batch, decimation=1):
+    # Frame body of a SAMPLE array
+    start = (int(batch["tick"][0]), float(batch["timestamp"][0])) if len(batch) else (0, 0.0)
+    return b"".join((HEADER.pack(*start, len(batch), decimation),
+                     (batch["timestamp"] - start[1]).astype("<f4").tobytes(),
+                     fixed(batch["temperature"], 100.0).tobytes(),
+                     fixed(batch["humidity"], 10.0).tobytes(),
+                     fixed(batch["target"], 100.0).tobytes()))
+
+
+def decode(body):
+    # Frame body back to a dict of columns
+    tick, timestamp, count, decimation = HEADER.unpack_from(body)
+    offset = HEADER.size
+    columns = {"tick": tick, "decimation": decimation}
+    for name, dtype, scale in (("timestamp", "<f4", 1.0), ("temperature", "<i2", 100.0),
+                               ("humidity", "<i2", 10.0), ("target", "<i2", 100.0)):
+        column = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+        offset += column.nbytes
+        columns[name] = column.astype(np.float64) / scale
+        if dtype == "<i2":
+            columns[name][column == MISSING] = np.nan
+    columns["timestamp"] = columns["timestamp"] + timestamp
+    return columns
+
+
+def ws_frame(payload, opcode=BINARY):
+    # One unmasked, unfragmented WebSocket frame (server to client)
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return head + payload
+
+
+async def ws_read(reader):
+    # (opcode, payload) of the next frame, unmasking it if it is masked
+    first, second = await reader.readexactly(2)
+    n = second & 0x7F
+    if n == 126:
+        n, = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        n, = struct.unpack("!Q", await reader.readexactly(8))
+    if n > MAX_BUFFERED:
+        raise ConnectionError("frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask is not None:
+        payload = (np.frombuffer(payload, dtype=np.uint8) ^ np.resize(np.frombuffer(mask, dtype=np.uint8), n)).tobytes()
+    return first & 0x0F, payload
+
+
+class Viewer:
+    # One connected client and the every-how-many samples it wants
+    __slots__ = ("writer", "decimation", "frames", "dropped")
+
+    def __init__(self, writer, decimation):
+        self.writer = writer
+        self.decimation = decimation
+        self.frames = 0
+        self.dropped = 0  # Frames skipped because the client could not keep up
+
+
+class SampleStream:
+    # Pushes the primary channel's samples to WebSocket viewers. The engine
+    # pushes every sample into a SampleRing; run() drains it every `interval`
+    # seconds on the event loop, like the dashboard's frame timer, and sends
+    # the batch as one binary frame (see HEADER).
+    #
+    # Each viewer picks a decimation N (?decimate=N, or a text message with
+    # the number later) and is sent the samples whose tick is a multiple of
+    # N. So every viewer with the same N gets the very same bytes, and a
+    # batch is filtered, encoded and framed once per distinct N however many
+    # viewers there are. Writes never wait for a viewer: frames for one with
+    # more than MAX_BUFFERED bytes unsent are dropped and counted, and the
+    # tick in the next frame shows the gap.
+    def __init__(self, engine, interval=0.05, backlog=BACKLOG):
+        self.interval = interval
+        self.backlog = backlog
+        self.ring = SampleRing()
+        self.recent = np.zeros(0, dtype=SAMPLE)  # Newest `backlog` samples, for new viewers
+        self.viewers = set()
+        self.batches = 0
+        self.encoded = 0  # Frames serialized
+        self.sent = 0  # Frames written to viewers
+        engine.subscribe(self.ring.push)
+
+    async def run(self):
+        while True:
+            self.broadcast(self.ring.drain())
+            await asyncio.sleep(self.interval)
+
+    def broadcast(self, batch):
+        if not len(batch):
+            return
+        self.batches += 1
+        self.recent = np.concatenate((self.recent, batch))[-self.backlog:]
+        frames = {}  # Decimation -> framed bytes (None: no samples for it in this batch)
+        for viewer in list(self.viewers):
+            n = viewer.decimation
+            if n not in frames:
+                frames[n] = self._frame(batch, n)
+            frame = frames[n]
+            if frame is None:
+                continue
+            transport = viewer.writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > MAX_BUFFERED:
+                viewer.dropped += 1
+                continue
+            viewer.writer.write(frame)
+            viewer.frames += 1
+            self.sent += 1
+
+    def _frame(self, batch, decimation):
+        if decimation > 1:
+            batch = batch[batch["tick"] % decimation == 0]
+            if not len(batch):
+                return None
+        self.encoded += 1
+        return ws_frame(encode(batch, decimation))
+
+    async def serve(self, reader, writer, headers, query):
+        # Take over an HTTP connection that asked for a WebSocket upgrade
+        key = headers.get("sec-websocket-key")
+        if headers.get("upgrade", "").lower() != "websocket" or not key:
+            writer.write(b"HTTP/1.1 426 Upgrade Required\r\nUpgrade: websocket\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            return
+        try:
+            decimation = min(max(int(query.get("decimate", 1)), 1), MAX_DECIMATION)
+        except ValueError:
+            decimation = 1
+        accept = base64.b64encode(hashlib.sha1((key + GUID).encode("ascii")).digest()).decode("ascii")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1"))
+        viewer = Viewer(writer, decimation)
+        recent = self.recent
+        if len(recent):
+            writer.write(ws_frame(encode(recent[recent["tick"] % decimation == 0] if decimation > 1 else recent,
+                                         decimation)))
+        self.viewers.add(viewer)
+        try:
+            while True:
+                opcode, payload = await ws_read(reader)
+                if opcode == CLOSE:
+                    writer.write(ws_frame(payload[:2], CLOSE))
+                    break
+                if opcode == PING:
+                    writer.write(ws_frame(payload, PONG))
+                elif opcode == TEXT:
+                    try:
+                        viewer.decimation = min(max(int(payload), 1), MAX_DECIMATION)
+                    except ValueError:
+                        pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+        await writer.drain()
+
+
+async def watch(url, seconds=None, on_frame=None):
+    # Minimal viewer: connects to a stream URL and hands each decoded frame
+    # to on_frame; returns (frames, bytes) received
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    key = base64.b64encode(np.random.default_rng().bytes(16)).decode("ascii")
+    path = parts.path + ("?" + parts.query if parts.query else "")
+    writer.write((f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode("latin-1"))
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    if " 101 " not in head.split("\r\n")[0]:
+        raise ConnectionError(head.split("\r\n")[0])
+    frames = received = 0
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    try:
+        while deadline is None or time.perf_counter() < deadline:
+            try:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                opcode, payload = await asyncio.wait_for(ws_read(reader), timeout)
+            except asyncio.TimeoutError:
+                break
+            if opcode == CLOSE:
+                break
+            if opcode == BINARY:
+                frames += 1
+                received += len(payload)
+                if on_frame is not None:
+                    on_frame(decode(payload))
+        # Masked close frame, as clients must send
+        writer.write(struct.pack("!BB", 0x80 | CLOSE, 0x80) + bytes(4))
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+    return frames, received
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the samples pushed by api_server.py")
+    parser.add_argument("url", nargs="?", default="ws://127.0.0.1:8080/api/stream", help="stream URL")
+    parser.add_argument("--decimate", type=int, default=1, help="only every Nth sample")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this long")
+    args = parser.parse_args()
+
+    url = args.url
+    if args.decimate > 1:
+        url += ("&" if "?" in url else "?") + f"decimate={args.decimate}"
+
+    def show(columns):
+        for timestamp, temperature, humidity, target in zip(columns["timestamp"], columns["temperature"],
+                                                            columns["humidity"], columns["target"]):
+            print(f"{time.strftime('%H:%M:%S', time.localtime(float(timestamp)))}\t{temperature:.2f}°C\t"
+                  f"{humidity:.1f}%\t{temperature - target:+.2f}°C")
+
+    try:
+        frames, received = asyncio.run(watch(url, args.seconds, show))
+        print(f"{frames} frames, {received} bytes", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,608 @@
+import re
+import sys
+import json
+import time
+import queue
+import struct
+import asyncio
+import argparse
+import threading
+from collections import namedtuple
+
+# Items put on the poller queue
+Reading = namedtuple("Reading", ["timestamp", "room", "sensor", "temperature", "humidity"])
+DeviceStatus = namedtuple("DeviceStatus", ["timestamp", "device", "online", "message"])
+
+# Largest Modbus read (holding registers) in one request
+MODBUS_MAX_REGISTERS = 125
+
+
+class DeviceError(Exception):
+    pass
+
+
+def plan_reads(registers, max_gap=8, max_count=MODBUS_MAX_REGISTERS):
+    # Merge register addresses into as few (start, count) reads as possible,
+    # reading across gaps of up to max_gap unused registers
+    reads = []
+    for address in sorted(set(registers)):
+        if reads:
+            start, count = reads[-1]
+            if address - (start + count) <= max_gap and address - start < max_count:
+                reads[-1] = (start, address - start + 1)
+                continue
+        reads.append((address, 1))
+    return reads
+
+
+class ModbusConnection:
+    # One Modbus-TCP connection, shared by every device behind the same
+    # gateway. Requests are serialized; many gateways are polled in parallel.
+    # `timeout` bounds each request once it has the connection, so waiting
+    # behind the other units of a busy gateway does not count against it.
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+        self._transaction = 0
+
+    async def _connect(self):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def _request(self, unit, pdu):
+        # Send one request PDU and return the response PDU
+        async with self._lock:
+            return await asyncio.wait_for(self._exchange(unit, pdu), self.timeout)
+
+    async def _exchange(self, unit, pdu):
+        await self._connect()
+        self._transaction = (self._transaction + 1) & 0xFFFF
+        request = struct.pack(">HHHB", self._transaction, 0, len(pdu) + 1, unit) + pdu
+        try:
+            self._writer.write(request)
+            await self._writer.drain()
+            header = await self._reader.readexactly(7)
+            transaction, _protocol, length, _unit = struct.unpack(">HHHB", header)
+            body = await self._reader.readexactly(length - 1)
+        except (OSError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # The stream is out of step after a failure or a timeout
+            self.close()
+            raise
+        if transaction != self._transaction:
+            self.close()
+            raise DeviceError(f"{self.host}:{self.port}: unexpected transaction {transaction}")
+        if body[0] & 0x80:
+            raise DeviceError(f"{self.host}:{self.port} unit {unit}: Modbus exception {body[1]}")
+        return body
+
+    async def read_holding(self, unit, start, count):
+        body = await self._request(unit, struct.pack(">BHH", 3, start, count))
+        return struct.unpack(f">{body[1] // 2}H", body[2:2 + body[1]])
+
+    async def write_coils(self, unit, start, values):
+        # Write multiple coils (function 15) starting at `start`
+        packed = bytearray((len(values) + 7) // 8)
+        for i, value in enumerate(values):
+            if value:
+                packed[i // 8] |= 1 << (i % 8)
+        await self._request(unit, struct.pack(">BHHB", 15, start, len(values), len(packed)) + bytes(packed))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+
+class ConnectionPool:
+    # Shared connections keyed by (host, port). The pool owns them: devices
+    # only drop their reference, and the pool closes them at the end.
+    def __init__(self, timeout=None):
+        self.timeout = timeout  # Of each request
+        self._connections = {}
+
+    def modbus(self, host, port):
+        key = (host, port)
+        if key not in self._connections:
+            self._connections[key] = ModbusConnection(host, port, self.timeout)
+        return self._connections[key]
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+
+class Device:
+    # A polled device serving one or more channels. poll() returns
+    # (room, sensor, temperature, humidity) tuples for the channels it read.
+    # Devices that switch relays also implement write().
+    driver = None
+    timed = False  # True if the driver bounds each request by the pool's timeout itself
+
+    def __init__(self, name, channels):
+        self.name = name
+        self.channels = channels  # Dicts with at least room and sensor
+
+    async def open(self, pool):
+        pass
+
+    async def poll(self):
+        """Readings of the channels this device serves; every driver overrides it."""
+        raise NotImplementedError
+
+    async def write(self, writes):
+        # Set relays: [(address, on), ...] sorted by address
+        raise DeviceError(f"{self.name}: {self.driver} devices have no outputs")
+
+    async def close(self):
+        pass
+
+
+class ModbusDevice(Device):
+    # Modbus-TCP unit with temperature/humidity in holding registers, stored
+    # as signed 16-bit values times `scale`. All registers of the unit are
+    # fetched in as few block reads as possible. Channels may list the
+    # "coils" of their heat, cool and fan relays.
+    driver = "modbus"
+    timed = True
+
+    def __init__(self, name, channels, host, port=502, unit=1, scale=0.1, max_gap=8):
+        super().__init__(name, channels)
+        self.host = host
+        self.port = port
+        self.unit = unit
+        self.scale = scale
+        registers = [c[field] for c in channels for field in ("temperature", "humidity") if field in c]
+        self.reads = plan_reads(registers, max_gap)
+        self._connection = None
+
+    async def open(self, pool):
+        self._connection = pool.modbus(self.host, self.port)
+
+    async def poll(self):
+        values = {}
+        for start, count in self.reads:
+            words = await self._connection.read_holding(self.unit, start, count)
+            for offset, word in enumerate(words):
+                values[start + offset] = word - 0x10000 if word & 0x8000 else word
+        readings = []
+        for channel in self.channels:
+            temperature = values[channel["temperature"]] * self.scale
+            humidity = values[channel["humidity"]] * self.scale if "humidity" in channel else float("nan")
+            readings.append((channel["room"], channel["sensor"], temperature, humidity))
+        return readings
+
+    async def write(self, writes):
+        # One write per run of consecutive coils
+        run = []
+        for address, value in writes + [(None, None)]:
+            if run and address != run[0][0] + len(run):
+                await self._connection.write_coils(self.unit, run[0][0], [v for _, v in run])
+                run = []
+            run.append((address, value))
+
+    async def close(self):
+        # The connection is shared with the other units of the gateway and
+        # resets itself after a failed request; the pool closes it
+        self._connection = None
+
+
+class SerialDevice(Device):
+    # One sensor on a serial line that answers `command` with a text line
+    # matched by `pattern` (named groups temperature and optionally humidity)
+    driver = "serial"
+
+    def __init__(self, name, channels, port, baudrate=9600, command="R\r\n",
+                 pattern=r"T=(?P<temperature>-?[\d.]+)(?:.*H=(?P<humidity>[\d.]+))?"):
+        super().__init__(name, channels)
+        self.port = port
+        self.baudrate = baudrate
+        self.command = command.encode()
+        self.pattern = re.compile(pattern)
+        self._reader = None
+        self._writer = None
+
+    async def open(self, pool):
+        import serial_asyncio
+        self._reader, self._writer = await serial_asyncio.open_serial_connection(url=self.port, baudrate=self.baudrate)
+
+    async def poll(self):
+        self._writer.write(self.command)
+        line = (await self._reader.readline()).decode("ascii", "replace")
+        match = self.pattern.search(line)
+        if match is None:
+            raise DeviceError(f"{self.port}: unexpected reply {line.strip()!r}")
+        humidity = match.group("humidity") if "humidity" in self.pattern.groupindex else None
+        channel = self.channels[0]
+        return [(channel["room"], channel["sensor"], float(match.group("temperature")),
+                 float(humidity) if humidity else float("nan"))]
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class MqttDevice(Device):
+    # Sensors publishing to an MQTT broker, one topic per channel, with a JSON
+    # payload {"temperature": .., "humidity": ..} or a bare temperature. poll()
+    # returns the channels that published since the previous poll.
+    driver = "mqtt"
+
+    def __init__(self, name, channels, host, port=1883, username=None, password=None):
+        super().__init__(name, channels)
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self._topics = {c["topic"]: c for c in channels}
+        self._fresh = {}
+        self._client = None
+        self._listener = None
+
+    async def open(self, pool):
+        import aiomqtt
+        client = aiomqtt.Client(self.host, self.port, username=self.username, password=self.password)
+        await client.__aenter__()
+        self._client = client
+        for topic in self._topics:
+            await self._client.subscribe(topic)
+        self._listener = asyncio.ensure_future(self._listen())
+
+    async def _listen(self):
+        async for message in self._client.messages:
+            channel = self._topics.get(str(message.topic))
+            if channel is None:
+                continue
+            try:
+                payload = json.loads(message.payload)
+            except ValueError:
+                continue
+            if isinstance(payload, dict):
+                temperature = float(payload["temperature"])
+                humidity = float(payload.get("humidity", float("nan")))
+            else:
+                temperature, humidity = float(payload), float("nan")
+            self._fresh[str(message.topic)] = (channel["room"], channel["sensor"], temperature, humidity)
+
+    async def poll(self):
+        if self._listener is None or self._listener.done():
+            error = self._listener.exception() if self._listener is not None else None
+            raise DeviceError(f"{self.host}:{self.port}: not subscribed ({error})")
+        readings = list(self._fresh.values())
+        self._fresh.clear()
+        return readings
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._client is not None:
+            try:
+                await self._client.__aexit__(None, None, None)
+            except Exception:
+                pass
+            self._client = None
+
+
+DRIVERS = {cls.driver: cls for cls in (ModbusDevice, SerialDevice, MqttDevice)}
+
+
+def load_devices(path):
+    # Devices from a JSON list of {"driver": ..., "name": ..., "channels": [...], <driver options>}
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    devices = []
+    for index, entry in enumerate(config):
+        entry = dict(entry)
+        driver = DRIVERS.get(entry.pop("driver", None))
+        if driver is None:
+            raise ValueError(f"{path}: device {index} needs a driver ({', '.join(DRIVERS)})")
+        devices.append(driver(entry.pop("name", f"device {index}"), entry.pop("channels"), **entry))
+    return devices
+
+
+class DevicePoller:
+    # Polls every device concurrently on an asyncio loop in a background
+    # thread, each poll (each request, for Modbus) bounded by `timeout`. Readings and online/offline
+    # changes are put on a thread-safe queue, so a slow or dead device never
+    # blocks the caller. A failed device is reopened on the next round.
+    def __init__(self, devices, interval=2.0, timeout=1.0, queue_size=100000):
+        self.devices = devices
+        self.interval = interval
+        self.timeout = timeout
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0  # Items lost because nobody drained the queue
+        self._online = {}
+        self._loop = None
+        self._stop = None
+        self._thread = None
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._stop = asyncio.Event()
+            ready.set()
+            self._loop.run_until_complete(self._main())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="device-poller", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+            self._thread = None
+
+    def send(self, device, writes, done):
+        # Actuator bus interface (see actuators.ActuatorBank): write relays of
+        # the named device on the poller loop and report done(ok, message)
+        target = next((d for d in self.devices if d.name == device), None)
+        if target is None or self._thread is None:
+            done(False, f"{device}: not polled")
+            return
+        asyncio.run_coroutine_threadsafe(self._write(target, writes, done), self._loop)
+
+    async def _write(self, device, writes, done):
+        if not self._online.get(device.name):
+            done(False, f"{device.name}: offline")
+            return
+        try:
+            await self._bounded(device, device.write(writes))
+        except asyncio.TimeoutError:
+            done(False, f"{device.name}: no reply within {self.timeout:g} s")
+        except Exception as e:
+            done(False, f"{device.name}: {e or type(e).__name__}")
+        else:
+            done(True)
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _status(self, device, online, message=""):
+        if self._online.get(device.name) != online:
+            self._online[device.name] = online
+            self._put(DeviceStatus(time.time(), device.name, online, message))
+
+    async def _main(self):
+        pool = ConnectionPool(self.timeout)
+        try:
+            while not self._stop.is_set():
+                started = self._loop.time()
+                await asyncio.gather(*(self._poll(device, pool) for device in self.devices))
+                try:
+                    await asyncio.wait_for(self._stop.wait(), max(0.0, self.interval - (self._loop.time() - started)))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for device in self.devices:
+                await device.close()
+            pool.close()
+
+    async def _bounded(self, device, call):
+        # Whole calls are bounded by the timeout, unless the driver bounds each request
+        return await (call if device.timed else asyncio.wait_for(call, self.timeout))
+
+    async def _poll(self, device, pool):
+        try:
+            if not self._online.get(device.name):
+                await self._bounded(device, device.open(pool))
+            readings = await self._bounded(device, device.poll())
+        except asyncio.TimeoutError:
+            await device.close()
+            self._status(device, False, f"no reply within {self.timeout:g} s")
+            return
+        except Exception as e:  # Whatever the driver raised, one bad device must not stop the others
+            await device.close()
+            self._status(device, False, str(e) or type(e).__name__)
+            return
+        self._status(device, True)
+        now = time.time()
+        for room, sensor, temperature, humidity in readings:
+            self._put(Reading(now, room, sensor, temperature, humidity))
+
+
+class HardwareSource:
+    # Engine source fed by a DevicePoller. read() never waits: it drains
+    # whatever arrived since the last step into the registry, adding channels
+    # for new sensors, and reports device status changes to on_status.
+    # Channels with "coils" are routed to their device in `actuators` (an
+    # ActuatorBank writing through the poller) once they are in the registry.
+    def __init__(self, poller, on_status=None, actuators=None, target=23.0):
+        self.poller = poller
+        self.on_status = on_status
+        self.actuators = actuators
+        self.target = target  # Setpoint of channels added for new sensors
+        self._channels = {}
+        self._coils = {(c["room"], c["sensor"]): (device.name, c["coils"])
+                       for device in poller.devices for c in device.channels if "coils" in c}
+
+    def prime(self, registry, timeout=5.0):
+        # Waits up to `timeout` seconds for the first reading of every
+        # configured sensor and adds the channels of those that answered in
+        # configuration order, so that the first configured sensor is the
+        # primary channel (index 0) rather than whichever reported first.
+        # Sensors still silent are added by read() when they report. Returns
+        # the number of channels added; call it before the engine is built.
+        keys = [(c["room"], c["sensor"]) for device in self.poller.devices for c in device.channels]
+        first = {}
+        deadline = time.monotonic() + timeout
+        while len(first) < len(set(keys)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.poller.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if isinstance(item, DeviceStatus):
+                if self.on_status is not None:
+                    self.on_status(item)
+            else:
+                first[(item.room, item.sensor)] = item
+        added = 0
+        for key in dict.fromkeys(keys):
+            if key in first and key not in self._channels:
+                self._update(registry, first[key])
+                added += 1
+        return added
+
+    def read(self, registry):
+        pending = self.poller.queue
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, DeviceStatus):
+                if self.on_status is not None:
+                    self.on_status(item)
+                continue
+            self._update(registry, item)
+        return time.time()
+
+    def _update(self, registry, item):
+        key = (item.room, item.sensor)
+        index = self._channels.get(key)
+        if index is None:
+            try:
+                index = registry.channel(item.room, item.sensor)
+            except KeyError:
+                index = registry.add_channel(item.room, item.sensor, temperature=item.temperature,
+                                             humidity=item.humidity if item.humidity == item.humidity else 45.0,
+                                             target=self.target)
+            self._channels[key] = index
+            if self.actuators is not None and key in self._coils:
+                self.actuators.route(index, *self._coils[key])
+        registry.temperature[index] = item.temperature
+        if item.humidity == item.humidity:  # Not NaN
+            registry.humidity[index] = item.humidity
+
+    def close(self):
+        self.poller.stop()
+
+
+class StandInModbusServer:
+    # Minimal Modbus-TCP server answering holding-register reads from a dict
+    # and recording coil writes, for trying the I/O layer without hardware
+    def __init__(self, registers, host="127.0.0.1", port=0, delay=0.0):
+        self.registers = registers  # {(unit, address): value}
+        self.coils = {}  # {(unit, address): on}, set by writes
+        self.host = host
+        self.port = port
+        self.delay = delay  # Seconds to wait before each reply
+        self.requests = 0
+        self._server = None
+        self._handlers = set()  # Tasks serving the open connections
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                transaction, protocol, length, unit = struct.unpack(">HHHB", await reader.readexactly(7))
+                pdu = await reader.readexactly(length - 1)
+                self.requests += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                function, start, count = struct.unpack(">BHH", pdu[:5])
+                if function == 3:
+                    words = [self.registers.get((unit, start + i), 0) & 0xFFFF for i in range(count)]
+                    reply = struct.pack(f">BB{count}H", 3, 2 * count, *words)
+                elif function == 15:
+                    for i in range(count):
+                        self.coils[(unit, start + i)] = bool(pdu[6 + i // 8] >> (i % 8) & 1)
+                    reply = pdu[:5]
+                else:
+                    reply = struct.pack(">BB", function | 0x80, 1)
+                writer.write(struct.pack(">HHHB", transaction, protocol, len(reply) + 1, unit) + reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def stop(self):
+        # Stop listening and end every open connection, waiting until they are closed
+        self.close()
+        handlers = list(self._handlers)
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll sensor devices and print their readings")
+    parser.add_argument("devices", nargs="?", help="device configuration (JSON)")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between polls")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before a device counts as offline")
+    parser.add_argument("--demo", type=int, default=0, help="poll this many sensors on a local stand-in Modbus server")
+    parser.add_argument("--rounds", type=int, default=None, help="stop after this many polls")
+    args = parser.parse_args()
+
+    server = None
+    if args.demo:
+        # Stand-in gateway with 10 units of up to 20 sensors each, in a thread of its own
+        registers = {}
+        for i in range(args.demo):
+            registers[(1 + i // 20, 2 * (i % 20))] = 230 + i % 10
+            registers[(1 + i // 20, 2 * (i % 20) + 1)] = 450
+        server = StandInModbusServer(registers)
+        server_loop = asyncio.new_event_loop()
+        server_loop.run_until_complete(server.start())
+        threading.Thread(target=server_loop.run_forever, daemon=True).start()
+        devices = []
+        for unit in sorted({unit for unit, _ in registers}):
+            count = sum(1 for u, _ in registers if u == unit) // 2
+            channels = [{"room": f"Lab {unit:03d}", "sensor": f"Sensor {i + 1}", "temperature": 2 * i, "humidity": 2 * i + 1}
+                        for i in range(count)]
+            devices.append(ModbusDevice(f"unit {unit}", channels, "127.0.0.1", server.port, unit))
+    elif args.devices:
+        devices = load_devices(args.devices)
+    else:
+        parser.error("give a device configuration or --demo")
+
+    poller = DevicePoller(devices, args.interval, args.timeout)
+    poller.start()
+    rounds = 0
+    try:
+        while args.rounds is None or rounds < args.rounds:
+            time.sleep(args.interval)
+            rounds += 1
+            readings = []
+            while not poller.queue.empty():
+                item = poller.queue.get_nowait()
+                if isinstance(item, DeviceStatus):
+                    print(f"{item.device}: {'online' if item.online else 'offline'} {item.message}", file=sys.stderr)
+                else:
+                    readings.append(item)
+            for reading in readings[:5]:
+                print(f"{reading.room}/{reading.sensor}\t{reading.temperature:.1f}°C\t{reading.humidity:.0f}%")
+            print(f"{len(readings)} readings" + (f", {server.requests} Modbus requests so far" if server else ""), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.stop()
@@ -0,0 +1,84 @@
+import numpy as np
+
+# Per-channel numeric columns kept by the registry
+COLUMNS = ("temperature", "humidity", "target", "heat", "cool")
+
+
+class SensorRegistry:
+    # Struct-of-arrays store of every sensor channel. Each column is one
+    # preallocated float64 array indexed by channel number, so the engine can
+    # update all channels with a handful of vectorized operations per tick.
+    def __init__(self, capacity=16):
+        self._capacity = max(1, int(capacity))
+        self._columns = {name: np.zeros(self._capacity, dtype=np.float64) for name in COLUMNS}
+        self.count = 0
+        self.rooms = []  # Room name of each channel
+        self.sensors = []  # Sensor name of each channel
+        self._index = {}
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.zeros(self._capacity, dtype=np.float64)
+            grown[:self.count] = column[:self.count]
+            self._columns[name] = grown
+
+    def add_channel(self, room, sensor, temperature=24.5, humidity=45.0, target=23.0):
+        key = (room, sensor)
+        if key in self._index:
+            raise ValueError(f"Channel {room}/{sensor} already registered")
+        if self.count == self._capacity:
+            self._grow()
+        index = self.count
+        self._columns["temperature"][index] = temperature
+        self._columns["humidity"][index] = humidity
+        self._columns["target"][index] = target
+        self._columns["heat"][index] = 0.0
+        self._columns["cool"][index] = 0.0
+        self.rooms.append(room)
+        self.sensors.append(sensor)
+        self._index[key] = index
+        self.count += 1
+        return index
+
+    def channel(self, room, sensor):
+        return self._index[(room, sensor)]
+
+    def name(self, index):
+        return f"{self.rooms[index]}/{self.sensors[index]}"
+
+    def column(self, name):
+        # View over the live channels only; do not keep across add_channel()
+        return self._columns[name][:self.count]
+
+    @property
+    def temperature(self):
+        return self.column("temperature")
+
+    @property
+    def humidity(self):
+        return self.column("humidity")
+
+    @property
+    def target(self):
+        return self.column("target")
+
+    # Actuator demand in [0, 1] from the last control step
+    @property
+    def heat(self):
+        return self.column("heat")
+
+    @property
+    def cool(self):
+        return self.column("cool")
+
+
+def populate(registry, rooms, sensors_per_room=1, target=23.0):
+    # Fill a registry with numbered labs, e.g. for load testing
+    for room in range(1, rooms + 1):
+        for sensor in range(1, sensors_per_room + 1):
+            registry.add_channel(f"Lab {room:03d}", f"Sensor {sensor}", target=target)
+    return registry
@@ -0,0 +1,64 @@
+from PyQt5.QtWidgets import QFrame, QGridLayout, QLabel, QComboBox
+from PyQt5.QtCore import Qt, QTimer
+import rolling_stats
+
+# Refresh interval of the panel in ms, only while it is visible
+REFRESH_INTERVAL = 1000
+
+# Title and format of each figure
+FIELDS = [("Min", "min", "{:.1f}°C"), ("Max", "max", "{:.1f}°C"), ("Mean", "mean", "{:.1f}°C"),
+          ("Std dev", "std", "{:.2f}°C"), ("p95", "p95", "{:.1f}°C"), ("In band", "in_band", "{:.0%}"),
+          ("Heating", "heating", "{:.0%}"), ("Cooling", "cooling", "{:.0%}")]
+
+
+class StatsPanel(QFrame):
+    # Rolling statistics of the primary channel over a selectable window.
+    # The figures are kept up to date by a RollingStats on every tick; the
+    # panel only reads the summary once a second.
+    def __init__(self, stats, parent=None):
+        super().__init__(parent)
+        self.stats = stats
+        self.setStyleSheet("QFrame { background-color: #f8f9fa; border-radius: 5px; }")
+        layout = QGridLayout(self)
+        layout.setContentsMargins(10, 4, 10, 4)
+
+        self.window_combo = QComboBox()
+        for name, _ in rolling_stats.WINDOWS:
+            self.window_combo.addItem(name)
+        self.window_combo.setCurrentIndex(1)
+        self.window_combo.currentIndexChanged.connect(self.refresh)
+        layout.addWidget(QLabel("Last"), 0, 0)
+        layout.addWidget(self.window_combo, 1, 0)
+
+        self.values = {}
+        for column, (title, key, _) in enumerate(FIELDS, 1):
+            title_label = QLabel(title)
+            title_label.setStyleSheet("color: #7f8c8d;")
+            title_label.setAlignment(Qt.AlignCenter)
+            value_label = QLabel("–")
+            value_label.setStyleSheet("font-weight: bold; font-size: 14px;")
+            value_label.setAlignment(Qt.AlignCenter)
+            layout.addWidget(title_label, 0, column)
+            layout.addWidget(value_label, 1, column)
+            self.values[key] = value_label
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(REFRESH_INTERVAL)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        summary = self.stats.summary(self.window_combo.currentText())
+        for _, key, fmt in FIELDS:
+            value = summary.get(key)
+            text = fmt.format(value) if value is not None and value == value else "–"
+            label = self.values[key]
+            if label.text() != text:
+                label.setText(text)
@@ -0,0 +1,50 @@
+# Stylesheets with one rule per colour state. Each is set once per widget;
+# switching state only changes a dynamic property and re-polishes the widget,
+# so Qt never has to parse a new stylesheet string.
+
+ERROR_LABEL = ("QLabel { font-size: 32px; font-weight: bold; color: #e67e22; padding: 10px; }"
+               "QLabel[band=\"ok\"] { color: #2ecc71; }"
+               "QLabel[band=\"hot\"] { color: #e74c3c; }"
+               "QLabel[band=\"cold\"] { color: #3498db; }")
+
+SYSTEM_BUTTON = ("QPushButton { background-color: #2ecc71; color: white; padding: 10px; border-radius: 5px; font-weight: bold; }"
+                 "QPushButton:hover { background-color: #27ae60; }"
+                 "QPushButton[running=\"true\"] { background-color: #e74c3c; }"
+                 "QPushButton[running=\"true\"]:hover { background-color: #c0392b; }")
+
+SYSTEM_STATUS = ("QLabel { font-weight: bold; color: #e74c3c; }"
+                 "QLabel[running=\"true\"] { color: #2ecc71; }")
+
+COOL_BUTTON = ("QPushButton { background-color: #3498db; color: white; padding: 10px; border-radius: 5px; }"
+               "QPushButton:hover, QPushButton[active=\"true\"] { background-color: #2980b9; }")
+
+FAN_BUTTON = ("QPushButton { background-color: #2ecc71; color: white; padding: 10px; border-radius: 5px; }"
+              "QPushButton:hover, QPushButton[active=\"true\"] { background-color: #27ae60; }")
+
+HVAC_STATUS = ("QLabel { font-weight: bold; color: #7f8c8d; }"
+               "QLabel[pending=\"true\"] { color: #e67e22; }")
+
+HEAT_BUTTON = ("QPushButton { background-color: #e74c3c; color: white; padding: 10px; border-radius: 5px; }"
+               "QPushButton:hover, QPushButton[active=\"true\"] { background-color: #c0392b; }")
+
+
+def error_band(error):
+    # Colour state of the error display
+    if error > 2:
+        return "hot"  # Red for large positive error
+    if error < -2:
+        return "cold"  # Blue for large negative error
+    if abs(error) < 0.5:
+        return "ok"  # Green for small error
+    return "warn"  # Orange otherwise
+
+
+def set_state(widget, name, value):
+    # Switch a [name="value"] stylesheet state; re-polishes only on a change
+    if widget.property(name) == value:
+        return False
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+    return True
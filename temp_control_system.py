@@ -1,31 +1,140 @@
+import time
+STARTED = time.perf_counter()  # For --startup-report
 import sys
 import random
 import os
+import argparse
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QSlider, QFrame,
-                             QGridLayout, QGroupBox, QTabWidget, QStatusBar, QFileDialog)
-from PyQt5.QtCore import Qt, QTimer, QDateTime
-from PyQt5.QtGui import QPixmap, QTextDocument, QTextCursor, QTextTableFormat, QTextCharFormat, QFont, QTextLength
-from PyQt5.QtPrintSupport import QPrinter
+                             QGridLayout, QGroupBox, QTabWidget, QStatusBar, QFileDialog, QComboBox,
+                             QCheckBox, QProgressBar, QSystemTrayIcon, QStyle)
+from PyQt5.QtCore import Qt, QTimer, QObject, QEvent
+from PyQt5.QtGui import QPixmap
 import pyqtgraph as pg
-from collections import deque
-from docx import Document
-from docx.shared import Inches
+from control_engine import ControlEngine, Sample
+from controllers import CONTROLLERS
+from thermal_model import ThermalPlant
+from replay import ReplaySource, ReplayClock
+from actuators import ActuatorBank
+from sample_bridge import SampleBridge
+from diagnostics import StallWatchdog
+from diagnostics_view import DiagnosticsView
+from alerts import AlertMonitor, Notifier, log_alerts
+from rolling_stats import RollingStats
+from stats_view import StatsPanel
+from lod import LodSeries
+from history_store import HistoryStore
+import event_log
+from event_log import EventLog
+from log_view import LogView
+from rooms_view import RoomsView
+import styles
+from sensor_registry import SensorRegistry, populate
+from arguments import positive, non_negative
+
+# Export backends (QtPrintSupport, python-docx, pyarrow) and the device
+# drivers (asyncio) are imported when first used, not at startup
+IMPORTED = time.perf_counter()
+
+# Number of samples shown when the trend plot follows live data
+TREND_WINDOW = 50
+
+# Number of samples kept for zooming out on the trend plot
+TREND_CAPACITY = 200000
+
+# Screen refresh interval in ms, independent of the sample rate
+FRAME_INTERVAL = 50
+
+# Timer interval (ms) and per-tick time budget (s) while replaying a recording
+REPLAY_INTERVAL = 50
+REPLAY_BUDGET = 0.03
+
+# Heartbeat interval (ms) of the event-loop stall watchdog, while diagnostics are on
+HEARTBEAT_INTERVAL = 10
+
+# Log records kept in memory
+LOG_CAPACITY = 10000
+
+# How long a notification stays up when there is no system tray, in ms
+NOTIFICATION_TIMEOUT = 10000
+
+# History ranges offered under the trend plot, in seconds (0 = live)
+HISTORY_RANGES = [("Live", 0), ("Last hour", 3600), ("Last 24 hours", 86400),
+                  ("Last 7 days", 7 * 86400), ("Last 30 days", 30 * 86400)]
 
 class TemperatureControlSystem(QMainWindow):
-    def __init__(self):
+    def __init__(self, engine=None, history=None, log=None, replay_speed=1.0, diagnostics=False):
         super().__init__()
         self.setWindowTitle("Temperature Control System - Adamawa State University Mubi")
         self.setGeometry(100, 100, 1000, 700)
         
-        # System state
-        self.system_running = False
+        # System state lives in the GUI-free engine. Live acquisition runs in a
+        # worker thread and the window drains its samples once per frame; a
+        # replay is paced on the GUI thread and calls display_sample directly.
+        self.engine = engine if engine is not None else ControlEngine()
+        
+        # Structured event log; strings are only built for display and export
+        self.event_log = log if log is not None else EventLog(LOG_CAPACITY)
+        
+        # Replay of a recording (engine.source), paced at replay_speed x real time (0 = as fast as possible)
+        self.replay_speed = replay_speed
+        self.replaying = isinstance(self.engine.source, ReplaySource)
+        if self.replaying:
+            self.bridge = None
+            self.engine.subscribe(self.display_sample)
+        else:
+            self.bridge = SampleBridge(self.engine)
+        self.jitter_shown = 0.0  # When the jitter readout was last refreshed
+        
+        # Stage timings of the engine and the dashboard, plus stall detection; off unless asked for
+        self.profiler = self.engine.profiler
+        self.watchdog = StallWatchdog(HEARTBEAT_INTERVAL / 1000)
+        self.heartbeat = QTimer()
+        self.heartbeat.setTimerType(Qt.PreciseTimer)
+        self.heartbeat.timeout.connect(self.watchdog.beat)
+        self.replay_clock = None
+        self.latest_sample = None  # Newest sample not yet shown on screen
+        self._shown = {}  # Text and colour last applied to each widget
+        
+        # Persistent sample history (optional)
+        self.history = history
+        self.history_offset = 0  # Number of ranges paged back from now
+        if self.history is not None:
+            self.history.attach(self.engine)
+        
+        # Band, rate, stuck-sensor and outlier checks on every channel, run
+        # with the control loop; raised alerts are logged and, within a rate
+        # limit, shown as notifications
+        self.alert_monitor = AlertMonitor()
+        self.alert_monitor.attach(self.engine)
+        if self.bridge is not None:
+            self.alert_monitor.subscribe(lambda alerts: self.bridge.post(self.show_alerts, alerts))
+        else:
+            self.alert_monitor.subscribe(self.show_alerts)
+        self.notifier = Notifier(self.deliver_notification)
+        self.tray = None  # Created with the first notification
+        self.notice_until = 0.0  # Until when a notification holds the status bar
+        
+        # Min/max/mean/p95, time in band and heating/cooling duty of the primary channel over sliding windows
+        self.rolling_stats = RollingStats()
+        self.rolling_stats.attach(self.engine)
+        
+        # Real sensors (a sensor_io.HardwareSource) report devices going on- and offline through the log
+        self.hardware = hasattr(self.engine.source, "on_status")
+        if self.hardware:
+            self.engine.source.on_status = lambda status: self.bridge.post(self.device_status, status)
         
         # Data for plotting - initialize FIRST
-        self.temp_data = deque([20.0] * 50, maxlen=50)
-        self.humidity_data = deque([45.0] * 50, maxlen=50)
-        self.time_data = deque([i for i in range(50)], maxlen=50)
+        # Min/max pyramids so redraw cost follows the plot width, not the series length
+        now = time.time()
+        start_times = [now - 2 * (TREND_WINDOW - i) for i in range(TREND_WINDOW)]
+        self.temp_series = LodSeries(TREND_CAPACITY)
+        self.humidity_series = LodSeries(TREND_CAPACITY)
+        if not self.replaying:  # Recordings start in the past, so nothing to seed
+            self.temp_series.extend(start_times, [20.0] * TREND_WINDOW)
+            self.humidity_series.extend(start_times, [45.0] * TREND_WINDOW)
+        self.follow_live = True  # Keep the newest samples in view until the user pans or zooms
         
         # Central widget
         self.central_widget = QWidget()
@@ -45,6 +154,10 @@ class TemperatureControlSystem(QMainWindow):
         self.dashboard_tab = QWidget()
         self.tabs.addTab(self.dashboard_tab, "Dashboard")
         
+        # Create rooms tab
+        self.rooms_tab = QWidget()
+        self.tabs.addTab(self.rooms_tab, "Rooms")
+        
         # Create settings tab
         self.settings_tab = QWidget()
         self.tabs.addTab(self.settings_tab, "Settings")
@@ -53,20 +166,70 @@ class TemperatureControlSystem(QMainWindow):
         self.logs_tab = QWidget()
         self.tabs.addTab(self.logs_tab, "System Log")
         
+        # Create diagnostics tab
+        self.diagnostics_tab = QWidget()
+        self.tabs.addTab(self.diagnostics_tab, "Diagnostics")
+        
+        # Tabs filled in when first shown, so they cost nothing at startup
+        self.lazy_tabs = {self.settings_tab: self.init_settings, self.logs_tab: self.init_logs,
+                          self.diagnostics_tab: self.init_diagnostics}
+        self.tabs.currentChanged.connect(self.build_tab)
+        
         # Initialize tabs
         self.init_dashboard()
-        self.init_settings()
-        self.init_logs()
+        self.init_rooms()
+        
+        # Initial log content
+        self.event_log.append(event_log.SYSTEM_INITIALIZED)
+        self.event_log.append(event_log.SENSORS_INITIALIZED)
+        self.event_log.append(event_log.HVAC_CONNECTED)
+        self.event_log.append(event_log.TARGET_INITIAL, self.engine.target)
+        self.event_log.append(event_log.AUTOMATIC_MODE)
         
         # Status bar
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("System Ready")
         
-        # Timer for updating data
+        # Export progress, only shown while an export is running
+        self.export_worker = None
+        self.export_bar = QProgressBar()
+        self.export_bar.setRange(0, 100)
+        self.export_bar.setMaximumWidth(200)
+        self.export_bar.hide()
+        self.cancel_export_btn = QPushButton("Cancel Export")
+        self.cancel_export_btn.clicked.connect(self.cancel_export)
+        self.cancel_export_btn.hide()
+        self.status_bar.addPermanentWidget(self.export_bar)
+        self.status_bar.addPermanentWidget(self.cancel_export_btn)
+        
+        # How late acquisition ticks start, while the system runs
+        self.jitter_label = QLabel()
+        self.status_bar.addPermanentWidget(self.jitter_label)
+        
+        # Number of alerts currently raised
+        self.alert_label = QLabel()
+        self.alert_label.setStyleSheet("font-weight: bold; color: #e74c3c;")
+        self.status_bar.addPermanentWidget(self.alert_label)
+        
+        # Timer that plays due replay frames on the GUI thread
         self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
         self.timer.timeout.connect(self.update_data)
-        self.timer.start(2000)  # Update every 2 seconds
+        if self.replaying:
+            self.timer.start(REPLAY_INTERVAL)
+        
+        # Separate frame timer that repaints with the newest sample, however fast samples arrive
+        self.frame_timer = QTimer()
+        self.frame_timer.timeout.connect(self.render_frame)
+        self.frame_timer.start(FRAME_INTERVAL)
+        
+        if diagnostics:
+            self.set_diagnostics(True)
+        
+    @property
+    def system_running(self):
+        return self.engine.running
         
     def create_header(self):
         # Header widget
@@ -133,13 +296,12 @@ class TemperatureControlSystem(QMainWindow):
         system_control_layout = QHBoxLayout(system_control_frame)
         
         self.system_button = QPushButton("Start System")
-        self.system_button.setStyleSheet("QPushButton { background-color: #2ecc71; color: white; padding: 10px; border-radius: 5px; font-weight: bold; }"
-                                       "QPushButton:hover { background-color: #27ae60; }")
+        self.system_button.setStyleSheet(styles.SYSTEM_BUTTON)
         self.system_button.clicked.connect(self.toggle_system)
         system_control_layout.addWidget(self.system_button)
         
         system_status = QLabel("System Status: OFF")
-        system_status.setStyleSheet("font-weight: bold; color: #e74c3c;")
+        system_status.setStyleSheet(styles.SYSTEM_STATUS)
         system_control_layout.addWidget(system_status)
         self.system_status_label = system_status
         
@@ -170,7 +332,7 @@ class TemperatureControlSystem(QMainWindow):
         error_title = QLabel("Temperature Error")
         error_title.setAlignment(Qt.AlignCenter)
         self.error_label = QLabel("+1.5°C")
-        self.error_label.setStyleSheet("font-size: 32px; font-weight: bold; color: #e67e22; padding: 10px;")
+        self.error_label.setStyleSheet(styles.ERROR_LABEL)
         self.error_label.setAlignment(Qt.AlignCenter)
         error_layout.addWidget(error_title)
         error_layout.addWidget(self.error_label)
@@ -205,6 +367,10 @@ class TemperatureControlSystem(QMainWindow):
         
         layout.addWidget(readings_frame)
         
+        # Rolling statistics
+        self.stats_panel = StatsPanel(self.rolling_stats)
+        layout.addWidget(self.stats_panel)
+        
         # Graph frame
         graph_frame = QFrame()
         graph_frame.setFrameStyle(QFrame.StyledPanel)
@@ -212,7 +378,7 @@ class TemperatureControlSystem(QMainWindow):
         graph_layout = QVBoxLayout(graph_frame)
         
         # Create plot widget with adjusted width
-        self.plot_widget = pg.PlotWidget()
+        self.plot_widget = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem(orientation='bottom')})
         self.plot_widget.setBackground('w')
         self.plot_widget.setTitle("Temperature and Humidity Trends", color='#333', size='14pt')
         self.plot_widget.setLabel('left', 'Value')
@@ -222,14 +388,42 @@ class TemperatureControlSystem(QMainWindow):
         self.plot_widget.setFixedHeight(250)  # Fixed height as requested
         
         # Initialize plots with our data
-        self.temp_plot = self.plot_widget.plot(list(self.time_data), list(self.temp_data), 
+        self.temp_plot = self.plot_widget.plot(self.temp_series.x.view(), self.temp_series.y.view(), 
                                               pen=pg.mkPen(color='#e74c3c', width=2), 
                                               name="Temperature (°C)")
-        self.humidity_plot = self.plot_widget.plot(list(self.time_data), list(self.humidity_data), 
+        self.humidity_plot = self.plot_widget.plot(self.humidity_series.x.view(), self.humidity_series.y.view(), 
                                                   pen=pg.mkPen(color='#3498db', width=2), 
                                                   name="Humidity (%)")
         
+        # Re-query the pyramids whenever the visible range changes
+        self.plot_widget.sigXRangeChanged.connect(self.refresh_trend)
+        self.plot_widget.getViewBox().sigRangeChangedManually.connect(self.stop_following)
+        
         graph_layout.addWidget(self.plot_widget)
+        
+        # History paging controls
+        history_layout = QHBoxLayout()
+        history_layout.addWidget(QLabel("View:"))
+        self.range_combo = QComboBox()
+        for name, _ in HISTORY_RANGES:
+            self.range_combo.addItem(name)
+        self.range_combo.currentIndexChanged.connect(self.change_history_range)
+        history_layout.addWidget(self.range_combo)
+        self.older_button = QPushButton("◀ Older")
+        self.older_button.clicked.connect(lambda: self.page_history(1))
+        self.newer_button = QPushButton("Newer ▶")
+        self.newer_button.clicked.connect(lambda: self.page_history(-1))
+        history_layout.addWidget(self.older_button)
+        history_layout.addWidget(self.newer_button)
+        self.history_label = QLabel()
+        history_layout.addWidget(self.history_label)
+        history_layout.addStretch()
+        graph_layout.addLayout(history_layout)
+        if self.history is None:
+            self.range_combo.setEnabled(False)
+        self.update_history_buttons()
+        self.follow_latest()
+        
         layout.addWidget(graph_frame)
         
         # Control buttons frame
@@ -238,20 +432,17 @@ class TemperatureControlSystem(QMainWindow):
         control_layout = QHBoxLayout(control_frame)
         
         self.cool_button = QPushButton("Start Cooling")
-        self.cool_button.setStyleSheet("QPushButton { background-color: #3498db; color: white; padding: 10px; border-radius: 5px; }"
-                                      "QPushButton:hover { background-color: #2980b9; }")
+        self.cool_button.setStyleSheet(styles.COOL_BUTTON)
         self.cool_button.clicked.connect(self.toggle_cooling)
         self.cool_button.setEnabled(False)  # Disabled until system is started
         
         self.heat_button = QPushButton("Start Heating")
-        self.heat_button.setStyleSheet("QPushButton { background-color: #e74c3c; color: white; padding: 10px; border-radius: 5px; }"
-                                      "QPushButton:hover { background-color: #c0392b; }")
+        self.heat_button.setStyleSheet(styles.HEAT_BUTTON)
         self.heat_button.clicked.connect(self.toggle_heating)
         self.heat_button.setEnabled(False)  # Disabled until system is started
         
-        self.fan_button = QPushButton("Toggle Fans")
-        self.fan_button.setStyleSheet("QPushButton { background-color: #2ecc71; color: white; padding: 10px; border-radius: 5px; }"
-                                      "QPushButton:hover { background-color: #27ae60; }")
+        self.fan_button = QPushButton("Start Fans")
+        self.fan_button.setStyleSheet(styles.FAN_BUTTON)
         self.fan_button.clicked.connect(self.toggle_fans)
         self.fan_button.setEnabled(False)  # Disabled until system is started
         
@@ -259,8 +450,30 @@ class TemperatureControlSystem(QMainWindow):
         control_layout.addWidget(self.heat_button)
         control_layout.addWidget(self.fan_button)
         
+        # Relay states of the primary channel as confirmed by the HVAC bus
+        self.hvac_label = QLabel("HVAC: Idle")
+        self.hvac_label.setStyleSheet(styles.HVAC_STATUS)
+        control_layout.addWidget(self.hvac_label)
+        
         layout.addWidget(control_frame)
         
+    def init_rooms(self):
+        layout = QVBoxLayout(self.rooms_tab)
+        
+        rooms_title = QLabel(f"All Channels ({len(self.engine.registry)})")
+        rooms_title.setStyleSheet("font-weight: bold; font-size: 14px;")
+        layout.addWidget(rooms_title)
+        self.rooms_title = rooms_title
+        
+        # Only the visible rows are repainted on each update
+        self.rooms_view = RoomsView(self.engine.registry)
+        layout.addWidget(self.rooms_view)
+        
+    def build_tab(self, index):
+        init = self.lazy_tabs.pop(self.tabs.widget(index), None)
+        if init is not None:
+            init()
+            
     def init_settings(self):
         layout = QVBoxLayout(self.settings_tab)
         layout.setSpacing(20)
@@ -314,6 +527,17 @@ class TemperatureControlSystem(QMainWindow):
         auto_layout.addWidget(self.auto_button)
         system_layout.addLayout(auto_layout)
         
+        # Control algorithm used while automation is enabled
+        mode_layout = QHBoxLayout()
+        mode_layout.addWidget(QLabel("Control Mode:"))
+        self.mode_combo = QComboBox()
+        for key, controller in CONTROLLERS.items():
+            self.mode_combo.addItem(controller.name, key)
+        self.mode_combo.setCurrentIndex(max(0, self.mode_combo.findText(self.engine.controller.name)))
+        self.mode_combo.currentIndexChanged.connect(self.change_controller)
+        mode_layout.addWidget(self.mode_combo)
+        system_layout.addLayout(mode_layout)
+        
         # Notification settings
         notif_layout = QHBoxLayout()
         notif_layout.addWidget(QLabel("Notifications:"))
@@ -337,296 +561,542 @@ class TemperatureControlSystem(QMainWindow):
         log_title.setStyleSheet("font-weight: bold; font-size: 14px;")
         layout.addWidget(log_title)
         
-        self.log_display = QLabel()
-        self.log_display.setWordWrap(True)
-        self.log_display.setStyleSheet("background-color: #f5f5f5; padding: 10px; border: 1px solid #ddd; border-radius: 5px; min-height: 300px;")
-        self.log_display.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        
-        # Initial log content
-        self.log_entries = [
-            "System started at " + QDateTime.currentDateTime().toString("yyyy-MM-dd hh:mm:ss"),
-            "Temperature sensors initialized",
-            "HVAC system connected",
-            "Target temperature set to 23°C",
-            "System running in automatic mode"
-        ]
-        self.update_log_display()
+        # Model/view list that appends rows as records arrive
+        self.log_display = LogView(self.event_log)
+        self.log_display.setMinimumHeight(300)
         
         layout.addWidget(self.log_display)
         
         # Log controls
         control_layout = QHBoxLayout()
-        clear_btn = QPushButton("Clear Log")
-        clear_btn.setStyleSheet("QPushButton { padding: 8px; border-radius: 5px; background-color: #e74c3c; color: white; }")
-        clear_btn.clicked.connect(self.clear_log)
-        export_btn = QPushButton("Export Log")
-        export_btn.setStyleSheet("QPushButton { padding: 8px; border-radius: 5px; background-color: #3498db; color: white; }")
-        export_btn.clicked.connect(self.export_log)
-        control_layout.addWidget(clear_btn)
-        control_layout.addWidget(export_btn)
+        self.clear_btn = QPushButton("Clear Log")
+        self.clear_btn.setStyleSheet("QPushButton { padding: 8px; border-radius: 5px; background-color: #e74c3c; color: white; }")
+        self.clear_btn.clicked.connect(self.clear_log)
+        self.export_btn = QPushButton("Export Log")
+        self.export_btn.setStyleSheet("QPushButton { padding: 8px; border-radius: 5px; background-color: #3498db; color: white; }")
+        self.export_btn.clicked.connect(self.export_log)
+        self.history_export_btn = QPushButton("Export History")
+        self.history_export_btn.setStyleSheet("QPushButton { padding: 8px; border-radius: 5px; background-color: #3498db; color: white; }")
+        self.history_export_btn.setToolTip("Save every recorded sample as Parquet or Arrow for analysis")
+        self.history_export_btn.setEnabled(self.history is not None)
+        self.history_export_btn.clicked.connect(self.export_history)
+        tail_check = QCheckBox("Follow new entries")
+        tail_check.setChecked(True)
+        tail_check.toggled.connect(self.log_display.set_tail)
+        control_layout.addWidget(self.clear_btn)
+        control_layout.addWidget(self.export_btn)
+        control_layout.addWidget(self.history_export_btn)
         control_layout.addStretch()
+        control_layout.addWidget(tail_check)
         
         layout.addLayout(control_layout)
         
+    def init_diagnostics(self):
+        layout = QVBoxLayout(self.diagnostics_tab)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        # Shows whether measuring is on, so it is built after --diagnostics took effect
+        self.diagnostics_view = DiagnosticsView(self.profiler, self.bridge.jitter if self.bridge else None, self.watchdog)
+        self.diagnostics_view.toggled.connect(self.set_diagnostics)
+        layout.addWidget(self.diagnostics_view)
+        
     def update_data(self):
-        # Only update if system is running
-        if not self.system_running:
+        # Advance a replay; live samples arrive through the bridge instead
+        if self.system_running:
+            self.play_replay()
+            
+    def play_replay(self):
+        # Play every recorded frame that is due, within a time budget per tick
+        source = self.engine.source
+        if source.next_time is None:
+            self.finish_replay()
             return
+        due = self.replay_clock.due(source.next_time)
+        deadline = time.perf_counter() + REPLAY_BUDGET
+        while source.next_time is not None and source.next_time <= due and time.perf_counter() < deadline:
+            self.engine.step()
+        if source.next_time is None:
+            self.finish_replay()
             
-        # Simulate temperature and humidity changes
-        current_temp = float(self.temp_label.text().replace('°C', ''))
-        target_temp = float(self.target_label.text().replace('°C', ''))
-        
-        # Calculate and display error
-        error = current_temp - target_temp
-        error_color = "#e67e22"  # Default orange
-        if error > 2:
-            error_color = "#e74c3c"  # Red for large positive error
-        elif error < -2:
-            error_color = "#3498db"  # Blue for large negative error
-        elif abs(error) < 0.5:
-            error_color = "#2ecc71"  # Green for small error
+    def set_diagnostics(self, enabled):
+        # Stage timers and the stall watchdog cost nothing while off
+        self.profiler.enabled = enabled
+        if enabled:
+            self.watchdog.start()
+            self.heartbeat.start(HEARTBEAT_INTERVAL)
+        else:
+            self.heartbeat.stop()
+            self.watchdog.stop()
             
-        self.error_label.setText(f"{error:+.1f}°C")
-        self.error_label.setStyleSheet(f"font-size: 32px; font-weight: bold; color: {error_color}; padding: 10px;")
-        
-        # Simulate some random variation
-        variation = random.uniform(-0.5, 0.5)
-        new_temp = current_temp + variation
-        
-        # If automation is enabled, move toward target temperature
-        if self.auto_button.isChecked():
-            if new_temp > target_temp + 0.2:
-                new_temp -= 0.1  # Simulate cooling
-            elif new_temp < target_temp - 0.2:
-                new_temp += 0.1  # Simulate heating
+    def device_status(self, status):
+        if status.online:
+            self.event_log.append(event_log.DEVICE_ONLINE, text=status.device)
+        else:
+            self.event_log.append(event_log.DEVICE_OFFLINE, level=event_log.WARNING, text=f"{status.device} ({status.message})")
+            
+    def show_alerts(self, alerts):
+        log_alerts(self.event_log, alerts, self.engine.registry)
+        self.notifier.notify(alerts, self.engine.registry)
+        count = self.alert_monitor.active_count
+        self.set_text(self.alert_label, f"{count} alert{'s' if count > 1 else ''}" if count else "")
+        
+    def deliver_notification(self, title, message):
+        # A tray balloon where there is a system tray, the status bar otherwise
+        if self.tray is None and QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray = QSystemTrayIcon(self.style().standardIcon(QStyle.SP_MessageBoxWarning), self)
+            self.tray.show()
+        if self.tray is not None:
+            self.tray.showMessage(title, message, QSystemTrayIcon.Warning, NOTIFICATION_TIMEOUT)
+        else:
+            self.status_bar.showMessage(message, NOTIFICATION_TIMEOUT)
+            self.notice_until = time.monotonic() + NOTIFICATION_TIMEOUT / 1000
+        QApplication.alert(self)  # Flash the taskbar entry if the window is in the background
+        
+    def finish_replay(self):
+        self.event_log.append(event_log.REPLAY_FINISHED, text=os.path.basename(self.engine.source.path))
+        self.toggle_system()
+        self.system_button.setEnabled(False)
+        
+    def display_sample(self, sample):
+        # Per-sample bookkeeping only; render_frame puts the newest one on screen
+        self.temp_series.append(sample.timestamp, sample.temperature)
+        self.humidity_series.append(sample.timestamp, sample.humidity)
+        
+        # Add log entry occasionally (about one every 10 seconds)
+        if random.random() < 0.1 * self.engine.dt:
+            self.event_log.append(event_log.READING, sample.temperature, sample.humidity)
+            
+        self.latest_sample = sample
         
-        # Update temperature display
-        self.temp_label.setText(f"{new_temp:.1f}°C")
+    def drain_samples(self):
+        # Take every sample the acquisition thread produced since the last frame
+        lap = self.profiler.lap()
+        batch = self.bridge.drain()
+        if not len(batch):
+            return
+        self.temp_series.extend(batch["timestamp"], batch["temperature"])
+        self.humidity_series.extend(batch["timestamp"], batch["humidity"])
+        lap("drain")
+        
+        # Add log entry occasionally (about one every 10 seconds)
+        if random.random() < 0.1 * self.engine.dt * len(batch):
+            self.event_log.append(event_log.READING, float(batch["temperature"][-1]), float(batch["humidity"][-1]))
+            lap("log")
+            
+        self.latest_sample = Sample(*batch[-1].tolist())
         
-        # Update humidity (simulate small changes)
-        current_humidity = float(self.humidity_label.text().replace('%', ''))
-        new_humidity = current_humidity + random.uniform(-1, 1)
-        new_humidity = max(30, min(70, new_humidity))  # Keep within reasonable bounds
-        self.humidity_label.setText(f"{new_humidity:.0f}%")
+    def show_jitter(self):
+        # Refreshed about once a second
+        now = time.monotonic()
+        if now - self.jitter_shown < 1.0:
+            return
+        self.jitter_shown = now
+        jitter = self.bridge.jitter
+        text = ""
+        if self.bridge.running and jitter.count:
+            text = f"Tick jitter: {jitter.mean * 1e3:.1f} ± {jitter.std * 1e3:.1f} ms (max {jitter.max * 1e3:.1f} ms)"
+            if self.bridge.ring.dropped:
+                text += f", {self.bridge.ring.dropped} samples dropped"
+        self.set_text(self.jitter_label, text)
+        
+    def render_frame(self):
+        # However many samples arrived since the last frame, draw the screen once
+        if self.bridge is not None:
+            self.drain_samples()
+            self.show_jitter()
+        self.notifier.flush()  # Alerts held back by the rate limit
+        sample = self.latest_sample
+        if sample is None:
+            return
+        self.latest_sample = None
+        self.show_sample(sample)
+        
+    def set_text(self, widget, text):
+        # Only touch the widget when what it shows actually changes
+        if self._shown.get(widget) != text:
+            self._shown[widget] = text
+            widget.setText(text)
+            
+    def show_sample(self, sample):
+        lap = self.profiler.lap()
+        new_temp = sample.temperature
+        new_humidity = sample.humidity
+        target_temp = sample.target
+        
+        # Display error; its colour only changes when the error crosses into another band
+        error = sample.error
+        self.set_text(self.error_label, f"{error:+.1f}°C")
+        styles.set_state(self.error_label, "band", styles.error_band(error))
+        
+        # Update readings
+        self.set_text(self.temp_label, f"{new_temp:.1f}°C")
+        self.set_text(self.humidity_label, f"{new_humidity:.0f}%")
+        (heating, cooling, fans), pending = self.engine.actuators.state(0)
+        running = [name for name, on in (("Heating", heating), ("Cooling", cooling), ("Fans", fans)) if on]
+        self.set_text(self.hvac_label, "HVAC: " + (", ".join(running) or "Idle") + (" (sending)" if pending else ""))
+        styles.set_state(self.hvac_label, "pending", pending)
+        lap("labels")
         
         # Update graphs
-        self.temp_data.append(new_temp)
-        self.humidity_data.append(new_humidity)
-        self.time_data.append(self.time_data[-1] + 1 if self.time_data else 0)
-        
-        self.temp_plot.setData(list(self.time_data), list(self.temp_data))
-        self.humidity_plot.setData(list(self.time_data), list(self.humidity_data))
-        
-        # Add log entry occasionally
-        if random.random() < 0.2:  # 20% chance each update
-            log_msg = f"Temperature: {new_temp:.1f}°C, Humidity: {new_humidity:.0f}%"
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - " + log_msg)
-            if len(self.log_entries) > 50:
-                self.log_entries.pop(0)
-            self.update_log_display()
+        if self.follow_live:
+            self.follow_latest()  # Moving the range redraws through refresh_trend
+        else:
+            self.refresh_trend()
+        lap("plot")
+            
+        # Update the rooms table (visible rows only)
+        self.rooms_view.refresh()
+        lap("rooms")
+        
+        # Update status bar, unless an export or a notification is shown there
+        if self.export_worker is None and time.monotonic() >= self.notice_until:
+            message = f"Current: {new_temp:.1f}°C, Target: {target_temp:g}°C, Humidity: {new_humidity:.0f}%"
+            if self.status_bar.currentMessage() != message:
+                self.status_bar.showMessage(message)
+        lap("status bar")
+        
+    def follow_latest(self):
+        times = self.temp_series.x.view()
+        if len(times):
+            self.plot_widget.setXRange(times[max(0, len(times) - TREND_WINDOW)], times[-1], padding=0)
             
-        # Update status bar
-        self.status_bar.showMessage(f"Current: {new_temp:.1f}°C, Target: {target_temp}°C, Humidity: {new_humidity:.0f}%")
+    def stop_following(self):
+        self.follow_live = False
+        
+    def refresh_trend(self):
+        # Live view only; history is drawn by show_history
+        if self.range_combo.currentIndex() != 0:
+            return
+        x0, x1 = self.plot_widget.viewRange()[0]
+        pixels = max(1, int(self.plot_widget.getViewBox().width()))
+        self.temp_plot.setData(*self.temp_series.query(x0, x1, pixels))
+        self.humidity_plot.setData(*self.humidity_series.query(x0, x1, pixels))
+        
+    def change_history_range(self):
+        self.history_offset = 0
+        self.show_history()
+        
+    def page_history(self, step):
+        self.history_offset = max(0, self.history_offset + step)
+        self.show_history()
+        
+    def update_history_buttons(self):
+        paging = self.history is not None and self.range_combo.currentIndex() > 0
+        self.older_button.setEnabled(paging)
+        self.newer_button.setEnabled(paging and self.history_offset > 0)
+        
+    def show_history(self):
+        self.update_history_buttons()
+        span = HISTORY_RANGES[self.range_combo.currentIndex()][1]
+        if not span or self.history is None:
+            # Back to the live window
+            self.history_label.setText("")
+            self.follow_live = True
+            self.follow_latest()
+            self.refresh_trend()
+            return
+            
+        # Only about one point per pixel is read from the store
+        end = time.time() - self.history_offset * span
+        start = end - span
+        rows = self.history.range(0, start, end, max_points=max(100, self.plot_widget.width()))
+        times = [row[0] for row in rows]
+        self.temp_plot.setData(times, [row[2] for row in rows])
+        self.humidity_plot.setData(times, [row[5] for row in rows])
+        self.plot_widget.setXRange(start, end, padding=0)
+        self.history_label.setText(f"{datetime.fromtimestamp(start):%Y-%m-%d %H:%M} – {datetime.fromtimestamp(end):%Y-%m-%d %H:%M}")
+        
+    def closeEvent(self, event):
+        self.set_diagnostics(False)
+        if self.bridge is not None:
+            self.bridge.stop()
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.export_worker.wait()
+        if self.history is not None:
+            self.history.close()
+        if self.hardware:
+            self.engine.source.close()
+        if self.tray is not None:
+            self.tray.hide()
+        self.event_log.close()
+        super().closeEvent(event)
         
     def toggle_system(self):
         if not self.system_running:
             # Start the system
-            self.system_running = True
+            if self.replaying:
+                self.engine.running = True
+                self.replay_clock = ReplayClock(self.replay_speed)  # Resume from here after a pause
+            else:
+                self.bridge.start(1.0 / self.engine.dt)
             self.system_button.setText("Stop System")
-            self.system_button.setStyleSheet("QPushButton { background-color: #e74c3c; color: white; padding: 10px; border-radius: 5px; font-weight: bold; }"
-                                           "QPushButton:hover { background-color: #c0392b; }")
+            styles.set_state(self.system_button, "running", True)
             self.system_status_label.setText("System Status: ON")
-            self.system_status_label.setStyleSheet("font-weight: bold; color: #2ecc71;")
+            styles.set_state(self.system_status_label, "running", True)
             
             # Enable control buttons
             self.cool_button.setEnabled(True)
             self.heat_button.setEnabled(True)
             self.fan_button.setEnabled(True)
             
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - System started")
+            self.event_log.append(event_log.SYSTEM_STARTED)
         else:
             # Stop the system
-            self.system_running = False
+            if self.bridge is not None:
+                self.bridge.stop()  # Waits for the tick in progress
+            self.engine.running = False
+            self.engine.actuators.off()  # Nothing runs while the system is stopped
             self.system_button.setText("Start System")
-            self.system_button.setStyleSheet("QPushButton { background-color: #2ecc71; color: white; padding: 10px; border-radius: 5px; font-weight: bold; }"
-                                           "QPushButton:hover { background-color: #27ae60; }")
+            styles.set_state(self.system_button, "running", False)
             self.system_status_label.setText("System Status: OFF")
-            self.system_status_label.setStyleSheet("font-weight: bold; color: #e74c3c;")
+            styles.set_state(self.system_status_label, "running", False)
             
             # Disable control buttons
             self.cool_button.setEnabled(False)
             self.heat_button.setEnabled(False)
             self.fan_button.setEnabled(False)
             
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - System stopped")
-            
-        self.update_log_display()
+            self.event_log.append(event_log.SYSTEM_STOPPED)
         
     def update_target_temp(self):
         target_temp = self.target_slider.value()
+        self.engine.target = float(target_temp)
         self.target_label.setText(f"{target_temp}°C")
         self.target_display.setText(f"{target_temp}°C")
         
         # Add to log
-        self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + 
-                               f" - Target temperature changed to {target_temp}°C")
-        self.update_log_display()
+        self.event_log.append(event_log.TARGET_CHANGED, target_temp)
         
     def update_threshold(self):
         threshold = self.threshold_slider.value()
+        self.engine.threshold = float(threshold)
         self.threshold_display.setText(f"±{threshold}°C")
         
     def toggle_cooling(self):
         if self.cool_button.text() == "Start Cooling":
             self.cool_button.setText("Stop Cooling")
-            self.cool_button.setStyleSheet("QPushButton { background-color: #2980b9; color: white; padding: 10px; border-radius: 5px; }")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Cooling started")
+            self.engine.cooling = True
+            styles.set_state(self.cool_button, "active", True)
+            self.event_log.append(event_log.COOLING_STARTED)
         else:
             self.cool_button.setText("Start Cooling")
-            self.cool_button.setStyleSheet("QPushButton { background-color: #3498db; color: white; padding: 10px; border-radius: 5px; }")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Cooling stopped")
-        self.update_log_display()
+            self.engine.cooling = False
+            styles.set_state(self.cool_button, "active", False)
+            self.event_log.append(event_log.COOLING_STOPPED)
         
     def toggle_heating(self):
         if self.heat_button.text() == "Start Heating":
             self.heat_button.setText("Stop Heating")
-            self.heat_button.setStyleSheet("QPushButton { background-color: #c0392b; color: white; padding: 10px; border-radius: 5px; }")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Heating started")
+            self.engine.heating = True
+            styles.set_state(self.heat_button, "active", True)
+            self.event_log.append(event_log.HEATING_STARTED)
         else:
             self.heat_button.setText("Start Heating")
-            self.heat_button.setStyleSheet("QPushButton { background-color: #e74c3c; color: white; padding: 10px; border-radius: 5px; }")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Heating stopped")
-        self.update_log_display()
+            self.engine.heating = False
+            styles.set_state(self.heat_button, "active", False)
+            self.event_log.append(event_log.HEATING_STOPPED)
         
     def toggle_fans(self):
-        self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Fans toggled")
-        self.update_log_display()
+        self.engine.fans = not self.engine.fans
+        self.fan_button.setText("Stop Fans" if self.engine.fans else "Start Fans")
+        styles.set_state(self.fan_button, "active", self.engine.fans)
+        self.event_log.append(event_log.FANS_STARTED if self.engine.fans else event_log.FANS_STOPPED)
         
     def toggle_automation(self):
+        self.engine.automation = self.auto_button.isChecked()
         if self.auto_button.isChecked():
             self.auto_button.setText("Enabled")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Automation enabled")
+            self.event_log.append(event_log.AUTOMATION_ENABLED)
         else:
             self.auto_button.setText("Disabled")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Automation disabled")
-        self.update_log_display()
+            self.event_log.append(event_log.AUTOMATION_DISABLED)
+        
+    def change_controller(self):
+        controller = CONTROLLERS[self.mode_combo.currentData()]()
+        self.engine.set_controller(controller)
+        self.event_log.append(event_log.CONTROLLER_CHANGED, text=controller.name)
         
     def toggle_notifications(self):
+        self.notifier.set_enabled(self.notif_button.isChecked())
         if self.notif_button.isChecked():
             self.notif_button.setText("Enabled")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Notifications enabled")
+            self.event_log.append(event_log.NOTIFICATIONS_ENABLED)
         else:
             self.notif_button.setText("Disabled")
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + " - Notifications disabled")
-        self.update_log_display()
-        
-    def update_log_display(self):
-        self.log_display.setText("\n".join(self.log_entries))
+            self.event_log.append(event_log.NOTIFICATIONS_DISABLED)
         
     def clear_log(self):
-        self.log_entries = ["Log cleared at " + QDateTime.currentDateTime().toString("yyyy-MM-dd hh:mm:ss")]
-        self.update_log_display()
+        self.event_log.clear()
+        self.event_log.append(event_log.LOG_CLEARED)
         
     def export_log(self):
+        if self.export_worker is not None:
+            return  # One export at a time
+        import log_export
+            
         # Get file path to save with multiple format options
         file_path, selected_filter = QFileDialog.getSaveFileName(
             self, 
             "Export Log", 
             f"temperature_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}", 
-            "PDF Files (*.pdf);;Word Documents (*.docx);;Text Files (*.txt);;CSV Files (*.csv)"
+            ";;".join(log_export.FILTERS)
         )
         
         if not file_path:
             return  # User cancelled the dialog
             
-        try:
-            # Determine the format based on the selected filter
-            if selected_filter == "PDF Files (*.pdf)":
-                if not file_path.endswith('.pdf'):
-                    file_path += '.pdf'
-                self.export_to_pdf(file_path)
-            elif selected_filter == "Word Documents (*.docx)":
-                if not file_path.endswith('.docx'):
-                    file_path += '.docx'
-                self.export_to_word(file_path)
-            elif selected_filter == "CSV Files (*.csv)":
-                if not file_path.endswith('.csv'):
-                    file_path += '.csv'
-                self.export_to_csv(file_path)
-            else:  # Text file
-                if not file_path.endswith('.txt'):
-                    file_path += '.txt'
-                self.export_to_text(file_path)
-                
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + f" - Log exported to {os.path.basename(file_path)}")
-            self.update_log_display()
-            self.status_bar.showMessage(f"Log successfully exported to {file_path}")
+        # Determine the format based on the selected filter (text by default)
+        fmt = log_export.FILTERS.get(selected_filter, "txt")
+        if not file_path.endswith('.' + fmt):
+            file_path += '.' + fmt
             
-        except Exception as e:
-            self.log_entries.append(QDateTime.currentDateTime().toString("hh:mm:ss") + f" - Error exporting log: {str(e)}")
-            self.update_log_display()
-            self.status_bar.showMessage(f"Error exporting log: {str(e)}")
-    
-    def export_to_pdf(self, file_path):
-        printer = QPrinter(QPrinter.HighResolution)
-        printer.setOutputFormat(QPrinter.PdfFormat)
-        printer.setOutputFileName(file_path)
-        printer.setPageSize(QPrinter.A4)
-        
-        document = QTextDocument()
-        cursor = QTextCursor(document)
-        
-        # Add title
-        title_format = QTextCharFormat()
-        title_format.setFont(QFont("Arial", 16, QFont.Bold))
-        cursor.insertText("Temperature Control System Log\n", title_format)
-        
-        # Add timestamp
-        timestamp_format = QTextCharFormat()
-        timestamp_format.setFont(QFont("Arial", 10))
-        cursor.insertText(f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n", timestamp_format)
-        
-        # Add log entries
-        for entry in self.log_entries:
-            cursor.insertText(entry + "\n")
-        
-        document.print_(printer)
-    
-    def export_to_word(self, file_path):
-        # For Word documents, we'll create a simple text-based document
-        # In a real application, you might use python-docx for more advanced formatting
-        with open(file_path, 'w') as f:
-            f.write("Temperature Control System Log\n")
-            f.write(f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            for entry in self.log_entries:
-                f.write(entry + "\n")
-    
-    def export_to_csv(self, file_path):
-        with open(file_path, 'w', newline='') as file:
-            file.write("Timestamp,Message\n")
-            for entry in self.log_entries:
-                if " - " in entry:
-                    timestamp, message = entry.split(" - ", 1)
-                    file.write(f'"{timestamp}","{message}"\n')
-                else:
-                    file.write(f'"{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}","{entry}"\n')
-    
-    def export_to_text(self, file_path):
-        with open(file_path, 'w') as file:
-            file.write("Temperature Control System Log\n")
-            file.write(f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            for entry in self.log_entries:
-                file.write(entry + "\n")
+        # Write on a worker thread so the dashboard keeps updating
+        self.start_export(log_export.LogExportWorker(self.event_log, file_path, fmt, parent=self))
+        
+    def export_history(self):
+        if self.export_worker is not None or self.history is None:
+            return
+        import log_export
+        import history_export
+            
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, 
+            "Export History", 
+            f"temperature_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}", 
+            ";;".join(log_export.HISTORY_FILTERS)
+        )
+        
+        if not file_path:
+            return  # User cancelled the dialog
+            
+        fmt = log_export.HISTORY_FILTERS.get(selected_filter, "parquet")
+        if not file_path.endswith(history_export.FORMATS[fmt]):
+            file_path += history_export.FORMATS[fmt]
+            
+        # The worker reads through its own connection, so hand it everything buffered so far
+        self.history.flush()
+        self.start_export(log_export.HistoryExportWorker(self.history.path, file_path, fmt, parent=self))
+        
+    def start_export(self, worker):
+        self.export_worker = worker
+        self.export_worker.progress.connect(self.export_progress)
+        self.export_worker.exported.connect(self.export_finished)
+        self.export_worker.failed.connect(self.export_failed)
+        self.export_worker.cancelled.connect(self.export_cancelled)
+        self.export_worker.finished.connect(self.export_done)
+        self.export_bar.setValue(0)
+        self.export_bar.show()
+        self.cancel_export_btn.show()
+        self.clear_btn.setEnabled(False)
+        self.export_btn.setEnabled(False)
+        self.history_export_btn.setEnabled(False)
+        self.status_bar.showMessage(f"Exporting to {worker.path}...")
+        self.export_worker.start()
+        
+    def cancel_export(self):
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            
+    def export_progress(self, done, total):
+        self.export_bar.setValue(int(100 * done / total) if total else 100)
+        
+    def export_finished(self, file_path):
+        import log_export
+        code = event_log.HISTORY_EXPORTED if isinstance(self.export_worker, log_export.HistoryExportWorker) else event_log.LOG_EXPORTED
+        self.event_log.append(code, text=os.path.basename(file_path))
+        self.status_bar.showMessage(f"Successfully exported to {file_path}")
+        
+    def export_failed(self, message):
+        self.event_log.append(event_log.EXPORT_FAILED, text=message, level=event_log.ERROR)
+        self.status_bar.showMessage(f"Error exporting: {message}")
+        
+    def export_cancelled(self):
+        self.status_bar.showMessage("Export cancelled")
+        
+    def export_done(self):
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        self.export_bar.hide()
+        self.cancel_export_btn.hide()
+        self.clear_btn.setEnabled(True)
+        self.export_btn.setEnabled(True)
+        self.history_export_btn.setEnabled(self.history is not None)
+
+
+class FirstFrame(QObject):
+    # Calls callback() once, right after the window is first painted
+    def __init__(self, window, callback):
+        super().__init__(window)
+        self.callback = callback
+        window.installEventFilter(self)
+        
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            watched.removeEventFilter(self)
+            QTimer.singleShot(0, self.callback)  # Once its children have painted too
+        return False
+
+
+def startup_report(constructed, quit_after):
+    now = time.perf_counter()
+    print(f"Startup: imports {(IMPORTED - STARTED) * 1e3:.0f} ms, window {(constructed - IMPORTED) * 1e3:.0f} ms, "
+          f"first frame {(now - constructed) * 1e3:.0f} ms, total {(now - STARTED) * 1e3:.0f} ms "
+          f"({len(sys.modules)} modules loaded)", file=sys.stderr)
+    if quit_after:
+        QApplication.quit()
+
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Computer Laboratory Temperature Control System")
+    parser.add_argument("--rooms", type=int, default=0, help="simulate this many extra labs")
+    parser.add_argument("--sensors", type=int, default=1, help="sensors per simulated lab")
+    parser.add_argument("--rate", type=positive, default=0.5, help="samples per second (the screen redraws at most every 50 ms)")
+    parser.add_argument("--history", default="temperature_history.db", help="sample history database")
+    parser.add_argument("--no-history", action="store_true", help="do not record sample history")
+    parser.add_argument("--plant", action="store_true", help="simulate rooms with the thermal model instead of a random walk")
+    parser.add_argument("--replay", default=None, help="replay a recording (CSV, Parquet, Arrow or history database) instead of simulating")
+    parser.add_argument("--speed", type=non_negative, default=1.0, help="replay speed over real time (0 = as fast as possible)")
+    parser.add_argument("--devices", default=None, help="read real sensors described in this device configuration (JSON)")
+    parser.add_argument("--diagnostics", action="store_true", help="time the update loop and watch for event-loop stalls from the start")
+    parser.add_argument("--log-spill", default=None, help="spill log records that leave memory to this file")
+    parser.add_argument("--startup-report", action="store_true", help="print how long imports, the window and the first frame took")
+    parser.add_argument("--quit-after-startup", action="store_true", help="exit once the first frame is drawn (with --startup-report)")
+    args, qt_args = parser.parse_known_args()
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Set application style
     app.setStyle('Fusion')
     
     # Create and show the main window
-    window = TemperatureControlSystem()
+    registry = SensorRegistry()
+    source = None
+    if args.devices and not args.replay:
+        from sensor_io import HardwareSource, DevicePoller, load_devices
+        poller = DevicePoller(load_devices(args.devices), interval=1.0 / args.rate)
+        source = HardwareSource(poller, actuators=ActuatorBank(bus=poller))
+        poller.start()
+        # The first configured sensor becomes the primary channel
+        if not source.prime(registry):
+            poller.stop()
+            sys.exit(f"No sensor in {args.devices} answered")
+    engine = ControlEngine(registry=registry, dt=1.0 / args.rate)
+    populate(engine.registry, args.rooms, args.sensors)
+    if args.plant:
+        engine.plant = ThermalPlant.varied(len(engine.registry), noise=0.3)
+    if args.replay:
+        engine.source = ReplaySource(args.replay)
+    elif source is not None:
+        engine.actuators = source.actuators
+        engine.source = source
+    # Replayed samples are already recorded, so they are not written to history again
+    history = None if args.no_history or args.replay else HistoryStore(args.history, sample_interval=engine.dt)
+    log = EventLog(LOG_CAPACITY, spill_path=args.log_spill)
+    window = TemperatureControlSystem(engine, history, log, replay_speed=args.speed, diagnostics=args.diagnostics)
+    if args.startup_report or args.quit_after_startup:
+        constructed = time.perf_counter()
+        FirstFrame(window, lambda: startup_report(constructed, args.quit_after_startup))
     window.show()
     
     sys.exit(app.exec_())
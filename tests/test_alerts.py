@@ -0,0 +1,46 @@
+import math
+import numpy as np
+import pytest
+from alerts import BAND, OUTLIER, RATE, AlertMonitor
+
+
+def run(monitor, readings, target=23.0, start=0.0, dt=2.0):
+    # Feed one channel's readings, a tick every dt seconds; the alerts of every tick
+    alerts = []
+    for i, value in enumerate(readings):
+        alerts.extend(monitor.update(np.array([value]), np.array([target]), start + i * dt))
+    return alerts
+
+
+def test_band_alert_is_raised_and_cleared():
+    monitor = AlertMonitor(settle=0.0, max_rate=1000.0, raise_after=4.0, clear_after=4.0)
+    raised = run(monitor, [23.0, 27.0, 27.0, 27.0])
+    assert [(a.kind, a.raised) for a in raised] == [(BAND, True)]
+    cleared = run(monitor, [23.0, 23.0, 23.0], start=8.0)
+    assert [(a.kind, a.raised) for a in cleared] == [(BAND, False)]
+
+
+def test_missing_readings_leave_the_statistics_alone():
+    monitor = AlertMonitor(warmup=5)
+    run(monitor, [23.0 + 0.1 * (i % 3) for i in range(20)])
+    mean, var, slope = monitor.mean[0], monitor.var[0], monitor.slope[0]
+    run(monitor, [math.nan, math.inf, -math.inf], start=40.0)
+    assert monitor.missing == 3
+    assert (monitor.mean[0], monitor.var[0], monitor.slope[0]) == (mean, var, slope)
+    assert monitor.samples[0] == 20
+
+
+def test_alerts_still_fire_after_a_missing_reading():
+    monitor = AlertMonitor(warmup=5, raise_after=0.0, z_limit=4.0)
+    run(monitor, [23.0 + 0.1 * (i % 3) for i in range(20)] + [math.nan])
+    alerts = run(monitor, [30.0], start=42.0)
+    assert OUTLIER in [a.kind for a in alerts if a.raised]
+    assert np.isfinite(monitor.mean[0]) and np.isfinite(monitor.slope[0])
+
+
+def test_rate_spans_the_gap_of_missing_readings():
+    # 1 °C in the 6 s since the last reading is 10 °C/min, not 30 as over one 2 s tick
+    monitor = AlertMonitor(rate_window=2.0, raise_after=0.0)
+    run(monitor, [20.0, math.nan, math.nan, 21.0])
+    assert monitor.slope[0] == pytest.approx(10.0)
+    assert monitor.active[0, RATE]
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from controllers import OnOffController, PidController, split_range
+
+
+def test_on_off_holds_until_the_target_is_reached():
+    controller = OnOffController(band=1.0)
+    target = np.full(3, 23.0)
+    # Too warm, too cold, within the band
+    assert controller.update(np.array([24.5, 21.5, 23.5]), target, 2.0).tolist() == [-1.0, 1.0, 0.0]
+    # Back inside the band but not yet at the target: keep going
+    assert controller.update(np.array([23.5, 22.5, 23.5]), target, 2.0).tolist() == [-1.0, 1.0, 0.0]
+    # Target passed: stop
+    assert controller.update(np.array([22.9, 23.1, 23.5]), target, 2.0).tolist() == [0.0, 0.0, 0.0]
+
+
+def test_on_off_keeps_state_when_channels_are_added():
+    controller = OnOffController(band=1.0)
+    controller.update(np.array([25.0]), np.array([23.0]), 2.0)
+    output = controller.update(np.array([24.0, 24.0]), np.array([23.0, 23.0]), 2.0)
+    assert output.tolist() == [-1.0, 0.0]
+
+
+def test_pid_has_no_derivative_kick_on_the_first_step():
+    controller = PidController(kp=0.1, ki=0.0, kd=10.0)
+    output = controller.update(np.array([20.0]), np.array([23.0]), 2.0)
+    assert output.tolist() == pytest.approx([0.3])
+
+
+def test_pid_integral_does_not_wind_up_while_saturated():
+    controller = PidController(kp=1.0, ki=0.1, kd=0.0)
+    for _ in range(100):
+        assert controller.update(np.array([10.0]), np.array([23.0]), 2.0)[0] == 1.0
+    assert controller._integral[0] == 0.0
+    # Once the error is gone the output falls away at once instead of unwinding
+    assert controller.update(np.array([23.0]), np.array([23.0]), 2.0)[0] == 0.0
+
+
+def test_split_range_keeps_heating_and_cooling_apart():
+    heat, cool = split_range(np.array([1.0, 0.5, 0.03, -0.03, -0.4, -1.0]))
+    assert heat.tolist() == [1.0, 0.5, 0.0, 0.0, 0.0, 0.0]
+    assert cool.tolist() == [0.0, 0.0, 0.0, 0.0, 0.4, 1.0]
+    assert not np.any((heat > 0) & (cool > 0))
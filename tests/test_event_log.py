@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import event_log
+from event_log import EventLog, load_spill
+
+TS = 1_700_000_000_000
+
+
+def fill(log, count, start=0):
+    for i in range(start, start + count):
+        log.append(event_log.DEVICE_OFFLINE, text=f"unit {i}", ts=TS + i)
+
+
+def messages(log):
+    return [log.message(record) for chunk in log.iter_chunks(3) for record in chunk]
+
+
+def test_ring_keeps_the_newest_records():
+    log = EventLog(4)
+    fill(log, 10)
+    assert (len(log), log.first, log.total) == (4, 6, 10)
+    assert messages(log) == [f"Device offline: unit {i}" for i in range(6, 10)]
+    assert log.tail(2)["ts"].tolist() == [TS + 8, TS + 9]
+    with pytest.raises(IndexError):
+        log.record(4)
+
+
+def test_texts_leave_with_their_records():
+    log = EventLog(10)
+    fill(log, 1000)
+    log.append(event_log.READING, 22.5, 45.0, ts=TS)  # No text
+    assert len(log._strings) == len(log._string_index) == 9
+    assert messages(log)[-1] == "Temperature: 22.5°C, Humidity: 45%"
+
+
+def test_snapshot_survives_later_appends():
+    log = EventLog(5)
+    fill(log, 5)
+    count, chunks = log.snapshot(2)
+    formatter = log.messages()
+    fill(log, 5, start=100)  # Overwrites every record of the snapshot
+    records = np.concatenate(list(chunks))
+    assert count == 5
+    assert [formatter.message(record) for record in records] == [f"Device offline: unit {i}" for i in range(5)]
+
+
+def test_spilled_records_stay_readable(tmp_path):
+    path = str(tmp_path / "log.spill")
+    log = EventLog(8, spill_path=path, spill_chunk=3)
+    fill(log, 50)
+    assert (len(log), log.first) == (50, 0)
+    assert messages(log) == [f"Device offline: unit {i}" for i in range(50)]
+    assert log.message(log.record(0)) == "Device offline: unit 0"
+    assert len(log._strings) <= 8
+    count, chunks = log.snapshot(7)
+    formatter = log.messages()
+    assert [formatter.message(r) for chunk in chunks for r in chunk] == messages(log)
+    log.close()
+
+    records, strings = load_spill(path)
+    assert len(records) == log._spilled
+    assert [strings[i] for i in records["text"]] == [f"unit {i}" for i in range(len(records))]
+
+
+def test_clear_starts_over(tmp_path):
+    log = EventLog(4, spill_path=str(tmp_path / "log.spill"))
+    fill(log, 10)
+    log.clear()
+    assert len(log) == 0 and not log._strings
+    fill(log, 2)
+    assert messages(log) == ["Device offline: unit 0", "Device offline: unit 1"]
+    log.close()
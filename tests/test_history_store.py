@@ -0,0 +1,42 @@
+import pytest
+from history_store import HistoryStore
+
+T0 = 1_700_000_000.0  # Epoch seconds, where a 1e-9 offset is lost to rounding
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), sample_interval=2.0)
+    yield store
+    store.close()
+
+
+def fill(store, count, channel=0):
+    for i in range(count):
+        store.append(T0 + 2 * i, channel, 20.0 + i, 40.0 + i, 23.0)
+
+
+def test_range_includes_start_and_excludes_end(store):
+    fill(store, 10)
+    rows = store.range(0, T0, T0 + 10)
+    assert [row[0] for row in rows] == [T0, T0 + 2, T0 + 4, T0 + 6, T0 + 8]
+    assert rows[0][1:4] == (20.0, 20.0, 20.0)
+
+
+def test_pages_neither_drop_nor_repeat_rows(store):
+    fill(store, 25)
+    pages = list(store.iter_range(0, T0, T0 + 50, page_size=10))
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [row[0] for page in pages for row in page] == [T0 + 2 * i for i in range(25)]
+
+
+def test_rollup_keeps_min_mean_max_per_bucket(store):
+    fill(store, 60)  # Two minutes of samples
+    fill(store, 60, channel=1)
+    rows = store.range(0, T0, T0 + 120, max_points=2)
+    bucket = int(T0 // 60) * 60
+    assert [row[0] for row in rows] == [bucket, bucket + 60, bucket + 120]
+    first = rows[0]
+    samples = int(bucket + 60 - T0) // 2
+    assert first[1] == 20.0 and first[3] == 20.0 + samples - 1
+    assert first[2] == pytest.approx(20.0 + (samples - 1) / 2)
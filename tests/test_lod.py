@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from lod import LodSeries
+
+
+def filled(capacity, count, chunk=1000, seed=0):
+    series = LodSeries(capacity)
+    y = np.random.default_rng(seed).normal(size=count)
+    for start in range(0, count, chunk):
+        series.extend(np.arange(start, min(count, start + chunk), dtype=float), y[start:start + chunk])
+    return series, y
+
+
+def test_narrow_range_is_drawn_from_raw_samples():
+    series, y = filled(10000, 1000)
+    x, ys = series.query(100.0, 120.0, 800)
+    assert x.tolist() == list(range(99, 122))
+    assert ys.tolist() == y[99:122].tolist()
+
+
+def test_wide_range_keeps_every_extreme_in_a_few_points():
+    series, y = filled(100000, 100000)
+    x, ys = series.query(0.0, 100000.0, 500)
+    assert len(x) <= 2 * 4 * 500 + 64  # At most a bucket per pixel per fanout, plus the edges
+    assert np.all(np.diff(x) >= 0)
+    assert ys.min() == y.min() and ys.max() == y.max()
+
+    series.extend([100000.0, 100001.0], [50.0, -50.0])  # Spikes a decimated plot would miss
+    x, ys = series.query(0.0, 100001.0, 500)
+    assert ys.max() == 50.0 and ys.min() == -50.0
+
+
+def test_query_after_old_samples_were_evicted():
+    series, y = filled(4096, 20000, chunk=333)
+    assert len(series) == 4096
+    x, ys = series.query(0.0, 20000.0, 100)
+    assert x[0] >= 20000 - 4096 - 1
+    retained = y[-4096:]
+    assert ys.min() == retained.min() and ys.max() == retained.max()
+
+
+def test_fanout_must_be_at_least_two():
+    with pytest.raises(ValueError):
+        LodSeries(100, fanout=1)
@@ -0,0 +1,32 @@
+import math
+import pytest
+from rolling_stats import RollingStats, SlidingWindow
+
+
+def test_window_summary():
+    window = SlidingWindow(60.0, slots=6)
+    for i, value in enumerate([20.0, 22.0, 24.0, 26.0]):
+        window.add(float(i), value, 1.0, value <= 22.0, value < 23.0, False)
+    summary = window.summary(3.0)
+    assert (summary["count"], summary["min"], summary["max"]) == (4, 20.0, 26.0)
+    assert summary["mean"] == pytest.approx(23.0)
+    assert summary["std"] == pytest.approx(math.sqrt(20.0 / 3))
+    assert summary["in_band"] == summary["heating"] == 0.5
+    assert summary["p95"] == pytest.approx(26.0, abs=0.1)
+
+
+def test_old_slots_leave_the_window():
+    window = SlidingWindow(60.0, slots=6)
+    window.add(0.0, 30.0, 1.0, False, False, False)
+    window.add(65.0, 20.0, 1.0, True, False, False)
+    summary = window.summary(65.0)
+    assert (summary["count"], summary["min"], summary["max"]) == (1, 20.0, 20.0)
+
+
+def test_readings_that_are_not_finite_are_skipped():
+    stats = RollingStats(windows=(("1 min", 60),))
+    for i, value in enumerate([22.0, math.nan, 24.0, math.inf, -math.inf]):
+        stats.add(float(i), value, True, False, False)
+    summary = stats.summary("1 min")
+    assert (summary["count"], summary["min"], summary["max"], summary["mean"]) == (2, 22.0, 24.0, 23.0)
+    assert stats.windows["1 min"].missing == 3
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from sample_bridge import SAMPLE
+from sample_stream import decode, encode
+
+
+def batch(temperature, humidity, target=23.0):
+    samples = np.zeros(len(temperature), dtype=SAMPLE)
+    samples["tick"] = np.arange(10, 10 + len(samples))
+    samples["timestamp"] = 1_700_000_000.0 + 2.0 * np.arange(len(samples))
+    samples["temperature"] = temperature
+    samples["humidity"] = humidity
+    samples["target"] = target
+    return samples
+
+
+def test_round_trip():
+    columns = decode(encode(batch([21.25, 22.5], [45.1, 50.0]), decimation=3))
+    assert (columns["tick"], columns["decimation"]) == (10, 3)
+    assert columns["timestamp"].tolist() == [1_700_000_000.0, 1_700_000_002.0]
+    assert columns["temperature"] == pytest.approx([21.25, 22.5])
+    assert columns["humidity"] == pytest.approx([45.1, 50.0])
+    assert columns["target"] == pytest.approx([23.0, 23.0])
+
+
+def test_missing_readings_stay_missing():
+    columns = decode(encode(batch([np.nan, 21.0], [np.nan, np.nan])))
+    assert np.isnan(columns["temperature"][0]) and columns["temperature"][1] == pytest.approx(21.0)
+    assert np.isnan(columns["humidity"]).all()
+
+
+def test_values_out_of_range_are_clipped():
+    columns = decode(encode(batch([500.0, -500.0], [np.inf, 4000.0])))
+    assert columns["temperature"] == pytest.approx([327.67, -327.67])
+    assert columns["humidity"] == pytest.approx([3276.7, 3276.7])
@@ -0,0 +1,152 @@
+import time
+import queue
+import asyncio
+import threading
+import pytest
+from control_engine import ControlEngine
+from sensor_io import (ConnectionPool, DevicePoller, DeviceStatus, HardwareSource, ModbusDevice, Reading,
+                       StandInModbusServer, plan_reads)
+from sensor_registry import SensorRegistry
+
+
+@pytest.fixture
+def gateway():
+    # Start a stand-in Modbus gateway on a loop of its own; the test fills in its registers
+    server = StandInModbusServer({})
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.stop(), loop).result(5.0)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def channels(count, room="Lab"):
+    return [{"room": room, "sensor": f"Sensor {i + 1}", "temperature": 2 * i, "humidity": 2 * i + 1}
+            for i in range(count)]
+
+
+def collect(poller, until, seconds=5.0):
+    # Items from the poller queue until until(items) holds or time runs out
+    items = []
+    deadline = time.monotonic() + seconds
+    while not until(items) and time.monotonic() < deadline:
+        try:
+            items.append(poller.queue.get(timeout=0.05))
+        except queue.Empty:
+            pass
+    return items
+
+
+def test_plan_reads_merges_blocks():
+    assert plan_reads([0, 1, 2, 10, 30]) == [(0, 11), (30, 1)]
+    assert plan_reads([5, 3, 3, 4]) == [(3, 3)]
+    assert plan_reads([0, 9], max_gap=8) == [(0, 10)]
+    assert plan_reads([0, 10], max_gap=8) == [(0, 1), (10, 1)]
+    assert plan_reads(range(0, 200, 2)) == [(0, 125), (126, 73)]
+
+
+def test_block_read_scales_signed_values(gateway):
+    gateway.registers.update({(1, 0): 235, (1, 1): 450, (1, 4): 0xFFF6, (1, 5): 0x8000})
+    device = ModbusDevice("unit 1", [{"room": "Lab", "sensor": "A", "temperature": 0, "humidity": 1},
+                                     {"room": "Lab", "sensor": "B", "temperature": 4, "humidity": 5}],
+                          "127.0.0.1", gateway.port, unit=1)
+
+    async def poll():
+        pool = ConnectionPool(1.0)
+        await device.open(pool)
+        try:
+            return await device.poll()
+        finally:
+            pool.close()
+
+    readings = asyncio.run(poll())
+    assert gateway.requests == 1
+    assert readings == [("Lab", "A", pytest.approx(23.5), pytest.approx(45.0)),
+                        ("Lab", "B", pytest.approx(-1.0), pytest.approx(-3276.8))]
+
+
+def test_slow_unit_goes_offline_and_comes_back(gateway):
+    gateway.registers.update({(1, 0): 230, (1, 1): 450})
+    gateway.delay = 0.5
+    poller = DevicePoller([ModbusDevice("unit 1", channels(1), "127.0.0.1", gateway.port)], interval=0.05, timeout=0.2)
+    poller.start()
+    try:
+        items = collect(poller, lambda items: any(isinstance(i, DeviceStatus) for i in items))
+        assert items[-1].online is False and "no reply" in items[-1].message
+        gateway.delay = 0.0
+        items = collect(poller, lambda items: any(isinstance(i, DeviceStatus) for i in items))
+        assert items[-1].online is True
+        items = collect(poller, lambda items: any(isinstance(i, Reading) for i in items))
+        assert items[-1].temperature == pytest.approx(23.0)
+    finally:
+        poller.stop()
+
+
+def test_units_sharing_a_gateway_stay_online(gateway):
+    # 20 units queue behind one connection; each request is well within the
+    # timeout, though a whole round of them is not
+    units = 20
+    for unit in range(1, units + 1):
+        gateway.registers.update({(unit, 0): 200 + unit, (unit, 1): 450})
+    gateway.delay = 0.02
+    devices = [ModbusDevice(f"unit {unit}", channels(1, f"Lab {unit}"), "127.0.0.1", gateway.port, unit)
+               for unit in range(1, units + 1)]
+    poller = DevicePoller(devices, interval=0.05, timeout=0.2)
+    poller.start()
+    try:
+        items = collect(poller, lambda items: sum(isinstance(i, Reading) for i in items) >= 3 * units, seconds=10.0)
+    finally:
+        poller.stop()
+    statuses = [i for i in items if isinstance(i, DeviceStatus)]
+    assert all(status.online for status in statuses)
+    assert len(statuses) == units
+    readings = [i for i in items if isinstance(i, Reading)]
+    assert len(readings) >= 3 * units
+    assert {r.room: r.temperature for r in readings} == {f"Lab {u}": pytest.approx((200 + u) / 10) for u in range(1, units + 1)}
+
+
+def test_coil_writes_are_grouped_into_runs(gateway):
+    device = ModbusDevice("unit 1", channels(1), "127.0.0.1", gateway.port, unit=1)
+
+    async def write():
+        pool = ConnectionPool(1.0)
+        await device.open(pool)
+        try:
+            await device.write([(10, True), (11, False), (12, True), (20, True), (21, True)])
+        finally:
+            pool.close()
+
+    asyncio.run(write())
+    assert gateway.requests == 2
+    assert gateway.coils == {(1, 10): True, (1, 11): False, (1, 12): True, (1, 20): True, (1, 21): True}
+
+
+def test_primary_channel_follows_the_first_configured_sensor(gateway):
+    # Both units answer concurrently; whichever is first, the first configured one is channel 0
+    gateway.registers.update({(1, 0): 215, (1, 1): 400, (2, 0): 300, (2, 1): 500})
+    devices = [ModbusDevice("unit 1", channels(1, "Lab A"), "127.0.0.1", gateway.port, unit=1),
+               ModbusDevice("unit 2", channels(1, "Lab B"), "127.0.0.1", gateway.port, unit=2)]
+    poller = DevicePoller(devices, interval=0.05, timeout=0.5)
+    source = HardwareSource(poller)
+    poller.start()
+    try:
+        registry = SensorRegistry()
+        assert source.prime(registry) == 2
+        assert registry.rooms == ["Lab A", "Lab B"]
+        engine = ControlEngine(registry=registry)
+        engine.source = source
+        engine.running = True
+        assert engine.step().temperature == pytest.approx(21.5)
+
+        gateway.registers[(1, 0)] = 180
+        deadline = time.monotonic() + 5.0
+        while engine.step().temperature != pytest.approx(18.0) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert engine.temperature == pytest.approx(18.0)
+        assert len(registry) == 2
+    finally:
+        poller.stop()
@@ -0,0 +1,182 @@
+import sys
+import time
+import argparse
+import numpy as np
+from controllers import CONTROLLERS, split_range
+
+DAY = 86400.0
+YEAR = 365 * DAY
+
+# Defaults for a ~100 m² computer lab with 30 workstations
+THERMAL_MASS = 5.0e6  # J/K, air plus furniture and equipment
+UA = 250.0  # W/K, conduction and infiltration to outside
+HEAT_CAPACITY = 8000.0  # W at full heating demand
+COOL_CAPACITY = 12000.0  # W at full cooling demand
+OCCUPIED_LOAD = 4500.0  # W from people and running machines while the lab is in use
+IDLE_LOAD = 600.0  # W from machines left on overnight
+HUMIDITY_TAU = 3.0 * 3600  # s, ventilation time constant for humidity
+OCCUPIED_MOISTURE = 4.0 / 3600  # %RH per second added while occupied
+DEHUMIDIFY = 6.0 / 3600  # %RH per second removed at full cooling
+
+
+def outside_temperature(t, mean=27.0, seasonal=4.0, daily=7.0):
+    # Outside air (°C) at epoch seconds t: an annual and a daily sine, warmest
+    # in April and at 15:00 (roughly the Mubi climate)
+    t = np.asarray(t, dtype=np.float64)
+    season = np.cos(2 * np.pi * (t % YEAR - 100 * DAY) / YEAR)
+    day = np.cos(2 * np.pi * (t % DAY - 15 * 3600) / DAY)
+    return mean + seasonal * season + daily * day
+
+
+def outside_humidity(t, mean=45.0, seasonal=20.0):
+    # Relative humidity (%) at epoch seconds t, wettest in August
+    t = np.asarray(t, dtype=np.float64)
+    return mean + seasonal * np.cos(2 * np.pi * (t % YEAR - 220 * DAY) / YEAR)
+
+
+def occupancy(t):
+    # 1.0 while the lab is in use (weekdays 08:00-18:00), else 0.0
+    t = np.asarray(t, dtype=np.float64)
+    hour = (t % DAY) / 3600
+    weekday = ((t // DAY) + 3) % 7 < 5  # 1970-01-01 was a Thursday
+    return ((hour >= 8) & (hour < 18) & weekday).astype(np.float64)
+
+
+def _column(value, count):
+    return np.array(np.broadcast_to(np.asarray(value, dtype=np.float64), (count,)))
+
+
+class ThermalPlant:
+    # First-order thermal and humidity model of `count` rooms, stepped for all
+    # rooms at once. Every parameter may be a scalar or one value per room.
+    # Temperature is advanced with the exact solution of
+    #   C dT/dt = UA (T_out - T) + Q_hvac + Q_load
+    # over each step, so it stays stable for steps of any length.
+    def __init__(self, count, thermal_mass=THERMAL_MASS, ua=UA, heat_capacity=HEAT_CAPACITY,
+                 cool_capacity=COOL_CAPACITY, occupied_load=OCCUPIED_LOAD, idle_load=IDLE_LOAD,
+                 noise=0.0, seed=None):
+        self.count = int(count)
+        self.thermal_mass = _column(thermal_mass, self.count)
+        self.ua = _column(ua, self.count)
+        self.heat_capacity = _column(heat_capacity, self.count)
+        self.cool_capacity = _column(cool_capacity, self.count)
+        self.occupied_load = _column(occupied_load, self.count)
+        self.idle_load = _column(idle_load, self.count)
+        self.noise = noise  # Std dev of random temperature drift in °C per sqrt(hour)
+        self._rng = np.random.default_rng(seed)
+        # Steady-state temperature rise over outside air per unit of each input
+        self._heat_rise = self.heat_capacity / self.ua
+        self._cool_rise = self.cool_capacity / self.ua
+        self._load_rise = (self.idle_load / self.ua, self.occupied_load / self.ua)
+        self._decay_dt = None
+        self._equilibrium = np.empty(self.count)
+        self._scratch = np.empty(self.count)
+
+    @classmethod
+    def varied(cls, count, spread=0.2, seed=None, **kwargs):
+        # Rooms whose size, insulation and HVAC differ by up to ±spread
+        rng = np.random.default_rng(seed)
+        params = {}
+        for name, default in (("thermal_mass", THERMAL_MASS), ("ua", UA), ("heat_capacity", HEAT_CAPACITY),
+                              ("cool_capacity", COOL_CAPACITY), ("occupied_load", OCCUPIED_LOAD)):
+            params[name] = kwargs.pop(name, default) * rng.uniform(1 - spread, 1 + spread, count)
+        return cls(count, seed=seed, **params, **kwargs)
+
+    def step(self, temperature, humidity, heat, cool, t, dt, outside=None, outside_rh=None, occupied=None):
+        # Advance the rooms by dt seconds in place. heat and cool are demands in
+        # [0, 1]; t is the simulated epoch time at the start of the step, and the
+        # weather and occupancy at t may be passed in when precomputed.
+        # Returns the HVAC power drawn per room in W (a buffer reused next step).
+        if dt != self._decay_dt:
+            self._decay = np.exp(-self.ua * dt / self.thermal_mass)
+            self._humidity_decay = np.exp(-dt / HUMIDITY_TAU)
+            self._decay_dt = dt
+        outside = float(outside_temperature(t)) if outside is None else outside
+        outside_rh = float(outside_humidity(t)) if outside_rh is None else outside_rh
+        occupied = float(occupancy(t)) if occupied is None else occupied
+
+        equilibrium = self._equilibrium
+        scratch = self._scratch
+        np.multiply(heat, self._heat_rise, out=equilibrium)
+        np.multiply(cool, self._cool_rise, out=scratch)
+        equilibrium -= scratch
+        equilibrium += self._load_rise[occupied > 0.5]
+        equilibrium += outside
+        temperature -= equilibrium
+        temperature *= self._decay
+        temperature += equilibrium
+        if self.noise:
+            temperature += self._rng.normal(0.0, self.noise * np.sqrt(dt / 3600), self.count)
+
+        humidity -= outside_rh
+        humidity *= self._humidity_decay
+        humidity += outside_rh + OCCUPIED_MOISTURE * occupied * dt
+        np.multiply(cool, DEHUMIDIFY * dt, out=scratch)
+        humidity -= scratch
+        np.clip(humidity, 0.0, 100.0, out=humidity)
+
+        # HVAC power: heating and cooling demands never overlap after split_range
+        np.multiply(heat, self.heat_capacity, out=scratch)
+        scratch += cool * self.cool_capacity
+        return scratch
+
+
+def simulate(plant, controller, target=23.0, days=365, dt=300.0, start=0.0, band=None,
+             temperature=None, humidity=None):
+    # Run a controller against the plant for `days` of simulated time and
+    # return per-room totals: HVAC energy (kWh), hours outside target ± band,
+    # mean absolute error (°C) and the final temperature and humidity
+    n = plant.count
+    target = _column(target, n)
+    band = controller.band if band is None else band
+    temperature = _column(outside_temperature(start) if temperature is None else temperature, n)
+    humidity = _column(outside_humidity(start) if humidity is None else humidity, n)
+    energy = np.zeros(n)
+    outside_band = np.zeros(n)
+    abs_error = np.zeros(n)
+    steps = int(days * DAY / dt)
+    # Weather and occupancy only depend on time, so compute them for the whole run up front
+    times = start + dt * np.arange(steps)
+    outside = outside_temperature(times).tolist()
+    outside_rh = outside_humidity(times).tolist()
+    occupied = occupancy(times).tolist()
+    error = np.empty(n)
+    for i in range(steps):
+        heat, cool = split_range(controller.update(temperature, target, dt))
+        energy += plant.step(temperature, humidity, heat, cool, times[i], dt, outside[i], outside_rh[i], occupied[i])
+        np.subtract(temperature, target, out=error)
+        np.abs(error, out=error)
+        abs_error += error
+        outside_band += error > band
+    return {
+        "energy_kwh": energy * dt / 3.6e6,
+        "hours_outside_band": outside_band * dt / 3600,
+        "mean_abs_error": abs_error / max(1, steps),
+        "temperature": temperature,
+        "humidity": humidity,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many labs under a control strategy, faster than real time")
+    parser.add_argument("--rooms", type=int, default=1000, help="number of rooms")
+    parser.add_argument("--days", type=float, default=365, help="simulated days")
+    parser.add_argument("--step", type=float, default=300.0, help="simulation step in seconds")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="onoff", help="control algorithm")
+    parser.add_argument("--target", type=float, default=23.0, help="target temperature in °C")
+    parser.add_argument("--threshold", type=float, default=2.0, help="on/off hysteresis band in °C")
+    parser.add_argument("--spread", type=float, default=0.2, help="room-to-room parameter variation")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    args = parser.parse_args()
+
+    plant = ThermalPlant.varied(args.rooms, args.spread, seed=args.seed)
+    controller = CONTROLLERS[args.controller]()
+    controller.band = args.threshold
+    started = time.perf_counter()
+    result = simulate(plant, controller, args.target, args.days, args.step)
+    elapsed = time.perf_counter() - started
+    simulated = args.days * DAY * args.rooms
+    print(f"{args.rooms} rooms x {args.days:g} days in {elapsed:.2f}s ({simulated / elapsed:.3g}x real time)", file=sys.stderr)
+    print(f"energy per room:        {result['energy_kwh'].mean():.0f} kWh (max {result['energy_kwh'].max():.0f})")
+    print(f"hours outside ±{args.threshold:g}°C:  {result['hours_outside_band'].mean():.1f} (max {result['hours_outside_band'].max():.1f})")
+    print(f"mean absolute error:    {result['mean_abs_error'].mean():.2f}°C")